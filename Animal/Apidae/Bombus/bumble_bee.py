@@ -16,18 +16,16 @@ class BumbleBee(Bee):
     can_exit = True
     exit_chance = 0.1
     shelter_chance = 0.5
-
-    pass
+    __slots__ = ()
 
 
 class Worker(BumbleBee):
-
-    pass
+    __slots__ = ()
 
 
 class Queen(BumbleBee):
-    pass
+    __slots__ = ()
 
 
 class Drone(BumbleBee):
-    pass
\ No newline at end of file
+    __slots__ = ()
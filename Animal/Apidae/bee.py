@@ -23,21 +23,23 @@ class Bee(Pollinator):
     can_exit = True
     exit_chance = 0.1
     shelter_chance = 0.5
+    __slots__ = ('nest_position',)
 
-    def __init__(self, area: Area = Area([[1, 1, 1, 1], [1, 1, 1, 1], [1, 1, 1, 1], [4, 4, 4, 4]]),
-                 days: int = 0, hours: int = 4, seconds: int = 0, position: tuple = (0, 0)):
-        Pollinator.__init__(self, area, days, hours, seconds, position)
+    def __init__(self, area: Area = None,
+                 days: int = 0, hours: int = 4, seconds: int = 0, position: tuple = None, rng=None, seed=None,
+                 recording: bool = True):
+        Pollinator.__init__(self, area, days, hours, seconds, position, rng, seed, recording)
         self.sheltered = True
         # This gives the position of the nest. I'll assume the nest must be close to either food or shelter
         # One problem most bees have is destruction of their habitat means they won't make nests, so this seems
         # like a logical choice to me
-        if area.shelter_indices:
-            index = np.random.randint(len(area.shelter_indices))
-            nest_position = area.shelter_indices[index]
+        if len(self.area.shelter_coords):
+            index = self.rng.randint(len(self.area.shelter_coords))
+            nest_position = tuple(int(v) for v in self.area.shelter_coords[index])
 
-        elif area.food_indices:
-            index = np.random.randint(len(area.food_indices))
-            nest_position = area.food_indices[index]
+        elif len(self.area.food_coords):
+            index = self.rng.randint(len(self.area.food_coords))
+            nest_position = tuple(int(v) for v in self.area.food_coords[index])
 
         # if there's no suitable nest building site, call an error
         else:
@@ -59,14 +61,14 @@ class Bee(Pollinator):
         # it is super hungry
         if self.sheltered:
             # Number of times to randomly move
-            times = np.random.randint(10)
+            times = self.rng.randint(10)
 
             # Just a check to make sure it is actually in a tree area and marked as sheltered...
-            if self.area.array[self.position[0]][self.position[1]] not in [3, 4]:
+            if self.area.array[self._x][self._y] not in [3, 4]:
                 self.sheltered = False
                 self.random_move(times)
                 self.turns += times
-            if self.sheltered and (self.food_level < 25 or np.random.choice([True, False], p=[1 - self.__shelter_chance,
+            if self.sheltered and (self.food_level < 25 or self.rng.choice([True, False], p=[1 - self.__shelter_chance,
                                                                                               self.__shelter_chance])):
                 self.sheltered = False
                 self.random_move(times)
@@ -89,16 +91,16 @@ class Bee(Pollinator):
         moves_possible = int(self.food_level // self.__food_unit)
         if self.sheltered:
             # Number of times to randomly move
-            times = np.random.randint(10)
+            times = self.rng.randint(10)
 
             # Just a check to make sure it is actually in a tree area and marked as sheltered...
-            if self.area.array[self.position[0]][self.position[1]] not in [3, 4]:
+            if self.area.array[self._x][self._y] not in [3, 4]:
                 self.sheltered = False
                 self.random_move(times)
                 self.turns += times
 
             # If it's still sheltered, meaning its in a legal shelter site, then most likely it will move
-            if self.sheltered and (self.food_level < 25 or np.random.choice([True, False], p=[1 - self.__shelter_chance,
+            if self.sheltered and (self.food_level < 25 or self.rng.choice([True, False], p=[1 - self.__shelter_chance,
                                                                                               self.__shelter_chance])):
                 self.sheltered = False
                 self.random_move(times)
@@ -111,12 +113,12 @@ class Bee(Pollinator):
             # Above a 50% food level, we'll consider it
             if self.food_level >= 50.0:
                 # Usually, it will try to move north
-                direction_die = np.random.choice(['north', 'south', 'east', 'west'],
+                direction_die = self.rng.choice(['north', 'south', 'east', 'west'],
                                                  p=[0.925, 0.025, 0.025, 0.025])
-                move_die = np.random.choice(int(moves_possible // 2))
+                move_die = self.rng.choice(int(moves_possible // 2))
 
                 for i in range(move_die):
-                    random_chance = np.random.choice([0, 1], p=[.995, 0.005])
+                    random_chance = self.rng.choice([0, 1], p=[.995, 0.005])
                     if random_chance:
                         self.random_move()
                     else:
@@ -127,8 +129,8 @@ class Bee(Pollinator):
 
             # if it's a little hungry, it may seek food
             elif 25.0 <= self.food_level < 50.0:
-                if np.random.choice([True, False], p=[0.001, 0.999]):
-                    times = np.random.randint(10)
+                if self.rng.choice([True, False], p=[0.001, 0.999]):
+                    times = self.rng.randint(10)
                     # slight chance of moving randomly instead
                     self.random_move(times)
                     self.turns += times
@@ -139,8 +141,8 @@ class Bee(Pollinator):
 
             # now it's very hungry and will almost certainly seek food
             elif self.food_level < 25.0:
-                if np.random.choice([True, False], p=[0.0001, 0.9999]):
-                    times = np.random.rantint(10)
+                if self.rng.choice([True, False], p=[0.0001, 0.9999]):
+                    times = self.rng.rantint(10)
                     self.random_move(times)
                     self.turns += times
 
@@ -161,7 +163,7 @@ class Bee(Pollinator):
         # If it's still sheltered at this point, break shelter
         if self.sheltered:
             # Number of times to randomly move
-            times = np.random.randint(10)
+            times = self.rng.randint(10)
             self.sheltered = False
             self.random_move(times)
             self.decrement_food(self.__food_unit * times)
@@ -180,8 +182,8 @@ class Bee(Pollinator):
             # At night it will batten down the hatches and stay sheltered
             # If for whatever reason it is marked as sheltered but isn't in a tree...
             # Number of times to randomly move
-            times = np.random.randint(10)
-            if self.area.array[self.position[0]][self.position[1]] not in [3, 4]:
+            times = self.rng.randint(10)
+            if self.area.array[self._x][self._y] not in [3, 4]:
                 self.sheltered = False
                 self.random_move(times)
                 self.turns += times
@@ -192,7 +194,7 @@ class Bee(Pollinator):
                 self.turns += 1
                 return
         # This is the case that it is alive and near shelter. At this time it will take shelter
-        elif self.sheltered is False and self.area.array[self.position[0]][self.position[1]] in [3, 4]:
+        elif self.sheltered is False and self.area.array[self._x][self._y] in [3, 4]:
             self.sheltered = True
             self.decrement_food(self.__food_unit / 2)
             self.turns += 1
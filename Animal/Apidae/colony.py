@@ -0,0 +1,175 @@
+from Animal.Role import death_probability
+from Animal.Apidae.Bombus.bumble_bee import Worker
+from Land_Use.Land import Area
+import numpy as np
+
+
+# Layout of the per-colony results made by ColonyEngine.results()
+colony_dtype = np.dtype([('x', np.int32), ('y', np.int32), ('workers', np.int32), ('alive', np.int32),
+                         ('worker_loss', np.float32), ('trips', np.int64), ('successes', np.int64),
+                         ('foraging_success', np.float32), ('store', np.float32), ('food_cells', np.int32),
+                         ('shelter_cells', np.int32)])
+
+# Turns (25 seconds each) between leaving for the night at 8 pm and foraging again at 6 am, as in move_one_day
+night_turns = 10 * 3600 // 25
+
+
+class ColonyEngine:
+    """
+    Simulates whole bee colonies at once instead of one Bee object at a time. Every colony is a nest and a set of
+    workers that forage within a radius of it, and the workers of every colony are kept in arrays of shape
+    (colonies, workers), so one step moves every worker in the field.
+
+    The food and shelter cells within the foraging radius of each nest are found once, when the engine is made. Each
+    day every living worker makes trips_per_day foraging trips to a random reachable food cell. Getting there and
+    back costs food_unit per cell, and like a bee in seek_resource it almost always arrives and then eats to full
+    with a chance of 0.99 on a food cell and 0.8 on a mixed food and shelter cell. A successful trip brings
+    nectar_load back to the nest's store. Nights are spent in the nest, at half the food cost per turn if the nest or
+    a reachable cell has shelter, and the workers are fed out of the store as far as it goes. After every trip and
+    every night each worker rolls for death with the same chances as check_for_death (see death_probability).
+    >>> from Land_Use.Developed.farm import make_field
+    >>> engine = ColonyEngine(make_field('standard', 1), colonies=4, workers=50, radius=30,
+    ...                       rng=np.random.RandomState(0))
+    >>> engine.run(days=3)
+    >>> r = engine.results()
+    >>> len(r), r['workers'].tolist(), bool((r['alive'] <= 50).all()), bool((r['shelter_cells'] > 0).all())
+    (4, [50, 50, 50, 50], True, True)
+    """
+
+    def __init__(self, area: Area, nests=None, colonies: int = 1, workers: int = 100, radius: int = 50,
+                 worker_class: type = Worker, trips_per_day: int = 10, nectar_load: float = 25.0, rng=None):
+        """
+        :param area: the Area (or CropField) the colonies live on
+        :param nests: (row, column) of each nest. If not given, colonies nests are placed the way Bee places its nest:
+        on a random shelter cell, or a random food cell if there is no shelter.
+        :param colonies: number of nests to place if nests isn't given
+        :param workers: workers per colony
+        :param radius: how far the workers forage from the nest, in cells (Manhattan distance)
+        :param worker_class: the bee class the food_unit and death_factor come from
+        :param trips_per_day: foraging trips each worker makes in a day
+        :param nectar_load: food added to the nest's store by a successful trip
+        :param rng: source of random numbers, np.random (the default) or a np.random.RandomState
+        """
+        self.rng = np.random if rng is None else rng
+        self.area = area
+        self.radius = radius
+        self.food_unit = worker_class.food_unit
+        self.death_factor = worker_class.death_factor
+        self.trips_per_day = trips_per_day
+        self.nectar_load = nectar_load
+        if nests is None:
+            nests = self.place_nests(colonies)
+        self.nests = np.asarray(nests, dtype=np.int32).reshape(-1, 2)
+        # The cells every nest can reach, kept like a CSR matrix: the cells of nest k are ptr[k] to ptr[k + 1]
+        self.food_ptr, self.food_cells, self.food_distance = self._reachable(area.food_coords)
+        self.shelter_ptr, self.shelter_cells, self.shelter_distance = self._reachable(area.shelter_coords)
+        self.food_count = np.diff(self.food_ptr)
+        # Chance of eating on each reachable food cell, 0.8 where it is mixed with shelter
+        mixed = np.asarray(area.shelter_mask[area.food_coords[:, 0], area.food_coords[:, 1]], dtype=bool)
+        self.eat_chance = np.where(mixed, 0.80, 0.99)[self.food_cells]
+        sheltered = np.asarray(area.shelter_mask[self.nests[:, 0], self.nests[:, 1]], dtype=bool)
+        self.night_cost = night_turns * self.food_unit * np.where(sheltered | (np.diff(self.shelter_ptr) > 0), 0.5, 1)
+        # Workers start with food drawn like a Pollinator's
+        shape = (len(self.nests), workers)
+        self.food_level = np.clip(np.trunc(self.rng.normal(50, 20, shape)), 0, 100)
+        self.alive = np.ones(shape, dtype=bool)
+        self.store = np.zeros(len(self.nests))
+        self.trips = np.zeros(len(self.nests), dtype=np.int64)
+        self.successes = np.zeros(len(self.nests), dtype=np.int64)
+        self.days = 0
+
+    def place_nests(self, colonies: int) -> np.ndarray:
+        """
+        Random nest sites on shelter cells, or on food cells if the area has no shelter
+        :param colonies: number of nests
+        :return: (colonies, 2) array of (row, column)
+        """
+        for coords in (self.area.shelter_coords, self.area.food_coords):
+            if len(coords):
+                return coords[self.rng.randint(len(coords), size=colonies)]
+        raise ValueError("There is no suitable nesting site for bees. Ensure field has some food or shelter")
+
+    def _reachable(self, coords: np.ndarray) -> tuple:
+        # Cells of coords within the foraging radius of each nest, with their distances
+        cells = []
+        distances = []
+        for x, y in self.nests:
+            distance = np.abs(coords[:, 0] - x) + np.abs(coords[:, 1] - y)
+            near = np.flatnonzero(distance <= self.radius)
+            cells.append(near)
+            distances.append(distance[near])
+        ptr = np.zeros(len(self.nests) + 1, dtype=np.int64)
+        ptr[1:] = np.cumsum([len(near) for near in cells])
+        return ptr, np.concatenate(cells + [np.empty(0, dtype=np.int64)]), \
+            np.concatenate(distances + [np.empty(0, dtype=np.int64)])
+
+    def _die(self):
+        roll = self.rng.random_sample(self.alive.shape)
+        self.alive &= roll >= death_probability(self.food_level, self.death_factor)
+
+    def forage(self):
+        """
+        One foraging trip by every living worker
+        """
+        shape = self.alive.shape
+        count = self.food_count[:, None]
+        has_food = np.broadcast_to(count > 0, shape)
+        # A random reachable food cell for each worker
+        pick = self.food_ptr[:-1, None] + (self.rng.random_sample(shape) * count).astype(np.int64)
+        pick = np.where(has_food, pick, 0)
+        if len(self.food_distance):
+            distance = self.food_distance[pick]
+            eat_chance = self.eat_chance[pick]
+        else:
+            distance = np.zeros(shape, dtype=np.int64)
+            eat_chance = np.zeros(shape)
+        # No flowers in reach: the worker searches to the edge of its range and back for nothing
+        distance = np.where(has_food, distance, self.radius)
+        reached = self.rng.random_sample(shape) < 0.999
+        success = has_food & reached & (self.rng.random_sample(shape) < eat_chance) & self.alive
+        cost = distance * self.food_unit
+        self.food_level = np.where(success, 100 - cost, np.maximum(self.food_level - 2 * cost, 0))
+        self.trips += self.alive.sum(axis=1)
+        self.successes += success.sum(axis=1)
+        self.store += self.nectar_load * success.sum(axis=1)
+        self._die()
+
+    def night(self):
+        """
+        A night in the nest. The colony's store is shared out among the living workers first, and whatever it can't
+        cover comes out of each worker's own food.
+        """
+        need = self.night_cost * self.alive.sum(axis=1)
+        fed = np.divide(np.minimum(self.store, need), need, out=np.ones_like(need), where=need > 0)
+        self.store -= fed * need
+        self.food_level = np.maximum(self.food_level - ((1 - fed) * self.night_cost)[:, None], 0)
+        self._die()
+
+    def run(self, days: int = 1):
+        """
+        Runs every colony for the given number of days
+        """
+        for day in range(days):
+            for trip in range(self.trips_per_day):
+                self.forage()
+            self.night()
+            self.days += 1
+
+    def results(self) -> np.ndarray:
+        """
+        Colony-level results so far, one record per colony. See colony_dtype.
+        :return: structured np.ndarray
+        """
+        records = np.zeros(len(self.nests), dtype=colony_dtype)
+        records['x'] = self.nests[:, 0]
+        records['y'] = self.nests[:, 1]
+        records['workers'] = self.alive.shape[1]
+        records['alive'] = self.alive.sum(axis=1)
+        records['worker_loss'] = 1 - records['alive'] / max(1, self.alive.shape[1])
+        records['trips'] = self.trips
+        records['successes'] = self.successes
+        records['foraging_success'] = self.successes / np.maximum(self.trips, 1)
+        records['store'] = self.store
+        records['food_cells'] = self.food_count
+        records['shelter_cells'] = np.diff(self.shelter_ptr)
+        return records
@@ -0,0 +1,173 @@
+from Animal.Role import EGG, CATERPILLAR, PUPA
+from Animal.Danaus.plexippus import Monarch
+from Land_Use.Land import Area
+import numpy as np
+
+
+# The numbers from Monarch.laying_eggs and Monarch.caterpillar
+eggs_mean = 550
+eggs_scale = 125
+weekly_survival = 0.68129
+pupa_survival = 0.68219
+development_weeks = (4, 5, 6)
+starting_food = 25
+weekly_food = 18.75
+
+# Layout of the adults handed back by MonarchCohorts.step()
+adult_dtype = np.dtype([('x', np.int32), ('y', np.int32), ('count', np.int64), ('weeks', np.int8),
+                        ('food_level', np.float32)])
+
+
+class MonarchCohorts:
+    """
+    Eggs, caterpillars and pupae kept as counts instead of one Monarch object each, so generations of hundreds of
+    thousands of offspring can be followed cheaply. A cohort is every egg laid in one cell in the same week that will
+    take the same number of weeks to pupate, and a whole cohort's survival is one binomial draw.
+
+    The life cycle is the one in Monarch.caterpillar: a clutch of normal(550, 125) eggs that only survives if it is laid
+    on a food (milkweed) cell, 4, 5 or 6 weeks (equally likely) to pupate, a weekly survival chance of 0.68129 as an
+    egg and a caterpillar and 0.68219 for the week as a pupa. An adult comes out with 25 food plus 18.75 for every
+    week it spent as a caterpillar, and is handed back from step() for the adult simulation to carry on with.
+    >>> cohorts = MonarchCohorts(Area([[2, 2], [1, 3]]), rng=np.random.RandomState(0))
+    >>> cohorts.lay([0, 0, 1], [0, 1, 0])
+    >>> int(cohorts.lost) > 0, cohorts.stage_totals()[EGG] > 0
+    (True, True)
+    >>> adults = cohorts.run(7)
+    >>> sorted(set(adults['food_level'].tolist())) == sorted({25 + 18.75 * (w - 1) for w in adults['weeks']})
+    True
+    >>> len(cohorts.count), int(adults['count'].sum()) == int(cohorts.emerged)
+    (0, True)
+    """
+
+    def __init__(self, area: Area, rng=None):
+        """
+        :param area: the Area (or CropField) the eggs are laid on
+        :param rng: source of random numbers, np.random (the default) or a np.random.RandomState
+        """
+        self.area = area
+        self.rng = np.random if rng is None else rng
+        # One entry per cohort
+        self.x = np.empty(0, dtype=np.int32)
+        self.y = np.empty(0, dtype=np.int32)
+        self.weeks = np.empty(0, dtype=np.int8)
+        self.age = np.empty(0, dtype=np.int8)
+        self.count = np.empty(0, dtype=np.int64)
+        # Running totals
+        self.laid = 0
+        self.lost = 0
+        self.emerged = 0
+        self.week = 0
+
+    def lay(self, xs, ys, eggs=None):
+        """
+        Lays one clutch in each of the given cells, e.g., one per female. Clutches laid anywhere but on food are lost.
+        :param xs: rows of the cells
+        :param ys: columns of the cells
+        :param eggs: eggs in each clutch, drawn like Monarch.laying_eggs if not given
+        """
+        xs = np.asarray(xs, dtype=np.int32).ravel()
+        ys = np.asarray(ys, dtype=np.int32).ravel()
+        if eggs is None:
+            eggs = np.maximum(self.rng.normal(eggs_mean, eggs_scale, len(xs)), 0).astype(np.int64)
+        eggs = np.broadcast_to(np.asarray(eggs, dtype=np.int64), xs.shape)
+        self.laid += int(eggs.sum())
+        inside = (xs >= 0) & (xs < self.area.shape[0]) & (ys >= 0) & (ys < self.area.shape[1])
+        if isinstance(self.area.array, np.ndarray):
+            on_food = inside & (self.area.array[np.where(inside, xs, 0), np.where(inside, ys, 0)] == 2)
+        else:
+            on_food = np.array([bool(ok) and self.area.array[int(x)][int(y)] == 2 for x, y, ok in zip(xs, ys, inside)],
+                               dtype=bool)
+        self.lost += int(eggs[~on_food].sum())
+        xs, ys, eggs = xs[on_food], ys[on_food], eggs[on_food]
+        # Split every clutch between the development times with chained binomials, the same as a multinomial draw
+        left = eggs
+        for i, weeks in enumerate(development_weeks):
+            share = left if i == len(development_weeks) - 1 else \
+                self.rng.binomial(left, 1 / (len(development_weeks) - i))
+            left = left - share
+            keep = share > 0
+            self.x = np.concatenate((self.x, xs[keep]))
+            self.y = np.concatenate((self.y, ys[keep]))
+            self.weeks = np.concatenate((self.weeks, np.full(keep.sum(), weeks, dtype=np.int8)))
+            self.age = np.concatenate((self.age, np.zeros(keep.sum(), dtype=np.int8)))
+            self.count = np.concatenate((self.count, share[keep]))
+
+    def stage(self) -> np.ndarray:
+        """
+        The stage of every cohort as a status code: EGG in its first week, PUPA in its last, CATERPILLAR in between
+        """
+        return np.where(self.age == 0, EGG, np.where(self.age == self.weeks, PUPA, CATERPILLAR))
+
+    def stage_totals(self) -> dict:
+        """
+        How many are alive in each stage, keyed by status code
+        """
+        stage = self.stage()
+        return {code: int(self.count[stage == code].sum()) for code in (EGG, CATERPILLAR, PUPA)}
+
+    def stage_raster(self, code: int) -> np.ndarray:
+        """
+        How many of one stage there are in each cell of the area
+        :param code: EGG, CATERPILLAR or PUPA
+        :return: int64 array the shape of the area
+        """
+        raster = np.zeros(self.area.shape, dtype=np.int64)
+        chosen = self.stage() == code
+        np.add.at(raster, (self.x[chosen], self.y[chosen]), self.count[chosen])
+        return raster
+
+    def step(self) -> np.ndarray:
+        """
+        One week: every cohort rolls for survival, gets a week older, and the pupae that made it come out as adults
+        :return: the new adults, one record per cohort that emerged (see adult_dtype)
+        """
+        survival = np.where(self.age == self.weeks, pupa_survival, weekly_survival)
+        self.count = self.rng.binomial(self.count, survival)
+        self.age += 1
+        self.week += 1
+        done = self.age > self.weeks
+        adults = np.zeros(int(done.sum()), dtype=adult_dtype)
+        adults['x'] = self.x[done]
+        adults['y'] = self.y[done]
+        adults['count'] = self.count[done]
+        adults['weeks'] = self.weeks[done]
+        adults['food_level'] = starting_food + weekly_food * (self.weeks[done] - 1)
+        adults = adults[adults['count'] > 0]
+        self.emerged += int(adults['count'].sum())
+        # Cohorts that emerged or died out are dropped
+        keep = ~done & (self.count > 0)
+        self.x, self.y, self.weeks, self.age, self.count = \
+            self.x[keep], self.y[keep], self.weeks[keep], self.age[keep], self.count[keep]
+        return adults
+
+    def run(self, weeks: int) -> np.ndarray:
+        """
+        Runs a number of weeks
+        :return: all the adults that emerged, as from step()
+        """
+        adults = [self.step() for week in range(weeks)]
+        return np.concatenate(adults) if adults else np.zeros(0, dtype=adult_dtype)
+
+
+def to_monarchs(adults: np.ndarray, area: Area, limit: int = None, rng=None) -> list:
+    """
+    Turns adults from MonarchCohorts.step() into Monarch objects in the cells they emerged in, with the food they came
+    out with, for the adult simulation
+    :param adults: records from step() or run()
+    :param area: the area they emerged on
+    :param limit: most Monarchs to make, None for all of them
+    :param rng: source of random numbers for the new Monarchs
+    :return: list of Monarch
+    >>> adults = np.array([(0, 0, 2, 3, 62.5), (1, 1, 1, 4, 81.25)], dtype=adult_dtype)
+    >>> [m.position for m in to_monarchs(adults, Area([[2, 2], [1, 3]]), rng=np.random.RandomState(0))]
+    [(0, 0), (0, 0), (1, 1)]
+    """
+    monarchs = []
+    for record in adults:
+        for i in range(int(record['count'])):
+            if limit is not None and len(monarchs) >= limit:
+                return monarchs
+            monarch = Monarch(area, position=(int(record['x']), int(record['y'])), rng=rng)
+            monarch.food_level = min(100.0, float(record['food_level']))
+            monarchs.append(monarch)
+    return monarchs
@@ -1,6 +1,7 @@
 #!/home/joshua/anaconda3/bin/python
 
 from Animal.Role import Pollinator
+from Functions.Profiling import profiled
 from Land_Use.Land import *
 
 
@@ -16,13 +17,13 @@ class Monarch(Pollinator):
     >>> print(b1.food_level)
     100
     >>> b1.position
-    [1, 3]
+    (1, 3)
     >>> b1
-    Monarch: 100.0% food at [1, 3], status: alive
+    Monarch: 100.0% food at (1, 3), status: alive
     >>> b2 = Monarch(days = 2, hours = 6, position = [1, 3])
     >>> b2.food_level = 100
     >>> print(b1)
-    Monarch with 100.0% food at [1, 3], status: alive
+    Monarch with 100.0% food at (1, 3), status: alive
     >>> b2.days
     2
     >>> b2.hours
@@ -33,29 +34,36 @@ class Monarch(Pollinator):
     can_exit_north = True
     exit_chance = 0.9
     shelter_chance = 0.01
-
-    def __init__(self, area: Area = Area([[1, 1, 1, 1], [1, 1, 1, 1], [1, 1, 1, 1], [4, 4, 4, 4]]),
-                 days: int = 0, hours: int = 4, seconds: int = 0, position: list = (0, 0)):
-        Pollinator.__init__(self, area, days, hours, seconds)
+    # Monarchs can't fly much below 13 degrees C
+    flight_temperature = 13.0
+    # From half full up it flies north (see late_morning_activity), below that it looks for food
+    fed_level = 50.0
+    north_bias = 0.925
+    __slots__ = ()
+
+    def __init__(self, area: Area = None,
+                 days: int = 0, hours: int = 4, seconds: int = 0, position: tuple = None, rng=None, seed=None,
+                 recording: bool = True):
+        Pollinator.__init__(self, area, days, hours, seconds, position, rng, seed, recording)
         # This gives the starting position, unless starting position was already declared
-        if position == (0, 0):
-            __variable = np.random.choice([0, 1, 2, 3], p=[0.625, 0.125, 0.125, 0.125])
+        if position is None:
+            __variable = self.rng.choice([0, 1, 2, 3], p=[0.625, 0.125, 0.125, 0.125])
             if __variable == 0:
-                temp_position = (self.area_length - 1, np.random.randint(self.area_width))
+                temp_position = (self.area_length - 1, self.rng.randint(self.area_width))
             elif __variable == 1:
-                temp_position = (np.random.randint(int(self.area_length/2), self.area_length-1), 0)
+                temp_position = (self.rng.randint(int(self.area_length/2), self.area_length-1), 0)
             elif __variable == 2:
-                temp_position = (np.random.randint(int(self.area_length/2), self.area_length-1), self.area_width-1)
+                temp_position = (self.rng.randint(int(self.area_length/2), self.area_length-1), self.area_width-1)
             else:
-                if self.shelter_indices:
-                    temp_position = list(self.shelter_indices[np.random.choice(len(self.shelter_indices))])
+                if len(self.area.shelter_coords):
+                    temp_position = self.area.shelter_coords[self.rng.choice(len(self.area.shelter_coords))]
                 else:
                     temp_position = (self.area_length - 1, 0)
             self.position = temp_position
-            self.moves = [temp_position]
+            self.moves = [self.position]
         else:
             self.position = position
-            self.moves = [self.position[:]]
+            self.moves = [self.position]
         if 4 <= self.hours < 6:
             self.sheltered = True
 
@@ -77,7 +85,6 @@ class Monarch(Pollinator):
         >>> b3.position = (0, 0)
         >>> b3.morning_activity()
         >>> assert(b3.sheltered is False)
-        >>> b3.sheletere = True
         >>> b3.position = (3, 3)
         >>> b3.food_level = 10
         >>> assert(b3.sheltered is False)
@@ -86,21 +93,21 @@ class Monarch(Pollinator):
         # it is super hungry
         if self.sheltered:
             # number of times it will move randomly
-            times = np.random.randint(10)
+            times = self.rng.randint(10)
             # Just a check to make sure it is actually in a tree Land_Use and marked as sheltered...
-            if self.area.array[self.position[0]][self.position[1]] not in [3, 4]:
+            if self.area.array[self._x][self._y] not in [3, 4]:
                 self.sheltered = False
                 # 50/50 chance that the butterfly soars instead of moving randomly
-                if np.random.choice([True, False]):
+                if self.rng.choice([True, False]):
                     self.random_move(times)
                 else:
                     self.soar()
                 self.turns += times
             # if it's still sheltered but it's food level is low, or random chance kicks in, it will leave shelter
-            elif self.food_level < 25 or np.random.choice([True, False], p=[0.1, 0.9]):
+            elif self.food_level < 25 or self.rng.choice([True, False], p=[0.1, 0.9]):
                 self.sheltered = False
                 # 50/50 chance that the butterfly soars instead of moving randomly
-                if np.random.choice([True, False]):
+                if self.rng.choice([True, False]):
                     self.random_move(times)
                 else:
                     self.soar()
@@ -133,7 +140,6 @@ class Monarch(Pollinator):
         >>> b3.position = (0, 0)
         >>> b3.morning_activity()
         >>> assert(b3.sheltered is False)
-        >>> b3.sheletere = True
         >>> b3.position = (3, 3)
         >>> b3.food_level = 10
         >>> assert(b3.sheltered is False)
@@ -142,22 +148,22 @@ class Monarch(Pollinator):
         moves_possible = int(self.food_level // self.food_unit)
         if self.sheltered:
             # number of times it moves randomly
-            times = np.random.randint(10)
+            times = self.rng.randint(10)
             # Just a check to make sure it is actually in a tree Land_Use and marked as sheltered...
-            if self.area.array[self.position[0]][self.position[1]] not in [3, 4]:
+            if self.area.array[self._x][self._y] not in [3, 4]:
                 self.sheltered = False
                 # 50/50 chance that the butterfly soars instead of moving randomly
-                if np.random.choice([True, False]):
+                if self.rng.choice([True, False]):
                     self.random_move(times)
                 else:
                     self.soar()
                 self.turns += times
 
             # If it's still sheltered, meaning its in a legal shelter site, then most likely it will move
-            elif self.food_level < 25 or np.random.choice([True, False], p=[.9, .1]):
+            elif self.food_level < 25 or self.rng.choice([True, False], p=[.9, .1]):
                 self.sheltered = False
                 # 50/50 chance that the butterfly soars instead of moving randomly
-                if np.random.choice([True, False]):
+                if self.rng.choice([True, False]):
                     self.soar()
                 else:
                     self.soar()
@@ -174,12 +180,12 @@ class Monarch(Pollinator):
         elif self.food_level >= 50.0:
             # Usually, it will try to move north
 
-            move_die = np.random.choice(int(moves_possible // 2))
+            move_die = self.rng.choice(int(moves_possible // 2))
 
             for i in range(move_die):
-                direction_die = np.random.choice(['north', 'south', 'east', 'west'],
+                direction_die = self.rng.choice(['north', 'south', 'east', 'west'],
                                                  p=[0.925, 0.025, 0.025, 0.025])
-                random_chance = np.random.choice([False, True], p=[.995, 0.005])
+                random_chance = self.rng.choice([False, True], p=[.995, 0.005])
                 if random_chance:
                     self.random_move()
                 else:
@@ -189,7 +195,7 @@ class Monarch(Pollinator):
 
         # if it's a little hungry, it may seek food
         elif 25.0 <= self.food_level < 50.0:
-            if np.random.choice([True, False], p=[0.001, 0.999]):
+            if self.rng.choice([True, False], p=[0.001, 0.999]):
                 # slight chance of moving randomly instead
                 self.random_move()
 
@@ -200,7 +206,7 @@ class Monarch(Pollinator):
 
         # now it's very hungry and will almost certainly seek food
         elif self.food_level < 25.0:
-            if np.random.choice([True, False], p=[0.0001, 0.9999]):
+            if self.rng.choice([True, False], p=[0.0001, 0.9999]):
                 self.random_move()
 
             # otherwise look for food
@@ -215,13 +221,13 @@ class Monarch(Pollinator):
         :return: None | self
         """
         # Number of times to randomly move
-        times = np.random.randint(10)
+        times = self.rng.randint(10)
 
         # If it's still sheltered at this point, break shelter
         if self.sheltered:
             self.sheltered = False
             # 50/50 chance that the butterfly soars instead of moving randomly
-            if np.random.choice([True, False]):
+            if self.rng.choice([True, False]):
                 self.random_move(times)
             else:
                 self.soar()
@@ -251,19 +257,19 @@ class Monarch(Pollinator):
         """
 
         # otherwise it's going to look for food to fill its belly before sleep, unless it's full
-        if self.food_level <= 75 and self.food_indices:
+        if self.food_level <= 75 and self.area.has_resource('food'):
             self.seek_resource('food')
         else:
-            if np.random.choice([True, False]):
+            if self.rng.choice([True, False]):
                 self.soar()
             else:
                 moves_possible = int(self.food_level // self.food_unit)
-                move_die = np.random.choice(int(moves_possible // 2))
+                move_die = self.rng.choice(int(moves_possible // 2))
 
                 for i in range(move_die):
-                    direction_die = np.random.choice(['north', 'south', 'east', 'west'],
+                    direction_die = self.rng.choice(['north', 'south', 'east', 'west'],
                                                      p=[0.925, 0.025, 0.025, 0.025])
-                    random_chance = np.random.choice([False, True], p=[.995, 0.005])
+                    random_chance = self.rng.choice([False, True], p=[.995, 0.005])
                     if random_chance:
                         self.random_move()
                     else:
@@ -289,14 +295,14 @@ class Monarch(Pollinator):
 
 
         # Number of times to randomly move
-        times = np.random.randint(10)
+        times = self.rng.randint(10)
         if self.sheltered:
             # At night it will batten down the hatches and stay sheltered
             # If for whatever reason it is marked as sheltered but isn't in a tree...
-            if self.area.array[self.position[0]][self.position[1]] not in [3, 4]:
+            if self.area.array[self._x][self._y] not in [3, 4]:
                 self.sheltered = False
                 # 50/50 chance that the butterfly soars instead of moving randomly
-                if np.random.choice([True, False]):
+                if self.rng.choice([True, False]):
                     self.random_move(times)
                 else:
                     self.soar()
@@ -308,14 +314,14 @@ class Monarch(Pollinator):
                 self.turns += 144
                 return
         # This is the case that it is alive and near shelter. At this time it will take shelter
-        elif self.area.array[self.position[0]][self.position[1]] in [3, 4]:
+        elif self.area.array[self._x][self._y] in [3, 4]:
             self.sheltered = True
             self.decrement_food(self.food_unit / 2)
             self.turns += 144
             return
         else:
             # otherwise it's going to look for shelter
-            if self.shelter_indices:
+            if self.area.has_resource('shelter'):
                 self.seek_resource('shelter')
             else:
                 for i in range(times):
@@ -338,7 +344,7 @@ class Monarch(Pollinator):
         """
         # Monarchs lay between 300 and 800 eggs, so I counted that as 2 standard deviations around a mean of 550, making
         # 90% of their behavior
-        eggs_laid = np.random.normal(550, scale=125)
+        eggs_laid = self.rng.normal(550, scale=125)
         # it tries to seek a place to lay it's food.
         # TODO: implement an incemental option for resource seeking to allow for a butterfly to abort the attempt and
         #  simply lay it's eggs wherever it is
@@ -346,8 +352,8 @@ class Monarch(Pollinator):
             self.seek_resource('food', incremental=True)
             self.decrement_food(self.food_unit)
         location_of_eggs = self.position
-        x = self.position[0]
-        y = self.position[1]
+        x = self._x
+        y = self._y
         if location_of_eggs[x][y] == 2:
             #success
             pass
@@ -372,9 +378,9 @@ class Monarch(Pollinator):
         # We'll assume all caterpillars start with a basic amount of food supplied by the egg
         self.food_level == 25
         self.status == 'egg'
-        random = np.random.randint(4, 7)
+        random = self.rng.randint(4, 7)
         for weeks in range(random + 1):
-            chances = np.random.random()
+            chances = self.rng.random()
             if weeks == random:
                 self.status == 'pupa'
                 if chances > 0.68219:
@@ -398,21 +404,35 @@ class Monarch(Pollinator):
             # If it survives the gauntlet, it is set to 'alive,' the default status for an adult butterfly! Yay!
             self.status == 'alive'
 
+    @profiled('soar')
     def soar(self):
         """
-        A monarch is capable of catching a windstream and soaring quite a ways. This will help it move north
-
+        A monarch is capable of catching a windstream and soaring quite a ways. This will help it move north. If the
+        drift, wind and all, would carry it off the side of the area, it keeps to its column.
+        >>> from Land_Use.Weather import Weather
+        >>> area = Area([[1] * 20] * 40)
+        >>> area.weather = Weather(np.zeros((24, 1, 1), bool), np.full((24, 1, 1), 8), np.full((24, 1, 1), 20.0))
+        >>> columns = set()
+        >>> for seed in range(50):
+        ...     b = Monarch(area, position=(30, 15), seed=seed)
+        ...     b.soar()
+        ...     columns.add(b.position[1])
+        >>> sorted(columns)
+        [15, 18, 19]
         """
-        if self.position[0] > 10:
-            moves = np.random.randint(10, self.position[0])
-            self.record_moves(self.position[0]-moves, self.position[1])
-            drift = np.random.randint(-5, high=5)
-            if self.area_width >= self.position[1] + drift >= 0:
-                y1 = self.position[1] + drift
+        if self._x > 10:
+            moves = self.rng.randint(10, self._x)
+            self.record_moves(self._x-moves, self._y)
+            drift = self.rng.randint(-5, high=5)
+            # The wind, if the area has weather, pushes it further east or west
+            if self.area.weather is not None:
+                drift += self.area.weather.wind_at(self.days, self.hours, self._x, self._y)
+            if self.area_width > self._y + drift >= 0:
+                y1 = self._y + drift
             else:
-                y1 = self.position[1]
-            self.position = (self.position[0]-moves, y1)
+                y1 = self._y
+            self.position = (self._x-moves, y1)
         else:
-            self.record_moves(0, self.position[1])
-            self.position = (0, self.position[1])
+            self.record_moves(0, self._y)
+            self.position = (0, self._y)
             self.check_if_exit()
@@ -1,8 +1,26 @@
-from Land_Use.Land import Area
-from Functions.Operations import manhattan_distance
+from Land_Use.Land import Area, default_area
+from Functions.Operations import clock
+from Functions.Profiling import profiled
 import numpy as np
 
 
+# Status codes. Pollinators keep their status as one of these small integers, and the status property translates to
+# and from the names used everywhere else.
+ALIVE = 0
+DEAD = 1
+EXIT = 2
+EGG = 3
+CATERPILLAR = 4
+PUPA = 5
+STATUS_NAMES = ('alive', 'dead', 'exit', 'egg', 'caterpillar', 'pupa')
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+
+# Layout of the record array made by to_records()
+record_dtype = np.dtype([('species', 'U16'), ('status', np.uint8), ('x', np.int32), ('y', np.int32),
+                         ('food_level', np.float32), ('sheltered', np.bool_), ('days', np.int32),
+                         ('hours', np.int8), ('seconds', np.int32)])
+
+
 class Pollinator:
     """
     Generic Pollinator class which the others will be based on. All animals are tied to an Land_Use, so there must be an
@@ -23,29 +41,68 @@ class Pollinator:
     # Others will only exit if on the north edge (e.g., monarchs)
     can_exit = False
     shelter_chance = 0.5
-
-    def __init__(self, area: Area = Area([[1, 1, 1, 1], [1, 1, 1, 1], [1, 1, 1, 1], [4, 4, 4, 4]]),
-                 days: int = 0, hours: int = 4, seconds: int = 0, position: tuple = (0, 0)):
+    # Coldest temperature (degrees C) the pollinator will fly in when the area has weather, None for no limit
+    flight_temperature = None
+    # Whether seek_resource follows the cheapest path over the land cover (see Area.cost_field) instead of flying
+    # straight to the nearest resource, and the costs of crossing each land class (None for the defaults)
+    land_cover_aware = False
+    travel_costs = None
+    # How it gets about by day, for models that don't run the behavior itself (see Functions.Markov). With at least
+    # fed_level food it roams, heading north on a move with chance north_bias; with less it looks for food. This one
+    # looks for food all day long.
+    fed_level = 100.0
+    north_bias = 0.25
+    # Pollinators are kept by the hundreds of thousands, so the state is slotted rather than kept in a __dict__.
+    # Subclasses should declare __slots__ as well (an empty tuple if they add no state).
+    __slots__ = ('rng', 'profiler', 'food_level', '_status', 'area_length', 'area_width', 'area', '_x', '_y',
+                 'moves', 'sheltered', 'days', 'hours', 'seconds', 'turns', 'seed', 'start', 'recording', 'exposure',
+                 'exposed_turns', 'death_tilt', 'exit_tilt', 'weight')
+
+    def __init__(self, area: Area = None,
+                 days: int = 0, hours: int = 4, seconds: int = 0, position: tuple = None, rng=None, seed=None,
+                 recording: bool = True):
         """
         This class is dependent on the Area class, as a pollinator must exist somewhere in this simulation. So the input
         is an Area, and it performs some calculations to
         :param area: An area object, default is a simple 4x4 area
-        """
+        :param position: (row, column) to start in, (0, 0) if None. Kinds of pollinator that pick their own start
+        (e.g., Monarch) only do so when it is None.
+        :param rng: source of random numbers, either np.random (the default) or a np.random.RandomState
+        :param seed: seed for a random number source of its own (an int or a list of ints), instead of rng. Only
+        pollinators with a seed can be replayed, see replay().
+        :param recording: whether to keep every move. If False, moves only holds the start, the first position inside
+        the area after it and the latest one, which is all the simulation itself needs.
+        """
+        if seed is not None:
+            if rng is not None:
+                raise ValueError("Give a pollinator either a seed or an rng, not both")
+            seed = int(seed) if np.ndim(seed) == 0 else [int(part) for part in seed]
+            rng = np.random.RandomState(seed)
+        # Every random draw the pollinator makes goes through this, so a run can be seeded or counted
+        self.rng = np.random if rng is None else rng
+        # The seed and the starting conditions are all it takes to run this pollinator again
+        self.seed = seed
+        self.start = (days, hours, seconds, position)
+        self.recording = recording
+        # Optional PhaseProfiler (see Functions.Profiling). None means no profiling and almost no overhead.
+        self.profiler = None
+        if area is None:
+            area = default_area()
         # Pollinators start out alive with a random amount of food from a normal distribution centered at 50.
-        self.food_level = float(int(np.random.normal(50, scale=20)))
+        self.food_level = float(int(self.rng.normal(50, scale=20)))
         if self.food_level < 0.0:
             self.food_level = 0.0
         elif self.food_level > 100.0:
             self.food_level = 100.0
-        self.status = "alive"
+        self._status = ALIVE
         self.area_length = area.shape[0]
         self.area_width = area.shape[1]
         self.area = area
+        if position is None:
+            position = (0, 0)
         self.position = position
-        self.moves = [position]
+        self.moves = [self.position]
         self.sheltered = False
-        self.food_indices = area.food_indices
-        self.shelter_indices = area.shelter_indices
         # This defines the starting time of the pollinator. For the simualtion, the inital time will start a 4 am,
         # which is roughly sunup in the midwest in the summer. But other pollinator_types that enter may enter at different
         # times, so I'll leave it open.
@@ -53,6 +110,14 @@ class Pollinator:
         self.hours = hours
         self.seconds = seconds
         self.turns = 0
+        # Hazard picked up since the last check_for_death, see Land_Use.Developed.hazard, and the turns of moving
+        # into cells it already includes
+        self.exposure = 0.0
+        self.exposed_turns = 0
+        # Importance sampling, see tilt(). Untilted pollinators always weigh 1.
+        self.death_tilt = 1.0
+        self.exit_tilt = 1.0
+        self.weight = 1.0
 
     def __str__(self):
         return '{} with {:.1f}% food at {}, status: {}'.format(type(self).__name__, self.food_level, self.position,
@@ -62,19 +127,190 @@ class Pollinator:
         return '{}: {:.1f}% food at {}, status: {}'.format(type(self).__name__, self.food_level, self.position,
                                                                self.status)
 
+    @property
+    def status(self) -> str:
+        """
+        The status as a name, e.g., 'alive'. It can be set with either a name or one of the status codes.
+        >>> b1 = Pollinator()
+        >>> b1.status = DEAD
+        >>> b1.status
+        'dead'
+        """
+        return STATUS_NAMES[self._status]
+
+    @status.setter
+    def status(self, value):
+        if isinstance(value, str):
+            self._status = STATUS_CODES[value]
+        else:
+            self._status = int(value)
+        if self.area.agent_grid is not None:
+            if self._status == ALIVE:
+                self.area.agent_grid.move(self, self._x, self._y)
+            else:
+                self.area.agent_grid.remove(self)
+
+    @property
+    def position(self) -> tuple:
+        """
+        The (row, column) position. It is stored as two integers, so any pair of numbers can be assigned to it and it
+        always reads back as a tuple. (A list position used to be kept as a list, which never matched the tuples of
+        food and shelter cells, so e.g. a monarch that started on a shelter cell didn't know it was on one.)
+        >>> b1 = Pollinator()
+        >>> b1.position = [1, 3]
+        >>> b1.position
+        (1, 3)
+        """
+        return self._x, self._y
+
+    @position.setter
+    def position(self, value):
+        self._x = int(value[0])
+        self._y = int(value[1])
+        # Keep the area's AgentGrid up to date, if it has one. Only living pollinators are kept in it.
+        if self.area.agent_grid is not None and self._status == ALIVE:
+            self.area.agent_grid.move(self, self._x, self._y)
+
+    def neighbours(self, radius: int, species: type = None) -> list:
+        """
+        The other living pollinators within radius cells of this one. The area must be tracking agents, see
+        Area.track_agents.
+        :param species: if given, only pollinators of this class
+        :return: list of pollinators
+        """
+        return [other for other in self.area.agent_grid.within(self._x, self._y, radius, species) if other is not self]
+
+    def nearest_conspecific(self, max_radius: int = None):
+        """
+        The closest other living pollinator of the same class, e.g., a potential mate. The area must be tracking
+        agents, see Area.track_agents.
+        :return: the pollinator, or None if there isn't one (within max_radius)
+        >>> area = Area([[1] * 20] * 20)
+        >>> grid = area.track_agents(cell_size=5)
+        >>> b1, b2, b3 = (Pollinator(area, position=p) for p in ((0, 0), (18, 18), (2, 3)))
+        >>> b1.nearest_conspecific().position, [b.position for b in b3.neighbours(5)]
+        ((2, 3), [(0, 0)])
+        >>> b3.position = (17, 17)
+        >>> b2.nearest_conspecific().position
+        (17, 17)
+        >>> b3.kill_it()
+        >>> len(grid), b2.nearest_conspecific().position
+        (2, (0, 0))
+        """
+        return self.area.agent_grid.nearest(self, max_radius=max_radius)
+
+    @property
+    def food_indices(self) -> list:
+        # Deprecated along with Area.food_indices, use self.area.food_coords
+        return self.area.food_indices
+
+    @property
+    def shelter_indices(self) -> list:
+        # Deprecated along with Area.shelter_indices, use self.area.shelter_coords
+        return self.area.shelter_indices
+
+    def enable_profiling(self, profiler):
+        """
+        Attaches a PhaseProfiler to this pollinator. Passing the same profiler to every pollinator in a run rolls the
+        numbers up across the whole population.
+        :param profiler: a Functions.Profiling.PhaseProfiler
+        :return: None | self
+        """
+        self.profiler = profiler
+        self.rng = profiler.counting(self.rng)
+        profiler.agents += 1
+
+    def tilt(self, death_tilt: float = 1.0, exit_tilt: float = 1.0):
+        """
+        Turns on importance sampling: every chance of dying (hazards included) is multiplied by death_tilt and every
+        chance of exiting by exit_tilt (neither going over 1), and weight keeps the likelihood ratio of everything that
+        was rolled, i.e., how much more likely the path taken was untilted. Averaging weight * (outcome happened) over
+        many tilted pollinators then estimates the untilted chance of the outcome, with far fewer pollinators when the
+        outcome is rare; see Functions.Importance. To estimate rare deaths, tilt death up and exit down (below 1), so
+        pollinators stay on the field longer.
+        Call it before the pollinator moves. The draws made are the same as without tilting.
+        :param death_tilt: factor on the chances of dying
+        :param exit_tilt: factor on the chances of exiting
+        :return: None | self
+        >>> b1 = Pollinator(seed=1)
+        >>> b1.tilt(death_tilt=10)
+        >>> b1.food_level = 95
+        >>> b1.check_for_death()
+        >>> b1.status, round(b1.weight, 4)
+        ('dead', 0.1)
+        """
+        if death_tilt <= 0 or exit_tilt <= 0:
+            raise ValueError("Tilts must be positive")
+        self.death_tilt = float(death_tilt)
+        self.exit_tilt = float(exit_tilt)
+
+    def _tilted_roll(self, roll: float, chance: float, tilt: float) -> bool:
+        # Whether the event happens when the chance is tilted, weighting for the chance it really had
+        tilted = min(1.0, chance * tilt)
+        if roll < tilted:
+            self.weight *= chance / tilted
+            return True
+        self.weight *= (1 - chance) / (1 - tilted)
+        return False
+
     def kill_it(self):
         """
         Right now this is a simple function to set the pollinator's status to "dead." I may improve this in the future
         :return: None | self
         """
-        self.status = 'dead'
+        self._status = DEAD
+        self._leave_grid()
+
+    def _leave_grid(self):
+        # Dead and departed pollinators are taken out of the area's AgentGrid, so it doesn't keep hold of them
+        if self.area.agent_grid is not None:
+            self.area.agent_grid.remove(self)
 
-    def check_for_death(self):
+    @profiled('check_for_death')
+    def check_for_death(self, turns: int = 1):
         """
-        Based on how much food it currently has, the pollinator's chances to die randomly change.
+        Based on how much food it currently has, the pollinator's chances to die randomly change. If the area has a
+        hazard (e.g., spraying), it first has to survive the hazard it picked up since the last check: the cells it
+        moved into, one turn each, plus the turns it spent without moving, in the cell it is in now.
+        :param turns: turns since the last check
         :return: None | self
-        """
-        roll_die = np.random.random_sample()
+        >>> from Land_Use.Developed.hazard import Hazard
+        >>> area = Area([[1, 1], [1, 1]])
+        >>> area.hazard = Hazard(area.shape, base=[[0.1, 0.1], [0.2, 0.2]])
+        >>> b1 = Pollinator(area, position=(0, 0), seed=0)
+        >>> b1.record_moves(1, 0)
+        >>> round(b1.exposure, 4)
+        0.2
+        >>> b1.food_level = 95
+        >>> b1.check_for_death(turns=4)
+        >>> b1.status, round(b1.exposure, 4), b1.exposed_turns
+        ('alive', 0.0, 0)
+        """
+        hazard = self.area.hazard
+        if hazard is not None:
+            # Turns spent moving have been charged for the cells moved into, the rest were spent here
+            dwell = turns - self.exposed_turns
+            self.exposed_turns = 0
+            if dwell > 0:
+                self.exposure += dwell * hazard.cell_exposure(self._x, self._y,
+                                                              clock(self.days, self.hours, self.seconds))
+            if self.exposure > 0:
+                exposure = self.exposure
+                self.exposure = 0.0
+                roll_die = self.rng.random_sample()
+                if self.death_tilt == 1.0:
+                    killed = roll_die < 1 - np.exp(-exposure)
+                else:
+                    killed = self._tilted_roll(roll_die, 1 - np.exp(-exposure), self.death_tilt)
+                if killed:
+                    self.kill_it()
+                    return
+        roll_die = self.rng.random_sample()
+        if self.death_tilt != 1.0:
+            if self._status == ALIVE and self._tilted_roll(
+                    roll_die, float(death_probability(self.food_level, self.death_factor)), self.death_tilt):
+                self.kill_it()
+            return
         if self.food_level > 90 and roll_die < self.death_factor / 10000:
             self.kill_it()
             return
@@ -118,6 +354,7 @@ class Pollinator:
         else:
             self.food_level = 0
 
+    @profiled('check_if_exit')
     def check_if_exit(self):
         """
         This function checks to see if a Pollinator is on an exit boundary and if so, if it can exit, and if so whether
@@ -127,26 +364,38 @@ class Pollinator:
 
         """
         # Case 1: it can exit or exit north and is in the top row.
-        if (self.can_exit_north or self.can_exit) and self.position[0] == 0:
-            self.status = np.random.choice(['exit', 'alive'],
-                                           p=[self.exit_chance, 1 - self.exit_chance])
+        if (self.can_exit_north or self.can_exit) and self._x == 0:
+            self._roll_exit()
         # Case 2: It can exit and is on the bottom row, the left column or the right column
-        elif self.can_exit and (self.position[0] == self.area_length - 1 or
-                                            self.position[1] == 0 or self.position[1] == self.area_width - 1):
-            self.status = np.random.choice(['exit', 'alive'],
-                                           p=[self.exit_chance, 1 - self.exit_chance])
+        elif self.can_exit and (self._x == self.area_length - 1 or
+                                            self._y == 0 or self._y == self.area_width - 1):
+            self._roll_exit()
         # Case 3: It is outside the borders.
-        elif (self.position[0] < 0 or self.position[0] > self.area_length - 1 or
-              self.position[1] < 0 or self.position[1] > self.area_width - 1):
+        elif (self._x < 0 or self._x > self.area_length - 1 or
+              self._y < 0 or self._y > self.area_width - 1):
             # If it CAN exit and it's wandered off the map, just mark it as gone
             if self.can_exit or self.can_exit_north:
-                self.status = 'exit'
-            # It CAN'T exit and needs to be returned to the map. We'll look through the moves list and find a time
-            # when it was on the map, then return it to that position. All Pollinators start on the map, so this will
-            # always find at least one valid index.
-            for i in range(len(self.moves)):
-                if self.area_length-1 >= self.moves[-i][0] >=0 and self.area_width-1 >= self.moves[-i][1] >= 0:
-                    self.position = self.moves[-i]
+                self._status = EXIT
+                self._leave_grid()
+            # It CAN'T exit and needs to be returned to the map. We'll look through the moves list for the first time
+            # after the start that it was on the map, and return it to that position, or to the start if there is
+            # none. All Pollinators start on the map, so this will always find one. (With recording off, the moves
+            # list keeps exactly those positions.)
+            for x, y in self.moves[1:] + self.moves[:1]:
+                if self.area_length - 1 >= x >= 0 and self.area_width - 1 >= y >= 0:
+                    self.position = (x, y)
+                    break
+
+    def _roll_exit(self):
+        chance = self.exit_chance
+        if self.exit_tilt == 1.0:
+            self._status = int(self.rng.choice((EXIT, ALIVE), p=[chance, 1 - chance]))
+        else:
+            tilted = min(1.0, chance * self.exit_tilt)
+            self._status = int(self.rng.choice((EXIT, ALIVE), p=[tilted, 1 - tilted]))
+            self.weight *= chance / tilted if self._status == EXIT else (1 - chance) / (1 - tilted)
+        if self._status == EXIT:
+            self._leave_grid()
 
     def record_moves(self, x1: int, y1: int):
         """
@@ -167,36 +416,95 @@ class Pollinator:
         >>> b1.moves
         [(0, 0), (1, 0), (2, 0), (2, 1), (2, 2), (2, 2)]
         """
-        x0 = self.position[0]
-        y0 = self.position[1]
+        x0 = self._x
+        y0 = self._y
+        x1 = int(x1)
+        y1 = int(y1)
         if x0 == x1 and y0 == y1:
             self.turns += 1
-            self.moves.append((x0, y0))
-        if x1 > x0:
-            for i in range(abs(x0 - x1)):
-                x0 += 1
-                self.moves.append((x0, y0))
-                self.turns += 1
-        elif x1 < x0:
-            for i in range(abs(x0 - x1)):
-                x0 -= 1
-                self.moves.append((x0, y0))
-                self.turns += 1
-        else:
-            pass
-        if y1 > y0:
-            for j in range(abs(y0 - y1)):
-                y0 += 1
-                self.moves.append((x0, y0))
-                self.turns += 1
-        elif y1 < y0:
-            for i in range(abs(y0 - y1)):
-                y0 -= 1
-                self.moves.append((x0, y0))
-                self.turns += 1
+            self._record(x0, y0)
+            return
+        # It goes north-south first, then east-west
+        step = 1 if x1 > x0 else -1
+        xs = list(range(x0 + step, x1 + step, step)) if x1 != x0 else []
+        step = 1 if y1 > y0 else -1
+        ys = list(range(y0 + step, y1 + step, step)) if y1 != y0 else []
+        self._record_path(xs + [x1] * len(ys), [y0] * len(xs) + ys)
+
+    def _record_path(self, path_x: list, path_y: list):
+        """
+        Records moves into each cell of a path in turn, one turn per cell
+        """
+        if self.area.hazard is not None:
+            self.exposure += self.area.hazard.leg_exposure(path_x, path_y, clock(self.days, self.hours, self.seconds))
+            self.exposed_turns += len(path_x)
+        if self.recording:
+            self.moves.extend(zip(path_x, path_y))
         else:
-            pass
+            if len(self.moves) == 1:
+                for i in range(len(path_x)):
+                    if self._keep_last(path_x[i], path_y[i]):
+                        break
+            for i in range(len(path_x) - 1, -1, -1):
+                if self._keep_last(path_x[i], path_y[i]):
+                    break
+        self.turns += len(path_x)
+        if self.area.occupancy is not None:
+            self.area.occupancy.add(path_x, path_y)
 
+    def _record(self, x: int, y: int):
+        """
+        Records a single move into cell (x, y)
+        """
+        if self.area.hazard is not None:
+            self.exposure += self.area.hazard.cell_exposure(x, y, clock(self.days, self.hours, self.seconds))
+            self.exposed_turns += 1
+        if self.recording:
+            self.moves.append((x, y))
+        else:
+            self._keep_last(x, y)
+        if self.area.occupancy is not None:
+            self.area.occupancy.visit(x, y)
+
+    def _keep_last(self, x: int, y: int) -> bool:
+        # With recording off, moves is just the start, the first move inside the area (see check_if_exit) and the
+        # latest one
+        if 0 <= x < self.area_length and 0 <= y < self.area_width:
+            if len(self.moves) == 1:
+                self.moves.append((x, y))
+            self.moves[2:] = [(x, y)]
+            return True
+        return False
+
+    def replay(self) -> 'Pollinator':
+        """
+        Runs this pollinator again from its seed and starting conditions, with recording on, to rebuild its full list of
+        moves. Whole days are replayed until the copy has caught up with this pollinator (or died or left), so a sweep
+        can run with recording off and any individual can still be looked at afterwards.
+        :return: a new pollinator of the same class that made exactly the same moves. It is on a detached view of the
+        area (see Area.detached), so it isn't counted twice in the area's occupancy or put in its agent grid.
+        >>> b1 = Pollinator(seed=7, recording=False)
+        >>> while b1.status == 'alive':
+        ...     b1.move_one_day()
+        >>> b2 = b1.replay()
+        >>> (b2.status, b2.days, b2.hours, b2.seconds) == (b1.status, b1.days, b1.hours, b1.seconds)
+        True
+        >>> b2.moves[-1] == b1.moves[-1], len(b2.moves) > len(b1.moves) == 3
+        (True, True)
+        >>> b2.area.occupancy is None and b2.area.agent_grid is None
+        True
+        """
+        if self.seed is None:
+            raise ValueError("Only pollinators made with a seed can be replayed")
+        days, hours, seconds, position = self.start
+        twin = type(self)(self.area.detached(), days, hours, seconds, position, seed=self.seed)
+        if (self.death_tilt, self.exit_tilt) != (1.0, 1.0):
+            twin.tilt(self.death_tilt, self.exit_tilt)
+        while twin._status == ALIVE and (twin.days, twin.hours, twin.seconds) < (self.days, self.hours, self.seconds):
+            twin.move_one_day()
+        return twin
+
+    @profiled('random_move')
     def random_move(self, number: int = 1):
         """
         This method moves the Butterfly in a random direction the number of times specificed
@@ -207,18 +515,18 @@ class Pollinator:
         # Standard random move
         for i in range(number):
             # If it's on the border, check to see if it can exit
-            if (self.can_exit or self.can_exit_north) and (self.position[0] in [self.area_length - 1, 0]
-                                                               or self.position[1] in [self.area_width - 1, 0]):
+            if (self.can_exit or self.can_exit_north) and (self._x in [self.area_length - 1, 0]
+                                                               or self._y in [self.area_width - 1, 0]):
                 self.check_if_exit()
-                if self.status == 'exit':
+                if self._status == EXIT:
                     return
                 else:
                     # This is the case where it can exit, but random chance prevented it from doing so, so it moves
                     # either north, west, east or south instead
                     self.turns += 1
                     self.decrement_food(self.food_unit)
-                    x0 = x1 = self.position[0]
-                    y0 = y1 = self.position[1]
+                    x0 = x1 = self._x
+                    y0 = y1 = self._y
                     if x0 - 1 >= 0:
                         x1 = x0 - 1
                     elif y0 - 1 >= 0:
@@ -231,11 +539,11 @@ class Pollinator:
                         raise ValueError("no idea where this butterfly is")
                     self.position = (x1, y1)
             # If it's on the border and can't exit, then this will make sure it makes some move
-            elif self.position[0] in [self.area_length - 1, 0] or self.position[1] in [self.area_width - 1, 0]:
+            elif self._x in [self.area_length - 1, 0] or self._y in [self.area_width - 1, 0]:
                 self.turns += 1
                 self.decrement_food(self.food_unit)
-                x0 = x1 = self.position[0]
-                y0 = y1 = self.position[1]
+                x0 = x1 = self._x
+                y0 = y1 = self._y
                 if x0 - 1 >= 0:
                     x1 = x0 - 1
                 elif y0 - 1 >= 0:
@@ -249,16 +557,16 @@ class Pollinator:
                 self.position = (x1, y1)
             # Not on the border, so we use a random move generator
             else:
-                coord = np.random.choice((0, 1))
-                direction = np.random.choice((-1, 1))
-                x0 = x1 = self.position[0]
-                y0 = y1 = self.position[1]
+                coord = self.rng.choice((0, 1))
+                direction = self.rng.choice((-1, 1))
+                x0 = x1 = self._x
+                y0 = y1 = self._y
                 if coord == 0:
                     # Move north-south
                     if self.area_length - 1 > x0 > 0:
                         x1 = x0 + direction
                         self.decrement_food(self.food_unit)
-                        self.moves.append((x1, y1))
+                        self._record(x1, y1)
                     else:
                         raise ValueError("Somehow it is on the border but didn't get "
                                          "the border check and tried to move.")
@@ -267,11 +575,12 @@ class Pollinator:
                     if self.area_width - 1 > y0 > 0:
                         y1 = y0 + direction
                         self.decrement_food(self.food_unit)
-                        self.moves.append((x1, y1))
+                        self._record(x1, y1)
                     else:
                         raise ValueError("Somehow it is on the border but didn't get "
                                          "the border check and tried to move.")
 
+    @profiled('simple_move')
     def simple_move(self, direction: str = 'north'):
         """
         This method simply moves the monarch one unit in one direction. It's specific to the butterfly because
@@ -303,11 +612,11 @@ class Pollinator:
         assert (direction == 'north' or direction == 'south' or direction == 'east' or direction == 'west')
         # First check if it exits
         self.check_if_exit()
-        if self.status == 'exit':
+        if self._status == EXIT:
             return
         else:
-            x0 = x1 = self.position[0]
-            y0 = y1 = self.position[1]
+            x0 = x1 = self._x
+            y0 = y1 = self._y
             # if the pollinator is on the border, move randomly
             if x0 == 0 or x0 == self.area_length - 1 or \
                     y0 == 0 or y0 == self.area_width - 1:
@@ -316,31 +625,35 @@ class Pollinator:
             # Otherwise it will make a basic moves
             elif direction == 'north':
                 x1 = x0 - 1
-                self.moves.append((x1, y1))
+                self._record(x1, y1)
                 self.decrement_food(self.food_unit)
 
             elif direction == 'south':
                 x1 = x0 + 1
-                self.moves.append((x1, y1))
+                self._record(x1, y1)
                 self.decrement_food(self.food_unit)
 
             elif direction == 'east':
                 y1 = y0 + 1
-                self.moves.append((x1, y1))
+                self._record(x1, y1)
                 self.decrement_food(self.food_unit)
 
             elif direction == 'west':
                 y1 = y0 - 1
-                self.moves.append((x1, y1))
+                self._record(x1, y1)
                 self.decrement_food(self.food_unit)
 
             else:
                 raise ValueError("Direction not recognized")
 
-    def seek_resource(self, resource: str, incremental: bool=False) -> int:
+    @profiled('seek_resource')
+    def seek_resource(self, resource: str, incremental: bool=False, land_cover_aware: bool = None) -> int:
         """
         The pollinator seeks the designated resource
         :param resource: A resource to seek must be declared
+        :param land_cover_aware: follow the cheapest path over the land cover to the resource that is cheapest to
+        reach, paying the cost of every cell crossed, instead of flying straight to the nearest one. None (the default)
+        leaves it to the land_cover_aware class attribute.
         :return: return sends it back when it is done, otherwise it modifies self and returns self and turns
         taken to complete the operation
         >>> b1 = Pollinator()
@@ -357,27 +670,35 @@ class Pollinator:
         (3, 0)
         >>> b.moves
         [(0, 0), (1, 0), (2, 0), (3, 0)]
+        >>> hedgerow = Area([[2, 1, 1, 1, 1, 1]] + [[1] * 6] * 3 + [[1, 3, 3, 3, 3, 2]])
+        >>> b = Pollinator(hedgerow, position=(4, 0))
+        >>> b.food_level = 50
+        >>> b.seek_resource("food", land_cover_aware=True)
+        >>> b.moves
+        [(4, 0), (4, 1), (4, 2), (4, 3), (4, 4), (4, 5)]
+        >>> hedgerow.nearest_resource('food', 4, 0)
+        (0, 0)
         """
         # Let's make sure no zombie pollinator_types are looking for our resources
-        if self.status == 'dead':
+        if self._status == DEAD:
             return
 
         if incremental:
             times = 1
         else:
-            times = np.random.randint(1, 11)
+            times = self.rng.randint(1, 11)
         if resource == 'shelter':
-            if not self.shelter_indices:
+            if not self.area.has_resource('shelter'):
                 # There's no shelter, so it just wanders :(
                 self.random_move(times)
                 self.turns += times
                 return
             else:
-                if self.position in self.shelter_indices:
+                if self.area.on_resource('shelter', self._x, self._y):
                     # In order to prevent a Butterfly from lingering on a food or shelter square
                     # too long, I'm introducing a 50-50 chance that it moves randomly if it's
                     # already on a square containing what it wants.
-                    if np.random.choice([1, 0]):
+                    if self.rng.choice([1, 0]):
                         nearest = self.position
                         # To ensure that at least one time unit is consumed if it doesn't move
                         self.turns += 1
@@ -386,18 +707,18 @@ class Pollinator:
                         self.turns += times
                         return
                 else:
-                    nearest = min(self.shelter_indices, key=lambda x: manhattan_distance(x, self.position))
+                    nearest = None
 
         elif resource == 'food':
-            if not self.food_indices:
+            if not self.area.has_resource('food'):
                 # There's no food, so it just wanders :(
                 self.random_move(times)
                 self.turns += times
                 return
             else:
-                if self.position in self.food_indices:
+                if self.area.on_resource('food', self._x, self._y):
                     # Same as seeking shelter above
-                    if np.random.choice([1, 0]):
+                    if self.rng.choice([1, 0]):
                         nearest = self.position
                         self.turns += 1
                     else:
@@ -405,11 +726,21 @@ class Pollinator:
                         self.turns += times
                         return
                 else:
-                    nearest = min(self.food_indices, key=lambda x: manhattan_distance(x, self.position))
+                    nearest = None
 
         else:
             raise ValueError('Unknown resource')
 
+        path = None
+        if nearest is None:
+            if self.land_cover_aware if land_cover_aware is None else land_cover_aware:
+                field = self.area.cost_field(resource, self.travel_costs)
+                path = field.path(self._x, self._y)
+                cost = float(field.cost[self._x, self._y])
+                nearest = path[-1] if path else self.position
+            else:
+                nearest = self.area.nearest_resource(resource, self._x, self._y)
+
         # Record the nearest value
         x = nearest[0]
         y = nearest[1]
@@ -417,10 +748,17 @@ class Pollinator:
         # There's a random chance it can't reach the resource, otherwise it does
         # and spends the appropriate amount of energy to get there
 
-        if np.random.choice([1, 0], p=[0.999, 0.001]):
-            self.record_moves(x, y)
-            self.position = (x, y)
-            self.decrement_food(self.turns * self.food_unit)
+        if self.rng.choice([1, 0], p=[0.999, 0.001]):
+            if path is None:
+                self.record_moves(x, y)
+                self.position = (x, y)
+                self.decrement_food(self.turns * self.food_unit)
+            else:
+                # Each cell along the way takes a turn, but costs what its land class costs to cross
+                turns = self.turns
+                self._record_path([cell[0] for cell in path], [cell[1] for cell in path])
+                self.position = (x, y)
+                self.decrement_food((turns + cost) * self.food_unit)
 
         # Moves randomly instead of seeking resource. Better luck next time.
         else:
@@ -431,15 +769,15 @@ class Pollinator:
         # now that it has moved, if it's near shelter and not already in shelter
         # there's a chance it may take shelter, assuming it's not too hungry
         if self.food_level >= 25.0:
-            if self.area.array[self.position[0]][self.position[1]] == 3 and self.sheltered is False:
-                if np.random.choice([True, False],
+            if self.area.array[self._x][self._y] == 3 and self.sheltered is False:
+                if self.rng.choice([True, False],
                                     p=[self.shelter_chance, 1 - self.shelter_chance]):
                     self.sheltered = True
                 return
 
             # slightly less chance of taking shelter in a mixed food/shelter Land_Use
-            elif self.area.array[self.position[0]][self.position[1]] == 4 and self.sheltered is False:
-                if np.random.choice([True, False], p=[.9 * self.shelter_chance,
+            elif self.area.array[self._x][self._y] == 4 and self.sheltered is False:
+                if self.rng.choice([True, False], p=[.9 * self.shelter_chance,
                                                       1 - (.9 * self.shelter_chance)]):
                     self.sheltered = True
                 return
@@ -447,16 +785,16 @@ class Pollinator:
         # if it's near food, it will most likely try to eat
         # There's no class-level variable for this since all pollinator_types have to eat
         # and actively seek food sources in flowers.
-        if self.area.array[self.position[0]][self.position[1]] == 2:
-            if np.random.choice([True, False], p=[0.99, 0.01]):
+        if self.area.array[self._x][self._y] == 2:
+            if self.rng.choice([True, False], p=[0.99, 0.01]):
                 self.food_level = 100.0
                 if self.food_level >= 100:
                     self.food_level = 100
             return
 
         # Less chance of eating in a mixed food/shelter Land_Use due to less food availability
-        if self.area.array[self.position[0]][self.position[1]] == 4:
-            if np.random.choice([True, False], p=[0.80, 0.2]):
+        if self.area.array[self._x][self._y] == 4:
+            if self.rng.choice([True, False], p=[0.80, 0.2]):
                 self.food_level += 100.0
                 if self.food_level >= 100:
                     self.food_level = 100
@@ -512,7 +850,7 @@ class Pollinator:
         # A false flag. Not in that way.
         flag = False
         temp_days = self.days
-        while self.status == 'alive':
+        while self._status == ALIVE:
             self.increment_time()
             # Basically, if something weird gets passed in and the increment turns out to add an entire day to the total
             # We'll add the extra number of days onto the days count and just stop Hopefully this will smooth out any
@@ -536,52 +874,48 @@ class Pollinator:
             #     print(self.moves[-1])
 
 
-            # Early morning activity
+            # Pick the activity for this time of day
             if 4 <= self.hours < 6:
-                self.morning_activity()
-                # make sure it's not a zombie butterfly
-                if self.status == 'dead':
-                    break
-
+                phase = 'morning_activity'
+                activity = self.morning_activity
             elif 6 <= self.hours < 12:
-                self.late_morning_activity()
-                # make sure it's not a zombie butterfly
-                if self.status == 'dead':
-                    break
-
+                phase = 'late_morning_activity'
+                activity = self.late_morning_activity
             elif 12 <= self.hours < 18:
-                self.afternoon_activity()
-                # make sure it's not a zombie butterfly
-                if self.status == 'dead':
-                    break
-
+                phase = 'afternoon_activity'
+                activity = self.afternoon_activity
             elif 18 <= self.hours < 20:
-                self.late_afternoon_activity()
-                # make sure it's not a zombie butterfly
-                if self.status == 'dead':
-                    break
-
+                phase = 'late_afternoon_activity'
+                activity = self.late_afternoon_activity
             elif 20 <= self.hours < 24 or 0 <= self.hours < 4:
-                self.night_time_activity()
-                # make sure it's not a zombie butterfly
-                if self.status == 'dead':
-                    break
-
+                phase = 'night_time_activity'
+                activity = self.night_time_activity
             else:
                 raise ValueError("hours out of range during move")
+            # Rain (or cold) grounds it during the day, if the area has weather
+            if self.area.weather is not None and phase != 'night_time_activity' and self.area.weather.grounded(
+                    self.days, self.hours, self._x, self._y, self.flight_temperature):
+                phase = 'rain_activity'
+                activity = self.rain_activity
+
+            if self.profiler is None:
+                activity()
+            else:
+                self.profiler.run(phase, self, activity)
 
             # make sure it's not a zombie butterfly
-            if self.status == 'dead':
+            if self._status == DEAD:
                 break
 
             # Increment time
-            self.seconds += 25 * self.turns
+            turns = self.turns
+            self.seconds += 25 * turns
             self.turns = 0
 
             # check for death
-            self.check_for_death()
+            self.check_for_death(turns)
             self.check_if_exit()
-            if self.status == 'dead' or self.status == 'exit':
+            if self._status != ALIVE:
                 break
 
     # As baseline behavior, we'll say a pollinator looks for food all day, then at night seeks shelter
@@ -620,4 +954,55 @@ class Pollinator:
         """
         self.seek_resource('shelter')
 
+    def rain_activity(self):
+        """
+        When the weather is too wet (or cold) to fly, a pollinator stays put if it is sheltered and otherwise looks for
+        shelter
+        :return: None
+        """
+        if self.sheltered and self.area.on_resource('shelter', self._x, self._y):
+            self.decrement_food(self.food_unit / 2)
+            self.turns += 1
+        else:
+            self.sheltered = False
+            self.seek_resource('shelter')
+
 
+
+
+def death_probability(food_level, death_factor: float) -> np.ndarray:
+    """
+    The chance that check_for_death kills a pollinator, worked out for a whole array of food levels at once, for
+    population models that roll for many pollinators together. The bands are the same as in check_for_death,
+    including the one for food levels under 0.01, which doesn't kill anything there.
+    :param food_level: array of food levels
+    :param death_factor: the pollinator class's death_factor
+    :return: array of probabilities, the same shape as food_level
+    >>> death_probability([95, 60, 40, 10, 0], 0.003).round(7).tolist()
+    [3e-07, 3e-05, 0.003, 0.3, 0.0]
+    """
+    food_level = np.asarray(food_level, dtype=float)
+    chance = np.select([food_level > 90, food_level > 50, food_level > 25, food_level >= 0.01],
+                       [death_factor / 10000, death_factor / 100, death_factor, death_factor * 100], 0.0)
+    return np.minimum(chance, 1.0)
+
+
+def to_records(pollinators: list) -> np.ndarray:
+    """
+    Packs the state of a collection of pollinators into a structured NumPy array, one record per pollinator, which
+    takes a fraction of the memory of the objects themselves. See record_dtype for the fields.
+    :param pollinators: any iterable of pollinators
+    :return: np.ndarray with dtype record_dtype
+    >>> b1 = Pollinator(position=(2, 1))
+    >>> b1.food_level = 40
+    >>> r = to_records([b1])
+    >>> int(r['x'][0]), int(r['y'][0]), float(r['food_level'][0]), bool(r['status'][0] == ALIVE)
+    (2, 1, 40.0, True)
+    """
+    pollinators = list(pollinators)
+    records = np.empty(len(pollinators), dtype=record_dtype)
+    for i, pollinator in enumerate(pollinators):
+        records[i] = (type(pollinator).__name__, pollinator._status, pollinator._x, pollinator._y,
+                      pollinator.food_level, pollinator.sheltered, pollinator.days, pollinator.hours,
+                      pollinator.seconds)
+    return records
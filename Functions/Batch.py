@@ -0,0 +1,370 @@
+from Animal.Danaus.plexippus import Monarch
+from Land_Use.Developed.farm import CropField, make_field, field_types
+from Functions.Profiling import PhaseProfiler
+from Functions.Memory import MemoryBudget
+from Functions.Progress import Progress, turns_simulated
+from Functions.Importance import weighted_estimate
+import numpy as np
+import multiprocessing
+import functools
+import json
+import time
+import zlib
+
+
+# The pre-defined fields run by the standard tests, in the order run_tests reports them
+standard_fields = ['standard', 'food heavy', 'middle food windbreak', 'middle shelter windbreak', 'shelter heavy']
+
+# Fields are expensive to build, so each worker process keeps the ones it has already made
+_field_cache = {}
+
+# Pollinators and agent-turns simulated in this process, read by _measured to report progress
+_counters = {'agents': 0, 'turns': 0}
+
+
+def parse_shard(text: str) -> tuple:
+    """
+    Reads a shard designation of the form 'i/N', where shards are numbered from 0 to N - 1
+    :param text: the shard string from the command line
+    :return: (shard index, number of shards)
+    >>> parse_shard('2/8')
+    (2, 8)
+    >>> parse_shard('8/8')
+    Traceback (most recent call last):
+    ...
+    ValueError: shard must look like i/N with 0 <= i < N, got '8/8'
+    """
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        index, count = -1, 0
+    if not 0 <= index < count:
+        raise ValueError("shard must look like i/N with 0 <= i < N, got '{}'".format(text))
+    return index, count
+
+
+def shard_indices(total: int, shard: int = 0, shards: int = 1) -> list:
+    """
+    Deterministically splits the indices 0 to total - 1 between shards, dealing them out round-robin so every shard
+    gets a similar mix of work
+    :param total: number of replicates (or optimizer candidates)
+    :param shard: this shard's index
+    :param shards: total number of shards
+    :return: list of indices this shard is responsible for
+    >>> shard_indices(10, 1, 3)
+    [1, 4, 7]
+    """
+    return list(range(shard, total, shards))
+
+
+def replicate_seed(seed: int, name: str, replicate: int) -> list:
+    """
+    The seed for one replicate. It depends only on the base seed, the field name and the replicate number, so the
+    outcome of a replicate is the same whichever shard or worker runs it.
+    :param seed: base seed for the experiment
+    :param name: field (or experiment) name
+    :param replicate: replicate number
+    :return: list of four ints, for np.random.RandomState or the seed of a pollinator
+    """
+    sequence = np.random.SeedSequence([seed, zlib.crc32(name.encode()), replicate])
+    return [int(part) for part in sequence.generate_state(4)]
+
+
+def replicate_rng(seed: int, name: str, replicate: int) -> np.random.RandomState:
+    """
+    The random number source for one replicate, see replicate_seed
+    :return: np.random.RandomState
+    """
+    return np.random.RandomState(replicate_seed(seed, name, replicate))
+
+
+def _cached_field(name: str, iterations: int) -> CropField:
+    key = (name, iterations)
+    if key not in _field_cache:
+        _field_cache[key] = make_field(name, iterations)
+    return _field_cache[key]
+
+
+def _simulate(field: CropField, rng=None, profiler: PhaseProfiler = None, seed=None, tilts: tuple = None) -> Monarch:
+    # Sweeps only keep the outcome, so the moves aren't recorded. Seeded monarchs can be replayed to get them back.
+    monarch = Monarch(field, rng=rng, seed=seed, recording=False)
+    if profiler is not None:
+        monarch.enable_profiling(profiler)
+    if tilts is not None:
+        monarch.tilt(*tilts)
+    while monarch.status == 'alive':
+        monarch.move_one_day()
+    _counters['agents'] += 1
+    _counters['turns'] += turns_simulated(monarch)
+    return monarch
+
+
+def run_replicate(task: tuple) -> dict:
+    """
+    Runs a single monarch through a pre-defined field. Takes a single tuple so it can be handed to a process pool.
+    :param task: (field name, field iterations, replicate number, base seed, profile flag, (death tilt, exit tilt) or
+    None), see Pollinator.tilt
+    :return: a record of the outcome. Tilted replicates also record their tilts and weight.
+    """
+    name, iterations, replicate, seed, profile, tilts = task
+    profiler = PhaseProfiler() if profile else None
+    monarch = _simulate(_cached_field(name, iterations), profiler=profiler, seed=replicate_seed(seed, name, replicate),
+                        tilts=tilts)
+    record = {'type': 'replicate', 'field': name, 'iterations': iterations, 'replicate': replicate, 'seed': seed,
+              'status': monarch.status, 'days': monarch.days, 'hours': monarch.hours, 'seconds': monarch.seconds,
+              'food_level': monarch.food_level}
+    if tilts is not None:
+        record['death_tilt'], record['exit_tilt'] = tilts
+        record['weight'] = monarch.weight
+    if profiler is not None:
+        record['profile'] = profiler.as_dict()
+    return record
+
+
+def replay_replicate(record: dict) -> Monarch:
+    """
+    Runs the monarch behind a replicate record again, with every move recorded, e.g., to look at an odd result from a
+    sweep. Nothing but the record is needed.
+    :param record: a replicate record from run_replicate or read_records
+    :return: the Monarch, run until it died or left
+    >>> record = run_replicate(('fallow', 1, 5, 0, False, None))
+    >>> monarch = replay_replicate(record)
+    >>> monarch.status == record['status'], monarch.days == record['days'], len(monarch.moves) > 2
+    (True, True, True)
+    """
+    field = _cached_field(record['field'], record['iterations'])
+    monarch = Monarch(field, seed=replicate_seed(record['seed'], record['field'], record['replicate']))
+    if 'weight' in record:
+        monarch.tilt(record['death_tilt'], record['exit_tilt'])
+    while monarch.status == 'alive':
+        monarch.move_one_day()
+    return monarch
+
+
+def run_candidate(task: tuple) -> dict:
+    """
+    Builds one random arrangement of pre-defined fields and runs monarchs through it, like a single iteration of
+    optimize_field_group. Takes a single tuple so it can be handed to a process pool.
+    :param task: (candidate number, number of fields, monarchs per candidate, base seed, profile flag)
+    :return: a record of the candidate's arrangement and results
+    """
+    candidate, number_of_fields, num_iters, seed, profile = task
+    rng = replicate_rng(seed, 'optimize', candidate)
+    names = [str(name) for name in rng.choice(list(field_types), number_of_fields)]
+    field = CropField.assemble([_cached_field(name, 34) for name in names])
+    profiler = PhaseProfiler() if profile else None
+    results = [_simulate(field, rng, profiler).status for i in range(num_iters)]
+    record = {'type': 'candidate', 'candidate': candidate, 'seed': seed, 'arrangement': names,
+              'dead_pct': 100 * results.count('dead') / len(results),
+              'exit_pct': 100 * results.count('exit') / len(results)}
+    if profiler is not None:
+        record['profile'] = profiler.as_dict()
+    return record
+
+
+def _measured(function, task) -> tuple:
+    # Runs one task and says who ran it and how much it simulated, for the progress of the run
+    agents, turns = _counters['agents'], _counters['turns']
+    start = time.perf_counter()
+    result = function(task)
+    return result, {'worker': multiprocessing.current_process().name, 'seconds': time.perf_counter() - start,
+                    'agents': _counters['agents'] - agents, 'turns': _counters['turns'] - turns}
+
+
+def _report(progress: Progress, result: dict, measures: dict):
+    best = None
+    if 'dead_pct' in result:
+        best = (result['arrangement'], result['dead_pct'])
+    progress.update(agents=measures['agents'], turns=measures['turns'], worker=measures['worker'],
+                    seconds=measures['seconds'], best=best)
+
+
+def _run_batch(function, tasks: list, workers: int = 1, progress: Progress = None) -> list:
+    if progress is None:
+        if workers > 1 and len(tasks) > 1:
+            with multiprocessing.Pool(workers) as pool:
+                return pool.map(function, tasks, chunksize=max(1, len(tasks) // (4 * workers)))
+        return [function(task) for task in tasks]
+    # With progress, results are taken one at a time as they come in (still in task order)
+    measured = functools.partial(_measured, function)
+    results = []
+    if workers > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(workers) as pool:
+            for result, measures in pool.imap(measured, tasks, chunksize=max(1, len(tasks) // (16 * workers))):
+                _report(progress, result, measures)
+                results.append(result)
+        return results
+    for task in tasks:
+        result, measures = measured(task)
+        _report(progress, result, measures)
+        results.append(result)
+    return results
+
+
+def _run_tasks(function, tasks: list, workers: int = 1, budget: MemoryBudget = None,
+               progress: Progress = None) -> list:
+    # Without a budget everything is one batch. With one, the tasks go in batches that are halved (and the field
+    # cache emptied) whenever the process is over budget.
+    if progress is not None and progress.total is None:
+        progress.total = len(tasks)
+    if budget is None or budget.limit is None:
+        results = _run_batch(function, tasks, workers, progress)
+    else:
+        results = []
+        size = max(1, len(tasks) // 4)
+        start = 0
+        while start < len(tasks):
+            results.extend(_run_batch(function, tasks[start:start + size], workers, progress))
+            start += size
+            if budget.check('after {} of {} tasks'.format(start, len(tasks))):
+                _field_cache.clear()
+                size = max(1, size // 2)
+    if progress is not None:
+        progress.finish()
+    return results
+
+
+def run_parameter_test(fields: list, replicates: int, seed: int = 0, iterations: int = 34, workers: int = 1,
+                       shard: int = 0, shards: int = 1, profile: bool = False, budget: MemoryBudget = None,
+                       progress: Progress = None, death_tilt: float = 1.0, exit_tilt: float = 1.0) -> list:
+    """
+    Runs replicates monarchs through each named field. Only the replicates belonging to this shard are run, so the same
+    call made with every shard from 0 to shards - 1 covers the whole experiment exactly once.
+    :param fields: names of pre-defined fields
+    :param replicates: monarchs per field over all shards
+    :param seed: base seed
+    :param iterations: size of the fields, see the field classes
+    :param workers: number of processes to use on this node
+    :param shard: this shard's index
+    :param shards: total number of shards
+    :param profile: whether to profile the monarchs
+    :param budget: optional MemoryBudget, see Functions.Memory
+    :param progress: optional Progress to report each finished replicate to, see Functions.Progress
+    :param death_tilt: importance sampling factor on the chances of dying, see Pollinator.tilt
+    :param exit_tilt: importance sampling factor on the chances of exiting
+    :return: list of replicate records
+    """
+    tilts = None if (death_tilt, exit_tilt) == (1.0, 1.0) else (death_tilt, exit_tilt)
+    tasks = [(name, iterations, replicate, seed, profile, tilts)
+             for name in fields for replicate in shard_indices(replicates, shard, shards)]
+    return _run_tasks(run_replicate, tasks, workers, budget, progress)
+
+
+def run_optimize(number_of_fields: int, candidates: int, num_iters: int, seed: int = 0, workers: int = 1,
+                 shard: int = 0, shards: int = 1, profile: bool = False, budget: MemoryBudget = None,
+                 progress: Progress = None) -> list:
+    """
+    The batch version of optimize_field_group. A fixed number of candidate arrangements is evaluated rather than
+    stopping at a goal, so the candidates can be split between shards.
+    :param number_of_fields: fields per arrangement
+    :param candidates: arrangements to evaluate over all shards
+    :param num_iters: monarchs per arrangement
+    :param seed: base seed
+    :param workers: number of processes to use on this node
+    :param shard: this shard's index
+    :param shards: total number of shards
+    :param profile: whether to profile the monarchs
+    :param budget: optional MemoryBudget, see Functions.Memory
+    :param progress: optional Progress to report each finished candidate to, see Functions.Progress
+    :return: list of candidate records
+    """
+    tasks = [(candidate, number_of_fields, num_iters, seed, profile)
+             for candidate in shard_indices(candidates, shard, shards)]
+    return _run_tasks(run_candidate, tasks, workers, budget, progress)
+
+
+def write_records(records: list, path: str):
+    """
+    Writes records as JSON lines. A path of '-' prints them instead.
+    """
+    lines = '\n'.join(json.dumps(record) for record in records) + '\n'
+    if path == '-':
+        print(lines, end='')
+    else:
+        with open(path, 'w') as output:
+            output.write(lines)
+
+
+def read_records(path: str) -> list:
+    with open(path) as source:
+        return [json.loads(line) for line in source if line.strip()]
+
+
+def merge_records(paths: list) -> list:
+    """
+    Combines the outputs of several shards into one list. A replicate or candidate that shows up in more than one
+    file (e.g., a shard that was re-run) is only kept once. Replicates run with different tilts are different runs, so
+    they are all kept.
+    :param paths: shard output files
+    :return: list of records, sorted so the result doesn't depend on the order of the files
+    """
+    merged = {}
+    for path in paths:
+        for record in read_records(path):
+            if record['type'] == 'replicate':
+                key = ('replicate', record['field'], record['iterations'], record['seed'], record['replicate']) + \
+                    _tilts(record)
+            else:
+                key = ('candidate', record['seed'], record['candidate'])
+            merged[key] = record
+    return [merged[key] for key in sorted(merged, key=lambda x: [(0, part) if isinstance(part, int) else (1, part)
+                                                                 for part in x])]
+
+
+def _tilts(record: dict) -> tuple:
+    # (death tilt, exit tilt) a replicate was run with, (1.0, 1.0) for plain replicates
+    return float(record.get('death_tilt', 1.0)), float(record.get('exit_tilt', 1.0))
+
+
+def summarize(records: list) -> str:
+    """
+    Dead and exit percentages for each field, the best arrangement found by the optimizer, and the combined profile
+    if the runs were profiled. Replicates run with different tilts are summarized separately, and tilted ones with
+    the weighted estimates (see Functions.Importance).
+    :param records: replicate and/or candidate records
+    :return: string for printing
+    >>> plain = {'type': 'replicate', 'field': 'fallow', 'status': 'dead'}
+    >>> tilted = dict(plain, death_tilt=2.0, exit_tilt=1.0, weight=1.0)
+    >>> print(summarize([plain, dict(plain, status='exit'), tilted, dict(tilted, status='exit')]))
+    ----Test Field fallow----- (2 replicates)
+    Dead percentage = 50.00%
+    Exit percentage = 50.00%
+    ----Test Field fallow----- (2 replicates, tilts 2 death, 1 exit)
+    Dead percentage = 50% +/- 50% (importance sampled, effective size 2)
+    Exit percentage = 50% +/- 50% (importance sampled, effective size 2)
+    """
+    lines = []
+    by_field = {}
+    candidates = []
+    profiler = PhaseProfiler()
+    weights = {}
+    for record in records:
+        if record['type'] == 'replicate':
+            key = (record['field'],) + _tilts(record)
+            by_field.setdefault(key, []).append(record['status'])
+            weights.setdefault(key, []).append(record.get('weight', 1.0))
+        else:
+            candidates.append(record)
+        if 'profile' in record:
+            profiler.merge(PhaseProfiler.from_dict(record['profile']))
+    for key, statuses in by_field.items():
+        name, death_tilt, exit_tilt = key
+        if (death_tilt, exit_tilt) != (1.0, 1.0):
+            # Tilted replicates: the weighted estimates and how sure they are
+            lines.append("----Test Field {}----- ({} replicates, tilts {:g} death, {:g} exit)".format(
+                name, len(statuses), death_tilt, exit_tilt))
+            for outcome, label in (('dead', 'Dead'), ('exit', 'Exit')):
+                result = weighted_estimate(statuses, weights[key], outcome)
+                lines.append("{} percentage = {:.4g}% +/- {:.2g}% (importance sampled, effective size {:.0f})".format(
+                    label, 100 * result['estimate'], 100 * result['standard_error'], result['effective_size']))
+            continue
+        lines.append("----Test Field {}----- ({} replicates)".format(name, len(statuses)))
+        lines.append("Dead percentage = {:.2f}%".format(100 * statuses.count('dead') / len(statuses)))
+        lines.append("Exit percentage = {:.2f}%".format(100 * statuses.count('exit') / len(statuses)))
+    if candidates:
+        best = min(candidates, key=lambda x: x['dead_pct'])
+        lines.append("Best of {} arrangements: {} (dead {:.2f}%, exit {:.2f}%)".format(
+            len(candidates), best['arrangement'], best['dead_pct'], best['exit_pct']))
+    if profiler.calls:
+        lines.append(profiler.report())
+    return '\n'.join(lines)
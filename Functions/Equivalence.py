@@ -0,0 +1,144 @@
+from Animal.Danaus.plexippus import Monarch
+from Land_Use.Land import Area, Occupancy
+import numpy as np
+
+
+# Outcomes a run can end in, in the order they are tabulated
+outcomes = ('dead', 'exit', 'alive')
+
+
+def reference_engine(field: Area, seeds: list, pollinator_class: type = Monarch, max_days: int = 365) -> dict:
+    """
+    The reference every faster engine is checked against: one pollinator object per seed, moved a day at a time
+    with move_one_day. A candidate engine is any function with the same arguments (field, seeds) that returns the
+    same kind of dict.
+    :param field: the field to run on
+    :param seeds: one seed per pollinator
+    :param pollinator_class: the kind of pollinator
+    :param max_days: pollinators still alive after this many days are left alive
+    :return: {'status': list of outcome names, 'time': list of days until the outcome (with the fraction of the day),
+    'occupancy': Occupancy of the cells they moved into}
+    """
+    saved = field.occupancy
+    field.occupancy = Occupancy(field.shape)
+    statuses = []
+    times = []
+    try:
+        for seed in seeds:
+            pollinator = pollinator_class(field, seed=seed, recording=False)
+            while pollinator.status == 'alive' and pollinator.days < max_days:
+                pollinator.move_one_day()
+            statuses.append(pollinator.status)
+            times.append(pollinator.days + pollinator.hours / 24 + pollinator.seconds / 86400)
+        return {'status': statuses, 'time': times, 'occupancy': field.occupancy}
+    finally:
+        field.occupancy = saved
+
+
+def outcome_test(reference: list, candidate: list) -> tuple:
+    """
+    Chi-square test that two runs end dead, exited and alive in the same proportions
+    :return: (statistic, p-value)
+    """
+    from scipy import stats
+    table = np.array([[list(run).count(outcome) for outcome in outcomes] for run in (reference, candidate)])
+    table = table[:, table.sum(axis=0) > 0]
+    if table.shape[1] < 2:
+        return 0.0, 1.0
+    result = stats.chi2_contingency(table)
+    return float(result[0]), float(result[1])
+
+
+def occupancy_test(reference: Occupancy, candidate: Occupancy, reference_agents: int, candidate_agents: int,
+                   block: int = 100) -> tuple:
+    """
+    Chi-square test that two occupancy maps spread the visits over the field the same way, on blocks of block x block
+    cells. The moves of one pollinator aren't independent of each other, so each map is scaled to add up to its number
+    of pollinators before testing, as if every pollinator were a single draw from the map.
+    :return: (statistic, p-value)
+    """
+    from scipy import stats
+    table = []
+    for occupancy, agents in ((reference, reference_agents), (candidate, candidate_agents)):
+        raster = occupancy.raster
+        rows = -(-raster.shape[0] // block) * block
+        columns = -(-raster.shape[1] // block) * block
+        padded = np.zeros((rows, columns))
+        padded[:raster.shape[0], :raster.shape[1]] = raster
+        blocks = padded.reshape(rows // block, block, columns // block, block).sum(axis=(1, 3)).ravel()
+        table.append(blocks * agents / max(blocks.sum(), 1))
+    table = np.array(table)
+    table = table[:, table.sum(axis=0) > 0]
+    if table.shape[1] < 2 or (table.sum(axis=1) == 0).any():
+        return 0.0, 1.0
+    result = stats.chi2_contingency(table)
+    return float(result[0]), float(result[1])
+
+
+class EquivalenceReport:
+    """
+    The results of equivalence_test: every test run, and whether any of them rejected at the Bonferroni-corrected
+    level. Each entry in tests is (field, test name, statistic, p-value).
+    """
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.tests = []
+
+    @property
+    def threshold(self) -> float:
+        # Bonferroni: the chance of any false alarm over all the tests stays at alpha
+        return self.alpha / max(1, len(self.tests))
+
+    @property
+    def failures(self) -> list:
+        return [test for test in self.tests if test[3] < self.threshold]
+
+    @property
+    def passed(self) -> bool:
+        return not self.failures
+
+    def __str__(self) -> str:
+        lines = ['{} tests, alpha {} (each test at {:.2g}): {}'.format(
+            len(self.tests), self.alpha, self.threshold, 'equivalent' if self.passed else 'NOT equivalent')]
+        for field, name, statistic, p_value in self.tests:
+            lines.append('  {:<28}{:<22}{:>12.3f}{:>12.4g}{}'.format(
+                field, name, statistic, p_value, '  <- rejected' if p_value < self.threshold else ''))
+        return '\n'.join(lines)
+
+
+def equivalence_test(candidate, fields: dict, runs: int = 200, alpha: float = 0.01, reference=reference_engine,
+                     block: int = 100) -> EquivalenceReport:
+    """
+    Checks that a fast engine behaves like the reference object model, since it can't be expected to reproduce it
+    draw for draw. Both engines run the same fields with runs pollinators each (with different seeds, so the samples
+    are independent), and on every field the outcome rates (chi-square), the time until the outcome
+    (Kolmogorov-Smirnov and Mann-Whitney) and the occupancy maps (chi-square) are compared. The family of tests has
+    a false alarm rate of alpha.
+    :param candidate: engine to check, called as candidate(field, seeds), see reference_engine
+    :param fields: {name: field} to run on
+    :param runs: pollinators per engine and field
+    :param alpha: chance of wrongly calling equivalent engines different
+    :param reference: the engine to compare with
+    :param block: size of the blocks the occupancy maps are compared on
+    :return: EquivalenceReport
+    >>> from Land_Use.Developed.farm import make_field
+    >>> report = equivalence_test(reference_engine, {'standard': make_field('standard', 2)}, runs=40)
+    >>> report.passed, len(report.tests)
+    (True, 4)
+    """
+    from scipy import stats
+    report = EquivalenceReport(alpha)
+    for name, field in fields.items():
+        first = reference(field, list(range(runs)))
+        second = candidate(field, list(range(runs, 2 * runs)))
+        report.tests.append((name, 'outcome rates') + outcome_test(first['status'], second['status']))
+        if np.ptp(first['time'] + second['time']) > 0:
+            result = stats.ks_2samp(first['time'], second['time'])
+            report.tests.append((name, 'time to outcome (KS)', float(result[0]), float(result[1])))
+            result = stats.mannwhitneyu(first['time'], second['time'], alternative='two-sided')
+            report.tests.append((name, 'time to outcome (MW)', float(result[0]), float(result[1])))
+        if first.get('occupancy') is not None and second.get('occupancy') is not None:
+            report.tests.append((name, 'occupancy') + occupancy_test(first['occupancy'], second['occupancy'],
+                                                                     runs, runs, block))
+    return report
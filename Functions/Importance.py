@@ -0,0 +1,77 @@
+from Animal.Danaus.plexippus import Monarch
+from Land_Use.Land import Area
+import numpy as np
+
+
+def weighted_estimate(statuses: list, weights: list, outcome: str = 'dead') -> dict:
+    """
+    The importance sampling estimate of the chance of an outcome from tilted pollinators (see Pollinator.tilt): the
+    average of weight * (the pollinator ended in the outcome). It is unbiased for the untilted chance. Its variance is
+    estimated from the spread of the weighted terms, so a tilt that suits the outcome shows up as a small standard
+    error. The effective sample size is the number of untilted pollinators the weights are worth; when it is much
+    smaller than the number run, a few heavy pollinators dominate and the tilt is too strong.
+    :param statuses: final status of each pollinator
+    :param weights: final weight of each pollinator
+    :param outcome: 'dead', 'exit' or 'alive'
+    :return: {'estimate', 'variance', 'standard_error', 'relative_error', 'effective_size', 'hits', 'runs'}
+    >>> result = weighted_estimate(['dead', 'exit', 'dead', 'exit'], [0.1, 1.2, 0.1, 1.1])
+    >>> round(result['estimate'], 4), result['hits'], round(result['effective_size'], 2)
+    (0.05, 2, 2.34)
+    """
+    weights = np.asarray(weights, dtype=float)
+    hits = np.array([status == outcome for status in statuses])
+    terms = weights * hits
+    runs = len(terms)
+    estimate = float(terms.mean()) if runs else 0.0
+    variance = float(terms.var(ddof=1) / runs) if runs > 1 else float('inf')
+    error = variance ** 0.5
+    squares = float((weights ** 2).sum())
+    return {'estimate': estimate, 'variance': variance, 'standard_error': error,
+            'relative_error': error / estimate if estimate > 0 else float('inf'),
+            'effective_size': float(weights.sum()) ** 2 / squares if squares > 0 else 0.0,
+            'hits': int(hits.sum()), 'runs': runs}
+
+
+def tilted_runs(field: Area, seeds: list, death_tilt: float = 1.0, exit_tilt: float = 1.0,
+                pollinator_class: type = Monarch, max_days: int = 365) -> tuple:
+    """
+    Runs one tilted pollinator per seed through the field
+    :param field: the field to run on
+    :param seeds: one seed per pollinator
+    :param death_tilt: factor on the chances of dying, see Pollinator.tilt
+    :param exit_tilt: factor on the chances of exiting
+    :param pollinator_class: the kind of pollinator
+    :param max_days: pollinators still alive after this many days are left alive
+    :return: (list of statuses, list of weights)
+    """
+    statuses = []
+    weights = []
+    for seed in seeds:
+        pollinator = pollinator_class(field, seed=seed, recording=False)
+        pollinator.tilt(death_tilt, exit_tilt)
+        while pollinator.status == 'alive' and pollinator.days < max_days:
+            pollinator.move_one_day()
+        statuses.append(pollinator.status)
+        weights.append(pollinator.weight)
+    return statuses, weights
+
+
+def estimate_rare_death(field: Area, runs: int = 1000, death_tilt: float = 20.0, exit_tilt: float = 0.5,
+                        seed: int = 0, pollinator_class: type = Monarch) -> dict:
+    """
+    Estimates the chance a pollinator dies on the field with importance sampling, for fields where deaths are too rare
+    to count by plain simulation
+    :param field: the field to run on
+    :param runs: pollinators to run
+    :param death_tilt: factor on the chances of dying
+    :param exit_tilt: factor on the chances of exiting, below 1 to keep pollinators on the field longer
+    :param seed: base seed, pollinators get seed, seed + 1, ...
+    :param pollinator_class: the kind of pollinator
+    :return: weighted_estimate for 'dead'
+    >>> from Land_Use.Developed.farm import make_field
+    >>> result = estimate_rare_death(make_field('standard', 1), runs=20, death_tilt=5, exit_tilt=0.5)
+    >>> result['runs'], 0 <= result['estimate'] <= 1
+    (20, True)
+    """
+    statuses, weights = tilted_runs(field, list(range(seed, seed + runs)), death_tilt, exit_tilt, pollinator_class)
+    return weighted_estimate(statuses, weights, 'dead')
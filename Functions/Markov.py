@@ -0,0 +1,372 @@
+from Animal.Role import Pollinator, death_probability
+from Land_Use.Developed.farm import CropField
+import numpy as np
+
+
+# Places the chain can end up in for good, in the order of the columns of the absorption matrix
+absorbing = ('exit', 'dead')
+
+DAY = 0
+NIGHT = 1
+
+
+def _drops(amount: float, width: float) -> tuple:
+    # Food used up in a step, as whole bands: (bands, chance of one more) so the expected drop is exactly amount
+    bands = amount / width
+    return int(bands), bands - int(bands)
+
+
+class WalkChain:
+    """
+    A pollinator's day-to-day behavior as an absorbing Markov chain, so the chance of leaving and of dying can be
+    worked out exactly for every starting cell at once instead of simulating thousands of pollinators. It is a
+    screening model, not a copy of the object model. The behavior is boiled down to the two modes the object model
+    switches between with its food level. With at least fed_level food the pollinator roams, a move heading north with
+    chance north_bias and each other way equally often, using food_unit a move. With less it forages the way
+    seek_resource does: it flies straight for the nearest cell with food it would eat and eats there, with eat_chance
+    on a food cell and mixed_eat_chance on a mixed food and shelter cell. Mixed cells only feed it below mixed_level
+    food, as above that seek_resource stops to take shelter there instead of eating. fed_level and north_bias come
+    from the pollinator class (see Pollinator), like the food use and the death and exit chances.
+
+    Food levels are kept in bands of equal width, a fraction of a band being used up by moving down a band with that
+    chance. Exit and death chances are those of check_for_death and check_if_exit. A roaming pollinator rolls them
+    every moves_per_check moves, each move rolling the share that gives the same chance over a check; a trip to food
+    rolls them once, on arrival. Days last day_moves moves on average, and a night is spent in place using night_food,
+    with one death check.
+
+    The state is (phase, food band, cell) and the chain is solved with scipy.sparse: the probabilities h of ending in
+    each absorbing outcome satisfy (I - Q) h = R, where Q holds the moves between states and R the chance of leaving or
+    dying in one step. Big fields are solved on blocks of block x block cells, one move then crossing a whole block.
+    Chains of more than max_states states take too much memory to solve, so they are refused; use bigger blocks.
+    >>> chain = WalkChain(CropField([[1, 1, 1], [1, 2, 1], [1, 1, 1]]), food_unit=1, death_factor=0.01, exit_chance=0.5,
+    ...                   can_exit_north=True, fed_level=0, north_bias=0.5, bands=4)
+    >>> result = chain.solve()
+    >>> result.exit.shape, bool(np.allclose(result.exit + result.dead, 1))
+    ((3, 3), True)
+    >>> bool(result.exit[0, 1] > result.exit[2, 1])
+    True
+    >>> WalkChain(CropField([[1] * 100] * 3500))
+    Traceback (most recent call last):
+    ...
+    ValueError: A chain on a 3500 x 100 grid has 14000000 states, more than max_states (250000); use bigger blocks
+    """
+
+    # About half a minute and a gigabyte to solve; the cost grows much faster than the number of states
+    max_states = 250000
+
+    def __init__(self, area, pollinator_class: type = Pollinator, food_unit: float = None, death_factor: float = None,
+                 exit_chance: float = None, can_exit: bool = None, can_exit_north: bool = None,
+                 fed_level: float = None, north_bias: float = None, bands: int = 20, moves_per_check: float = 10,
+                 day_moves: float = 100, night_food: float = None, eat_chance: float = 0.99,
+                 mixed_eat_chance: float = 0.8, mixed_level: float = 25.0, block: int = 1):
+        """
+        :param area: Area or CropField to walk on
+        :param pollinator_class: where the food_unit, death_factor, exit_chance, can_exit, can_exit_north, fed_level
+        and north_bias not given here are taken from
+        :param bands: number of food bands between 0 and 100
+        :param moves_per_check: moves between two death and exit checks of a roaming pollinator
+        :param day_moves: average number of moves in a day
+        :param night_food: food used overnight, 144 moves' worth by default like a monarch at night
+        :param eat_chance: chance of eating on a food cell, which fills the pollinator up
+        :param mixed_eat_chance: chance of eating on a mixed food and shelter cell
+        :param mixed_level: food level below which mixed cells are eaten from
+        :param block: side of the blocks of cells the chain works on, 1 for every cell
+        """
+        def pick(value, name):
+            return getattr(pollinator_class, name) if value is None else value
+        self.food_unit = pick(food_unit, 'food_unit')
+        self.death_factor = pick(death_factor, 'death_factor')
+        self.exit_chance = pick(exit_chance, 'exit_chance')
+        self.can_exit = pick(can_exit, 'can_exit')
+        self.can_exit_north = pick(can_exit_north, 'can_exit_north')
+        self.fed_level = pick(fed_level, 'fed_level')
+        self.north_bias = pick(north_bias, 'north_bias')
+        self.bands = bands
+        self.moves_per_check = moves_per_check
+        self.day_moves = day_moves
+        self.night_food = 144 * self.food_unit if night_food is None else night_food
+        self.eat_chance = eat_chance
+        self.mixed_eat_chance = mixed_eat_chance
+        self.mixed_level = mixed_level
+        self.block = block
+        self.shape = (-(-area.shape[0] // block), -(-area.shape[1] // block))
+        self.cells = self.shape[0] * self.shape[1]
+        if self.states > self.max_states:
+            raise ValueError("A chain on a {} x {} grid has {} states, more than max_states ({}); use bigger blocks"
+                             .format(self.shape[0], self.shape[1], self.states, self.max_states))
+        # Whether each block has food cells, and mixed food and shelter cells
+        array = np.asarray(area.array)
+        self.food = self._blocks(array == 2)
+        self.mixed = self._blocks(array == 4)
+
+    def _blocks(self, mask: np.ndarray) -> np.ndarray:
+        block = self.block
+        if block == 1:
+            return mask.ravel()
+        padded = np.zeros((self.shape[0] * block, self.shape[1] * block), dtype=bool)
+        padded[:mask.shape[0], :mask.shape[1]] = mask
+        return padded.reshape(self.shape[0], block, self.shape[1], block).any(axis=(1, 3)).ravel()
+
+    @property
+    def states(self) -> int:
+        return 2 * self.bands * self.cells
+
+    def index(self, phase, band, cell):
+        # States of a cell are kept together, which keeps the factorization of the chain sparse
+        return (cell * self.bands + band) * 2 + phase
+
+    def _exit_cells(self) -> np.ndarray:
+        edge = np.zeros(self.shape, dtype=bool)
+        if self.can_exit or self.can_exit_north:
+            edge[0, :] = True
+        if self.can_exit:
+            edge[-1, :] = edge[:, 0] = edge[:, -1] = True
+        return edge.ravel()
+
+    def _step(self, parts: tuple, band: int, sources, targets, chance, eat, moves: int, checks):
+        """
+        Adds moves from the daytime states of band in the source cells to the target cells, each made with the given
+        chance, to the chain
+        :param parts: (rows, columns, values, r) being built up by matrices()
+        :param eat: chance of eating on getting to each target
+        :param moves: moves each takes, for the food used and the time of day
+        :param checks: death and exit checks made on the way to each target
+        """
+        rows, columns, values, r = parts
+        checks = np.broadcast_to(np.asarray(checks, dtype=float), np.shape(targets))
+        eat = np.broadcast_to(np.asarray(eat, dtype=float), np.shape(targets))
+        source = self.index(DAY, band, sources)
+        leave = np.where(self._exits[targets], 1 - (1 - self.exit_chance) ** checks, 0.0)
+        np.add.at(r[:, 0], source, chance * leave)
+        stayed = chance * (1 - leave)
+        to_night = min(1.0, moves / self.day_moves)
+        whole, extra = _drops(self.food_unit * moves, 100 / self.bands)
+        # Filled up, or down some bands
+        outcomes = [(self.bands - 1, eat)]
+        for drop, share in ((whole, 1 - extra), (whole + 1, extra)):
+            if share > 0:
+                outcomes.append((max(0, band - drop), (1 - eat) * share))
+        for new_band, share in outcomes:
+            weight = stayed * share
+            dead = 1 - (1 - self._per_check[new_band]) ** checks
+            np.add.at(r[:, 1], source, weight * dead)
+            alive = weight * (1 - dead)
+            for phase, part in ((DAY, 1 - to_night), (NIGHT, to_night)):
+                if part > 0:
+                    rows.append(source)
+                    columns.append(self.index(phase, new_band, targets))
+                    values.append(alive * part)
+
+    def matrices(self) -> tuple:
+        """
+        Builds the chain
+        :return: (Q, R): Q is the sparse states x states matrix of moves between living states, R the dense
+        states x 2 matrix of the chance of leaving or dying in one step (see absorbing)
+        """
+        from scipy import sparse
+        from scipy import ndimage
+        length, width = self.shape
+        cells = np.arange(self.cells)
+        band_width = 100 / self.bands
+        levels = (np.arange(self.bands) + 0.5) * band_width
+        # Chance of dying at a check in each band, judged at the middle of the band
+        self._per_check = death_probability(levels, self.death_factor)
+        self._exits = self._exit_cells()
+        parts = ([], [], [], np.zeros((self.states, 2)))
+        roam_checks = self.block / self.moves_per_check
+        # Neighbours on the area of every cell: north, south, west and east
+        x, y = np.divmod(cells, width)
+        neighbours = [(x > 0, cells - width), (x < length - 1, cells + width), (y > 0, cells - 1),
+                      (y < width - 1, cells + 1)]
+        for band, level in enumerate(levels):
+            if level >= self.fed_level:
+                headings = (self.north_bias,) + ((1 - self.north_bias) / 3,) * 3
+            else:
+                # The chance of a meal in each cell, for a pollinator this hungry
+                meal = np.where(self.food, self.eat_chance, 0.0)
+                if level < self.mixed_level:
+                    meal = np.where(self.mixed & ~self.food, self.mixed_eat_chance, meal)
+                table = meal > 0
+                headings = (0.25,) * 4 if not table.any() else None
+            if headings is not None:
+                # Roaming, or wandering about when there is nothing to eat
+                total = sum(valid * heading for (valid, target), heading in zip(neighbours, headings))
+                for (valid, target), heading in zip(neighbours, headings):
+                    self._step(parts, band, cells[valid], target[valid], heading / total[valid], 0.0, self.block,
+                               roam_checks)
+                continue
+            # Foraging: eat where there is food, otherwise head for the nearest food, by any of the ways that get closer
+            self._step(parts, band, cells[table], cells[table], 1.0, meal[table], 1, 1.0)
+            distance = ndimage.distance_transform_cdt(~table.reshape(self.shape), metric='taxicab').ravel()
+            closer = [valid & ~table & (distance[np.where(valid, target, 0)] < distance)
+                      for valid, target in neighbours]
+            ways = sum(way.astype(float) for way in closer)
+            for way, (valid, target) in zip(closer, neighbours):
+                arrive = table[target[way]]
+                self._step(parts, band, cells[way], target[way], 1 / ways[way], np.where(arrive, meal[target[way]], 0),
+                           self.block, arrive.astype(float))
+        rows, columns, values, r = parts
+        # Nights are spent in place
+        dead_night = self._per_check
+        night_whole, night_extra = _drops(self.night_food, band_width)
+        for band in range(self.bands):
+            source = self.index(NIGHT, band, cells)
+            for drop, chance in ((night_whole, 1 - night_extra), (night_whole + 1, night_extra)):
+                if chance <= 0:
+                    continue
+                new_band = max(0, band - drop)
+                r[source, 1] += chance * dead_night[new_band]
+                rows.append(source)
+                columns.append(self.index(DAY, new_band, cells))
+                values.append(np.full(self.cells, chance * (1 - dead_night[new_band])))
+        q = sparse.csr_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(columns))),
+                              shape=(self.states, self.states))
+        return q, r
+
+    def solve(self, method: str = 'direct', tolerance: float = 1e-10) -> 'AbsorptionResult':
+        """
+        Works out the chance of each outcome from every state
+        :param method: 'direct' (a sparse LU factorization) or 'iterative' (LGMRES, which needs less memory on long
+        narrow fields but is slower)
+        :param tolerance: relative tolerance of the iterative solver
+        :return: AbsorptionResult
+        """
+        from scipy import sparse
+        from scipy.sparse import linalg
+        q, r = self.matrices()
+        system = (sparse.identity(self.states, format='csr') - q).tocsc()
+        if method == 'direct':
+            # This ordering keeps the fill-in of the factors down best on these grid chains
+            solution = linalg.splu(system, permc_spec='MMD_AT_PLUS_A').solve(r)
+        elif method == 'iterative':
+            solution = np.empty_like(r)
+            for column in range(r.shape[1]):
+                answer, info = linalg.lgmres(system, r[:, column], rtol=tolerance, atol=0.0)
+                if info != 0:
+                    raise RuntimeError("The iterative solver did not converge (info {})".format(info))
+                solution[:, column] = answer
+        else:
+            raise ValueError("method must be 'direct' or 'iterative'")
+        return AbsorptionResult(self, np.clip(solution, 0.0, 1.0))
+
+
+class AbsorptionResult:
+    """
+    The outcome probabilities of a WalkChain for every state. exit and dead are rasters (of blocks, if the chain used
+    them) for pollinators starting out full during the day; probability() gives them for any food level and phase.
+    """
+
+    def __init__(self, chain: WalkChain, solution: np.ndarray):
+        self.chain = chain
+        self.solution = solution
+        self.exit = self.probability('exit')
+        self.dead = self.probability('dead')
+
+    def probability(self, outcome: str, food_level: float = 100.0, phase: int = DAY) -> np.ndarray:
+        """
+        :param outcome: 'exit' or 'dead'
+        :param food_level: food level at the start
+        :param phase: DAY or NIGHT
+        :return: raster of the chance of the outcome from each starting cell
+        """
+        chain = self.chain
+        band = min(chain.bands - 1, int(food_level * chain.bands / 100))
+        states = chain.index(phase, band, np.arange(chain.cells))
+        return self.solution[states, absorbing.index(outcome)].reshape(chain.shape)
+
+    def mean(self, weights: np.ndarray = None, food: np.ndarray = None) -> dict:
+        """
+        The chances of each outcome averaged over starting cells and food levels, for pollinators starting by day
+        :param weights: raster of how likely each starting cell is, e.g., monarch_starts(); all cells alike by default
+        :param food: how likely a pollinator is to start in each food band, e.g., starting_food(); full by default
+        :return: {'exit': percent, 'dead': percent}
+        """
+        chain = self.chain
+        weights = np.ones(chain.shape) if weights is None else np.asarray(weights, dtype=float)
+        weights = weights.ravel() / weights.sum()
+        if food is None:
+            food = np.zeros(chain.bands)
+            food[-1] = 1.0
+        food = np.asarray(food, dtype=float) / np.sum(food)
+        states = chain.index(DAY, np.arange(chain.bands)[None, :], np.arange(chain.cells)[:, None])
+        share = weights[:, None] * food[None, :]
+        return {outcome: 100 * float((self.solution[states, absorbing.index(outcome)] * share).sum())
+                for outcome in ('exit', 'dead')}
+
+
+def starting_food(bands: int = 20, mean: float = 50, spread: float = 20) -> np.ndarray:
+    """
+    How likely a new pollinator is to start in each food band: the constructor draws its food from a normal
+    distribution, truncates it to a whole number and keeps it between 0 and 100
+    :param bands: number of food bands, as in the WalkChain
+    :return: chance of each band, adding up to 1
+    >>> [round(float(chance), 3) for chance in starting_food(4)]
+    [0.106, 0.394, 0.394, 0.106]
+    """
+    from scipy.special import ndtr
+    # The food level ends up in [a, b) when the draw does, apart from negative draws (0) and draws of 100 or more
+    edges = np.linspace(0, 100, bands + 1)
+    below = ndtr((edges - mean) / spread)
+    chances = np.diff(below)
+    chances[0] += below[0]
+    chances[-1] += 1 - below[-1]
+    return chances
+
+
+def monarch_starts(area, block: int = 1) -> np.ndarray:
+    """
+    How likely a monarch is to start in each cell, following the Monarch constructor: the south row 62.5% of the time,
+    the southern half of the west or east column 12.5% each, and a shelter cell 12.5%
+    :param area: the area
+    :param block: sum over blocks of this size, to match a WalkChain with the same block
+    :return: raster of probabilities adding up to 1
+    >>> starts = monarch_starts(CropField([[1, 3], [1, 1], [1, 1]]))
+    >>> round(float(starts.sum()), 6), float(starts[0, 1])
+    (1.0, 0.125)
+    """
+    length, width = area.shape
+    starts = np.zeros(area.shape)
+    starts[-1, :] += 0.625 / width
+    half = np.arange(length // 2, length - 1)
+    if len(half):
+        starts[half, 0] += 0.125 / len(half)
+        starts[half, width - 1] += 0.125 / len(half)
+    shelter = area.shelter_coords
+    if len(shelter):
+        starts[shelter[:, 0], shelter[:, 1]] += 0.125 / len(shelter)
+    else:
+        starts[-1, 0] += 0.125
+    starts /= starts.sum()
+    if block > 1:
+        rows = -(-length // block) * block
+        columns = -(-width // block) * block
+        padded = np.zeros((rows, columns))
+        padded[:length, :width] = starts
+        starts = padded.reshape(rows // block, block, columns // block, block).sum(axis=(1, 3))
+    return starts
+
+
+def screen_fields(fields: dict, pollinator_class: type = None, block: int = 10, **options) -> dict:
+    """
+    Dead and exit percentages of monarchs on each field from the Markov chain instead of simulation, to pick out the
+    fields worth simulating. Monarchs start where the Monarch constructor puts them, with the food it gives them. The
+    percentages themselves are rough, but the chain puts fields in the same order the simulation does; e.g., 200
+    simulated monarchs on each of these fields give about 3% dead on standard and 50% on fallow.
+    :param fields: {name: field}
+    :param pollinator_class: the kind of pollinator, Monarch by default
+    :param block: side of the blocks the chains work on
+    :param options: anything else WalkChain takes
+    :return: {name: {'exit': percent, 'dead': percent}}
+    >>> from Land_Use.Developed.farm import make_field
+    >>> results = screen_fields({name: make_field(name, 2) for name in ('fallow', 'standard')})
+    >>> sorted(results, key=lambda name: results[name]['dead'])
+    ['standard', 'fallow']
+    """
+    if pollinator_class is None:
+        from Animal.Danaus.plexippus import Monarch
+        pollinator_class = Monarch
+    results = {}
+    for name, field in fields.items():
+        chain = WalkChain(field, pollinator_class, block=block, **options)
+        results[name] = chain.solve().mean(monarch_starts(field, block), starting_food(chain.bands))
+    return results
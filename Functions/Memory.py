@@ -0,0 +1,237 @@
+import gc
+import sys
+import tracemalloc
+import numpy as np
+
+
+def _nbytes(value) -> int:
+    # Bytes held by an array (or anything that knows its nbytes), zero for None. Memory-mapped arrays live on disk.
+    if value is None or isinstance(value, np.memmap):
+        return 0
+    return int(getattr(value, 'nbytes', 0))
+
+
+def list_bytes(items: list) -> int:
+    """
+    Rough size of a list of tuples of small numbers, e.g., a moves list: the list itself plus each tuple in it. The
+    numbers are mostly shared small ints and aren't counted.
+    >>> list_bytes([]) < list_bytes([(0, 0), (1, 0)])
+    True
+    """
+    if items is None:
+        return 0
+    size = sys.getsizeof(items)
+    if len(items):
+        size += len(items) * sys.getsizeof(items[0])
+    return size
+
+
+def field_bytes(area) -> dict:
+    """
+    Where the memory of an area goes: the land class raster, the food and shelter masks and coordinate tables, the
+    deprecated index lists, summary and travel cost fields if they were ever built, and whatever trackers are attached
+    :param area: Area, CropField or SparseArea
+    :return: {part: bytes}, including 'total'
+    >>> from Land_Use.Developed.farm import CropField
+    >>> parts = field_bytes(CropField([[1, 2], [3, 4]]))
+    >>> parts['raster'], parts['total'] == sum(v for k, v in parts.items() if k != 'total')
+    (4, True)
+    """
+    parts = {'raster': _nbytes(area.array),
+             'masks': _nbytes(area.food_mask) + _nbytes(area.shelter_mask),
+             'coords': sum(_nbytes(coords) for coords in getattr(area, '_coords', {}).values()) if
+             hasattr(area, '_coords') else _nbytes(area.food_coords) + _nbytes(area.shelter_coords),
+             'index_lists': list_bytes(area._food_indices) + list_bytes(area._shelter_indices)}
+    summary = getattr(area, '_summary', None)
+    parts['summary'] = 0 if summary is None else sum(_nbytes(value) for value in vars(summary).values())
+    parts['occupancy'] = 0 if area.occupancy is None else _nbytes(area.occupancy.raster)
+    hazard = getattr(area, 'hazard', None)
+    parts['hazard'] = 0 if hazard is None else _nbytes(hazard.base) + sum(_nbytes(event[2]) for event in
+                                                                           hazard.events) + \
+        (_nbytes(hazard._raster) if hazard._raster is not hazard.base else 0)
+    weather = getattr(area, 'weather', None)
+    parts['weather'] = 0 if weather is None else sum(_nbytes(layer) for layer in
+                                                     (weather.rain, weather.wind, weather.temperature))
+    parts['cost_fields'] = sum(field.nbytes for field in getattr(area, '_cost_fields', {}).values())
+    grid = getattr(area, 'agent_grid', None)
+    parts['agent_grid'] = 0 if grid is None else sys.getsizeof(grid.bucket_of) + sum(
+        sys.getsizeof(bucket) for bucket in grid.buckets.values())
+    parts['total'] = sum(parts.values())
+    return parts
+
+
+def agent_bytes(pollinator) -> dict:
+    """
+    Where the memory of one pollinator goes: its own state and its recorded moves
+    :return: {'state': bytes, 'trajectory': bytes, 'total': bytes}
+    >>> from Animal.Role import Pollinator
+    >>> parts = agent_bytes(Pollinator())
+    >>> parts['state'] > 0, parts['total'] == parts['state'] + parts['trajectory']
+    (True, True)
+    """
+    parts = {'state': sys.getsizeof(pollinator), 'trajectory': list_bytes(pollinator.moves)}
+    parts['total'] = parts['state'] + parts['trajectory']
+    return parts
+
+
+def population_bytes(pollinators) -> dict:
+    """
+    agent_bytes added up over a collection of pollinators
+    """
+    totals = {'agents': 0, 'state': 0, 'trajectory': 0, 'total': 0}
+    for pollinator in pollinators:
+        totals['agents'] += 1
+        for part, size in agent_bytes(pollinator).items():
+            totals[part] += size
+    return totals
+
+
+def current_rss() -> int:
+    """
+    The resident memory of this process in bytes right now, or None where the operating system doesn't say (only
+    Linux's /proc is read)
+    """
+    try:
+        with open('/proc/self/statm') as source:
+            pages = int(source.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    import os
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def peak_rss() -> int:
+    """
+    The most resident memory this process has used so far, in bytes, or None on systems without the resource module
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class MemoryTracker:
+    """
+    Notes down the memory use of the process at named checkpoints of a run: current and peak RSS, and if trace is on,
+    what tracemalloc has seen allocated by Python (current and peak, and the biggest allocation sites of the last
+    snapshot). Tracing costs time, so it is off by default.
+    >>> tracker = MemoryTracker()
+    >>> tracker.checkpoint('start')['name']
+    'start'
+    >>> len(tracker.checkpoints)
+    1
+    """
+
+    def __init__(self, trace: bool = False, top: int = 5):
+        """
+        :param trace: start tracemalloc (if it isn't running already) so allocations can be attributed
+        :param top: allocation sites to keep from each snapshot
+        """
+        self.checkpoints = []
+        self.top = top
+        self._started = False
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+
+    def checkpoint(self, name: str) -> dict:
+        """
+        Records the memory use now under the given name
+        :return: the checkpoint record
+        """
+        record = {'name': name, 'rss': current_rss(), 'peak_rss': peak_rss()}
+        if tracemalloc.is_tracing():
+            record['traced'], record['traced_peak'] = tracemalloc.get_traced_memory()
+            statistics = tracemalloc.take_snapshot().statistics('lineno')[:self.top]
+            record['top'] = [(str(stat.traceback), stat.size) for stat in statistics]
+        self.checkpoints.append(record)
+        return record
+
+    def stop(self):
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def report(self) -> str:
+        """
+        A simple table of the checkpoints, in megabytes
+        """
+        def mb(value):
+            return '{:10.1f}'.format(value / 2 ** 20) if value is not None else '{:>10}'.format('-')
+        lines = ['{:<30}{:>10}{:>10}{:>10}{:>10}'.format('checkpoint', 'rss MB', 'peak MB', 'py MB', 'py peak')]
+        for record in self.checkpoints:
+            lines.append('{:<30}{}{}{}{}'.format(record['name'][:29], mb(record['rss']), mb(record['peak_rss']),
+                                                 mb(record.get('traced')), mb(record.get('traced_peak'))))
+            for site, size in record.get('top', []):
+                lines.append('    {:<56}{}'.format(site[-56:], mb(size)))
+        return '\n'.join(lines)
+
+    def __str__(self) -> str:
+        return self.report()
+
+
+class MemoryBudget:
+    """
+    A limit on the resident memory of a run. Runners check it between batches of work and, rather than being killed
+    for running out of memory, turn recording of moves off and take smaller batches once usage passes the limit.
+    >>> budget = MemoryBudget(limit=1)
+    >>> budget.over(), budget.recording(True), budget.batch_size(64)
+    (True, False, 32)
+    >>> MemoryBudget(limit=None).batch_size(64)
+    64
+    """
+
+    def __init__(self, limit: int = None, tracker: MemoryTracker = None):
+        """
+        :param limit: bytes of resident memory allowed, None for no limit
+        :param tracker: optional MemoryTracker to note down each check in
+        """
+        self.limit = limit
+        self.tracker = tracker
+        self.exceeded = 0
+
+    @classmethod
+    def megabytes(cls, limit: float, tracker: MemoryTracker = None) -> 'MemoryBudget':
+        return cls(None if limit is None else int(limit * 2 ** 20), tracker)
+
+    def usage(self) -> int:
+        rss = current_rss()
+        return peak_rss() if rss is None else rss
+
+    def over(self) -> bool:
+        """
+        Whether the process is using more than the budget. Garbage is collected first so only live memory counts.
+        """
+        if self.limit is None:
+            return False
+        usage = self.usage()
+        if usage is not None and usage > self.limit:
+            gc.collect()
+            usage = self.usage()
+        if usage is not None and usage > self.limit:
+            self.exceeded += 1
+            return True
+        return False
+
+    def check(self, name: str) -> bool:
+        """
+        over(), noting the check down in the tracker if there is one
+        """
+        if self.tracker is not None:
+            self.tracker.checkpoint(name)
+        return self.over()
+
+    def recording(self, wanted: bool = True) -> bool:
+        """
+        Whether pollinators should record their moves: as wanted, unless the budget is used up
+        """
+        return wanted and not self.over()
+
+    def batch_size(self, size: int) -> int:
+        """
+        The batch size to use next: the same, or half of it (but at least 1) if the budget is used up
+        """
+        return max(1, size // 2) if self.over() else size
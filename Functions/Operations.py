@@ -14,4 +14,13 @@ def manhattan_distance(x: list, y: tuple) -> int:
     9
     '''
     # assert type(x[0]) is int and type(x[1]) is int and type(y[0]) is int and type(y[1]) is int
-    return abs(x[0] - y[0]) + abs(x[1] - y[1])
\ No newline at end of file
+    return abs(x[0] - y[0]) + abs(x[1] - y[1])
+
+
+def clock(days: int, hours: int = 0, seconds: int = 0) -> int:
+    """
+    A pollinator's days, hours and seconds as seconds since midnight of day 0, the time used by Hazard events
+    >>> clock(1, 6, 30)
+    108030
+    """
+    return days * 86400 + hours * 3600 + seconds
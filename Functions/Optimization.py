@@ -1,50 +1,49 @@
 from Animal.Role import *
 from Animal.Danaus.plexippus import *
 from Land_Use.Developed.farm import *
+from Land_Use.Developed.layout import LayoutGenerator
+from Functions.Progress import turns_simulated
 import numpy as np
-import pandas as pd
 from Functions.Tests import *
 
 
-def iterate_field(group: list = None, number_fields: int = 2) -> CropField:
+def iterate_field(group: list = None, number_fields: int = 2, rng=np.random) -> CropField:
     """
     Iterate groups of fields to find optimal arrangements. Group is a list of
     CropField objects, or we'll create some from the standard tests.
     :param group: The field group to be optimized
     :param number_fields: How many from the group to select.
+    :param rng: source of random numbers, np.random or a np.random.RandomState
     :return: Optimal cropfield
     >>>
     """
     if group:
         pass
     else:
-        group = ['standard', 'food heavy', 'shelter heavy', "middle food windbreak",
-                 'middle shelter windbreak', 'middle shelter windbreak 2', 'fallow']
+        group = list(field_types)
     total = []
     for i in range(number_fields):
-        temp = np.random.choice(group)
-        if temp == 'standard':
-            created = StandardTest(34)
-        elif temp == 'food heavy':
-            created = HeavyFoodTest(34)
-        elif temp == 'shelter heavy':
-            created = ShelterHeavyTest(34)
-        elif temp == 'middle food windbreak':
-            created = MiddleFoodWindbreakTest(34)
-        elif temp == 'middle shelter windbreak':
-            created = MiddleShelterWindbreakTest(34)
-        elif temp == 'middle shelter windbreak 2':
-            created = MiddleShelterWindbreakTest2(34)
-        elif temp == 'fallow':
-            created = FallowTest(34)
+        temp = rng.choice(group)
+        if isinstance(temp, str):
+            created = make_field(temp, 34)
         else:
             created = temp
         total.append(created)
     return total
 
 
+def field_names(arrangement: list) -> list:
+    """
+    The kinds of field in an arrangement, e.g., ['FallowTest', 'StandardTest'], which is all that is kept of an
+    arrangement once its fields have been let go. Names already in the arrangement are kept as they are.
+    >>> field_names([make_field('fallow', 1), 'StandardTest'])
+    ['FallowTest', 'StandardTest']
+    """
+    return [field if isinstance(field, str) else type(field).__name__ for field in arrangement]
+
+
 def optimize_field_group(number_of_fields: int=5, dead_goal: int = 25, exit_goal: int = 50,
-                   num_iters: int = 1000, total_iters: int=100) -> tuple:
+                   num_iters: int = 1000, total_iters: int=100, profiler=None, budget=None, progress=None) -> tuple:
     '''
     The goal of this function is to find an optimal arrangement of fields. It will start with a single field and repeat
     it across several rows and columns, then run butterflies through the entire set and see if we can find an optimal
@@ -55,27 +54,43 @@ def optimize_field_group(number_of_fields: int=5, dead_goal: int = 25, exit_goal
     :param exit_goal:
     :param num_iters:
     :param total_iters:
+    :param profiler: optional PhaseProfiler, reported at the end of the run
+    :param budget: optional MemoryBudget (see Functions.Memory). Once it is used up the monarchs stop recording their
+    moves, and only the kinds of field (see field_names) are kept for arrangements that aren't the best so far.
+    :param progress: optional Progress (see Functions.Progress), told about every arrangement as it is finished
     :return:
     '''
+    if progress is not None:
+        progress.total, progress.unit = total_iters + 1, 'arrangements'
     master_list = []
-    result_list = []
     exit_pct = 0
     dead_pct = 100
     iters = 0
     while exit_pct <= exit_goal and dead_pct >= dead_goal and iters <= total_iters:
         arrangement = iterate_field(number_fields=number_of_fields)
-        master_field = arrangement[0]
-        for i in range(1, len(arrangement)):
-            master_field.concatenate(arrangement[i].array)
+        # The fields are stacked north to south into the one field the monarchs fly through
+        master_field = CropField.assemble(arrangement)
         # Simulate to see how well the field does
+        result_list = []
+        turns = 0
+        recording = budget is None or budget.recording()
         for i in range(num_iters):
-            b1 = Monarch(master_field)
+            b1 = Monarch(master_field, recording=recording)
+            if profiler is not None:
+                b1.enable_profiling(profiler)
             while b1.status == 'alive':
                 b1.move_one_day()
             result_list.append(b1.status)
+            turns += turns_simulated(b1)
         dead_pct = result_list.count("dead")/len(result_list) * 100
         exit_pct = result_list.count("exit")/len(result_list) * 100
+        if progress is not None:
+            progress.update(agents=num_iters, turns=turns, best=(field_names(arrangement), dead_pct))
         master_list.append((iters, arrangement, dead_pct, exit_pct))
+        if budget is not None and budget.check('arrangement {}'.format(iters)):
+            best = min(master_list, key=lambda item: item[2])
+            master_list = [item if item is best else (item[0], field_names(item[1])) + item[2:]
+                           for item in master_list]
         if iters % 5 == 0:
             print("Working on iteration {}".format(iters))
         iters += 1
@@ -83,5 +98,68 @@ def optimize_field_group(number_of_fields: int=5, dead_goal: int = 25, exit_goal
     for item in master_list:
         dead_pct.append(item[2])
     min_index = dead_pct.index(min(dead_pct))
+    if progress is not None:
+        progress.finish()
+    if profiler is not None:
+        print(profiler.report())
     return master_list[min_index]
 
+
+
+def optimize_layout(generator: LayoutGenerator, population: int = 20, generations: int = 5, num_iters: int = 100,
+                    mutation_rate: float = 0.2, max_gap: int = None, profiler=None, progress=None) -> tuple:
+    '''
+    Searches for a good farmable layout with a LayoutGenerator instead of arranging pre-defined fields. Each generation
+    the better half of the layouts (fewest dead monarchs) is kept and mutated copies of them replace the rest. Every
+    layout meets the generator's crop, food and shelter ratios exactly.
+    :param generator: a LayoutGenerator set up with the field size and ratios wanted
+    :param population: layouts per generation
+    :param generations: number of generations
+    :param num_iters: monarchs run through each layout
+    :param mutation_rate: chance of changing each setting of a layout, see LayoutGenerator.mutate
+    :param max_gap: if given, layouts with a longer north-south stretch than this without food or shelter (see
+    FieldSummary.largest_gap) are counted as 100% dead without running any monarchs
+    :param profiler: optional PhaseProfiler, reported at the end of the run
+    :param progress: optional Progress (see Functions.Progress), told about every layout as it is finished
+    :return: (dead percent, exit percent, CropField) of the best layout found
+    '''
+    if progress is not None:
+        progress.total, progress.unit = population * generations, 'layouts'
+    params = generator.sample_params(population)
+    best = None
+    for generation in range(generations):
+        layouts = generator.build(params)
+        dead_pct = np.empty(population)
+        for i in range(population):
+            field = CropField(layouts[i])
+            if max_gap is not None and field.summary.largest_gap > max_gap:
+                dead_pct[i] = 100
+                if progress is not None:
+                    progress.update()
+                continue
+            results = []
+            turns = 0
+            for j in range(num_iters):
+                b1 = Monarch(field)
+                if profiler is not None:
+                    b1.enable_profiling(profiler)
+                while b1.status == 'alive':
+                    b1.move_one_day()
+                results.append(b1.status)
+                turns += turns_simulated(b1)
+            dead_pct[i] = results.count("dead") / len(results) * 100
+            if best is None or dead_pct[i] < best[0]:
+                best = (float(dead_pct[i]), results.count("exit") / len(results) * 100, field)
+            if progress is not None:
+                progress.update(agents=num_iters, turns=turns,
+                                best=('generation {} layout {}'.format(generation, i), float(dead_pct[i])))
+        print("Generation {}: best {:.2f}% dead".format(generation, dead_pct.min()))
+        keep = dead_pct.argsort()[:max(1, population // 2)]
+        parents = keep[generator.rng.randint(0, len(keep), population - len(keep))]
+        children = generator.mutate({key: value[parents] for key, value in params.items()}, mutation_rate)
+        params = {key: np.concatenate((params[key][keep], children[key])) for key in params}
+    if progress is not None:
+        progress.finish()
+    if profiler is not None:
+        print(profiler.report())
+    return best
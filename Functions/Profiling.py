@@ -0,0 +1,182 @@
+import functools
+import os
+import subprocess
+import sys
+import time
+
+
+# What a worker process has to import to simulate pollinators, and how long that is allowed to take on a cold start.
+# Plotting and table libraries are only loaded when they are used, so this is mostly the cost of importing numpy.
+worker_modules = ('Land_Use.Developed.farm', 'Animal.Danaus.plexippus', 'Animal.Apidae.Bombus.bumble_bee')
+COLD_START_TARGET = 0.25
+
+
+class PhaseProfiler:
+    """
+    Collects call counts, turns used and wall time for each activity phase and movement primitive of a pollinator.
+    One profiler can be shared by a whole population of pollinators so the numbers roll up automatically, and
+    profilers from separate processes can be combined with merge(). Timings are inclusive, so a seek_resource call
+    made during the morning is counted both under 'seek_resource' and under 'morning_activity'.
+    >>> p = PhaseProfiler()
+    >>> p.record('seek_resource', turns=4, seconds=0.5)
+    >>> p.record('seek_resource', turns=2, seconds=0.25)
+    >>> p.calls['seek_resource'], p.turns['seek_resource']
+    (2, 6)
+    >>> q = PhaseProfiler()
+    >>> q.record('soar', turns=10, seconds=0.1)
+    >>> p.merge(q).calls['soar']
+    1
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.turns = {}
+        self.seconds = {}
+        self.rng_draws = {}
+        self.agents = 0
+
+    def record(self, name: str, turns: int = 0, seconds: float = 0.0):
+        """
+        Adds one call of the named phase or primitive to the totals
+        :param name: the phase or primitive name
+        :param turns: turns used during the call
+        :param seconds: wall time spent in the call
+        :return: None
+        """
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.turns[name] = self.turns.get(name, 0) + turns
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def run(self, name: str, agent, method, *args, **kwargs):
+        """
+        Calls the method, timing it and counting how many turns the agent used while it ran
+        :param name: label to file the call under
+        :param agent: the pollinator the method belongs to
+        :param method: the bound method or function to call
+        :return: whatever the method returns
+        """
+        turns = agent.turns
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self.record(name, agent.turns - turns, time.perf_counter() - start)
+
+    def count_draw(self, name: str):
+        self.rng_draws[name] = self.rng_draws.get(name, 0) + 1
+
+    def counting(self, rng):
+        """
+        Wraps a random number source so every draw taken from it is counted by this profiler
+        :param rng: np.random or a np.random.RandomState
+        :return: a proxy with the same interface as rng
+        """
+        if isinstance(rng, _CountingRandom):
+            return rng
+        return _CountingRandom(rng, self)
+
+    def merge(self, other: 'PhaseProfiler') -> 'PhaseProfiler':
+        """
+        Adds the totals of another profiler into this one, e.g., one returned from a worker process
+        :param other: another PhaseProfiler
+        :return: self, so merges can be chained
+        """
+        for mine, theirs in ((self.calls, other.calls), (self.turns, other.turns),
+                             (self.seconds, other.seconds), (self.rng_draws, other.rng_draws)):
+            for name, value in theirs.items():
+                mine[name] = mine.get(name, 0) + value
+        self.agents += other.agents
+        return self
+
+    def as_dict(self) -> dict:
+        return {'agents': self.agents, 'calls': dict(self.calls), 'turns': dict(self.turns),
+                'seconds': dict(self.seconds), 'rng_draws': dict(self.rng_draws)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'PhaseProfiler':
+        profiler = cls()
+        profiler.agents = data.get('agents', 0)
+        profiler.calls.update(data.get('calls', {}))
+        profiler.turns.update(data.get('turns', {}))
+        profiler.seconds.update(data.get('seconds', {}))
+        profiler.rng_draws.update(data.get('rng_draws', {}))
+        return profiler
+
+    def report(self) -> str:
+        """
+        A simple text table of the totals, slowest entries first
+        :return: string for printing
+        """
+        lines = ['Profile of {} pollinators'.format(self.agents),
+                 '{:<26}{:>12}{:>14}{:>12}{:>14}'.format('phase', 'calls', 'turns', 'seconds', 'us/call')]
+        for name in sorted(self.calls, key=lambda x: self.seconds[x], reverse=True):
+            lines.append('{:<26}{:>12}{:>14}{:>12.3f}{:>14.1f}'.format(
+                name, self.calls[name], self.turns[name], self.seconds[name],
+                1e6 * self.seconds[name] / self.calls[name]))
+        if self.rng_draws:
+            lines.append('{:<26}{:>12}'.format('rng draws', sum(self.rng_draws.values())))
+            for name in sorted(self.rng_draws, key=self.rng_draws.get, reverse=True):
+                lines.append('  {:<24}{:>12}'.format(name, self.rng_draws[name]))
+        return '\n'.join(lines)
+
+    def __str__(self) -> str:
+        return self.report()
+
+
+class _CountingRandom:
+    """
+    Forwards attribute access to a random number source, counting each call made through it
+    """
+
+    def __init__(self, rng, profiler: PhaseProfiler):
+        self._rng = rng
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        attribute = getattr(self._rng, name)
+        if not callable(attribute):
+            return attribute
+        profiler = self._profiler
+
+        def counted(*args, **kwargs):
+            profiler.count_draw(name)
+            return attribute(*args, **kwargs)
+        return counted
+
+
+def profiled(name: str):
+    """
+    Decorator for pollinator methods. When the pollinator has no profiler attached this costs a single attribute
+    check, otherwise the call is timed and filed under the given name.
+    :param name: label to file the calls under
+    :return: decorator
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            profiler = self.profiler
+            if profiler is None:
+                return method(self, *args, **kwargs)
+            return profiler.run(name, self, method, self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def cold_start_time(modules: tuple = worker_modules, repeat: int = 3) -> float:
+    """
+    Measures how long a fresh Python process takes to import the given modules, the way a new worker in a process pool
+    would. The best of several runs is reported to keep noise from other processes out of the number.
+    :param modules: names of the modules to import
+    :param repeat: number of fresh processes to time
+    :return: seconds, to compare against COLD_START_TARGET
+    """
+    script = ('import time; start = time.perf_counter(); import {}; '
+              'print(time.perf_counter() - start)').format(', '.join(modules))
+    # run from the top of the project so the packages can be found
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times = []
+    for i in range(repeat):
+        output = subprocess.run([sys.executable, '-c', script], stdout=subprocess.PIPE, check=True, cwd=root,
+                                universal_newlines=True).stdout
+        times.append(float(output))
+    return min(times)
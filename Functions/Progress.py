@@ -0,0 +1,232 @@
+import json
+import os
+import sys
+import time
+
+
+def turns_simulated(pollinator) -> int:
+    """
+    How many turns a pollinator has taken since it was made. The turn counter itself is reset every phase of the day,
+    but each turn moves the clock on 25 seconds, so the count is read off the clock instead.
+    >>> from Animal.Role import Pollinator
+    >>> p = Pollinator()
+    >>> turns_simulated(p)
+    0
+    >>> p.seconds += 250
+    >>> turns_simulated(p)
+    10
+    """
+    days, hours, seconds = pollinator.start[:3]
+    return ((pollinator.days - days) * 86400 + (pollinator.hours - hours) * 3600 + pollinator.seconds - seconds) // 25
+
+
+class Progress:
+    """
+    Keeps count of the work a long run has done and passes a snapshot of it to its callbacks: units finished out of
+    the total (replicates, candidates, arrangements or layouts), pollinators and agent-turns simulated and how fast,
+    the best result so far, an estimate of the time left, and the same numbers for each worker so a slow one stands
+    out. Callbacks are any functions taking the snapshot dict, e.g., JsonLinesExporter or PrometheusExporter. They are
+    called at most once every interval seconds, plus once when the last unit is done and once more on finish().
+    >>> seen = []
+    >>> progress = Progress(total=4, callbacks=[seen.append], interval=0)
+    >>> progress.update(agents=10, turns=5000, worker='a', best=(['fallow'], 20.0))
+    >>> progress.update(2, agents=20, turns=9000, worker='b')
+    >>> snapshot = progress.snapshot()
+    >>> snapshot['done'], snapshot['agents'], snapshot['turns'], snapshot['best']
+    (3, 30, 14000, {'value': 20.0, 'item': ['fallow']})
+    >>> sorted(snapshot['workers']), snapshot['workers']['b']['done'], len(seen)
+    (['a', 'b'], 2, 2)
+    """
+
+    def __init__(self, total: int = None, callbacks: list = (), interval: float = 10.0, unit: str = 'replicates',
+                 clock=time.monotonic):
+        """
+        :param total: units of work in the run, None if not known in advance (then there is no estimate of time left)
+        :param callbacks: functions to hand each snapshot to
+        :param interval: least number of seconds between two snapshots
+        :param unit: what a unit of work is called, for the reports
+        :param clock: function returning the time in seconds
+        """
+        self.total = total
+        self.callbacks = list(callbacks)
+        self.interval = interval
+        self.unit = unit
+        self.clock = clock
+        self.started = clock()
+        self.done = 0
+        self.agents = 0
+        self.turns = 0
+        self.best = None
+        self.workers = {}
+        self.finished = False
+        self._last = None
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def update(self, count: int = 1, agents: int = 0, turns: int = 0, worker: str = None, seconds: float = None,
+               best: tuple = None):
+        """
+        Notes down finished work
+        :param count: units of work finished
+        :param agents: pollinators simulated for them
+        :param turns: agent-turns simulated for them
+        :param worker: name of the worker that did them, None for this process
+        :param seconds: time the worker spent on them, if it was measured there
+        :param best: (item, value) if this work gave a result to rank, lower values being better (e.g., dead percent)
+        :return: None
+        """
+        now = self.clock()
+        self.done += count
+        self.agents += agents
+        self.turns += turns
+        if best is not None and (self.best is None or best[1] < self.best[1]):
+            self.best = best
+        worker = 'main' if worker is None else str(worker)
+        stats = self.workers.setdefault(worker, {'done': 0, 'agents': 0, 'turns': 0, 'seconds': 0.0, 'last': now})
+        stats['done'] += count
+        stats['agents'] += agents
+        stats['turns'] += turns
+        stats['seconds'] += (now - stats['last']) if seconds is None else seconds
+        stats['last'] = now
+        if self._last is None or now - self._last >= self.interval or self.done == self.total:
+            self._emit(now)
+
+    def snapshot(self, now: float = None) -> dict:
+        """
+        The state of the run, as a dict that can be turned into JSON
+        """
+        now = self.clock() if now is None else now
+        elapsed = now - self.started
+        snapshot = {'time': time.time(), 'unit': self.unit, 'done': self.done, 'total': self.total,
+                    'elapsed': elapsed, 'agents': self.agents, 'turns': self.turns,
+                    'agents_per_second': self.agents / elapsed if elapsed > 0 else 0.0,
+                    'turns_per_second': self.turns / elapsed if elapsed > 0 else 0.0,
+                    'eta': None, 'best': None, 'finished': self.finished, 'workers': {}}
+        if self.total is not None and self.done:
+            snapshot['eta'] = max(0.0, elapsed / self.done * (self.total - self.done))
+        if self.best is not None:
+            snapshot['best'] = {'value': self.best[1], 'item': self.best[0]}
+        for worker, stats in self.workers.items():
+            snapshot['workers'][worker] = {
+                'done': stats['done'], 'agents': stats['agents'], 'turns': stats['turns'], 'seconds': stats['seconds'],
+                'turns_per_second': stats['turns'] / stats['seconds'] if stats['seconds'] > 0 else 0.0,
+                'idle': now - stats['last']}
+        return snapshot
+
+    def _emit(self, now: float = None):
+        self._last = self.clock() if now is None else now
+        if not self.callbacks:
+            return
+        snapshot = self.snapshot(self._last)
+        for callback in self.callbacks:
+            callback(snapshot)
+
+    def finish(self):
+        """
+        Marks the run as done and hands the final snapshot to the callbacks
+        """
+        self.finished = True
+        self._emit()
+
+
+class JsonLinesExporter:
+    """
+    Appends every snapshot to a file as one line of JSON, so a running job can be followed with tail -f and the whole
+    history read back with json.loads on each line. A path of '-' writes to stderr.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self, snapshot: dict):
+        line = json.dumps(snapshot, default=str) + '\n'
+        if self.path == '-':
+            sys.stderr.write(line)
+            sys.stderr.flush()
+        else:
+            with open(self.path, 'a') as output:
+                output.write(line)
+
+
+class PrometheusExporter:
+    """
+    Keeps the latest snapshot in a file in the Prometheus text format, for the textfile collector of node_exporter
+    (point it at a *.prom file in the collector's directory). The file is written next to its final name and then
+    moved into place, so the collector never reads half of it.
+    >>> import tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'pmc.prom')
+    >>> progress = Progress(total=2, callbacks=[PrometheusExporter(path)], interval=0)
+    >>> progress.update(agents=5, turns=100, worker='w1')
+    >>> lines = open(path).read().splitlines()
+    >>> 'pmc_done 1' in lines, 'pmc_worker_turns_total{worker="w1"} 100' in lines
+    (True, True)
+    """
+
+    metrics = (('done', 'gauge', 'Units of work finished'),
+               ('total', 'gauge', 'Units of work in the run'),
+               ('agents_total', 'counter', 'Pollinators simulated'),
+               ('turns_total', 'counter', 'Agent-turns simulated'),
+               ('agents_per_second', 'gauge', 'Pollinators simulated per second over the run'),
+               ('turns_per_second', 'gauge', 'Agent-turns simulated per second over the run'),
+               ('elapsed_seconds', 'gauge', 'Seconds since the run started'),
+               ('eta_seconds', 'gauge', 'Estimated seconds until the run is done'),
+               ('best', 'gauge', 'Best (lowest) result so far'),
+               ('finished', 'gauge', '1 once the run is done'))
+    worker_metrics = (('done', 'counter', 'Units of work finished by the worker'),
+                      ('turns_total', 'counter', 'Agent-turns simulated by the worker'),
+                      ('turns_per_second', 'gauge', 'Agent-turns per second of the worker while busy'),
+                      ('idle_seconds', 'gauge', 'Seconds since the worker last finished a unit'))
+
+    def __init__(self, path: str, prefix: str = 'pmc'):
+        self.path = path
+        self.prefix = prefix
+
+    def render(self, snapshot: dict) -> str:
+        values = {'done': snapshot['done'], 'total': snapshot['total'], 'agents_total': snapshot['agents'],
+                  'turns_total': snapshot['turns'], 'agents_per_second': snapshot['agents_per_second'],
+                  'turns_per_second': snapshot['turns_per_second'], 'elapsed_seconds': snapshot['elapsed'],
+                  'eta_seconds': snapshot['eta'],
+                  'best': None if snapshot['best'] is None else snapshot['best']['value'],
+                  'finished': int(snapshot['finished'])}
+        lines = []
+        for name, kind, text in self.metrics:
+            if values[name] is None:
+                continue
+            lines.extend(['# HELP {}_{} {}'.format(self.prefix, name, text),
+                          '# TYPE {}_{} {}'.format(self.prefix, name, kind),
+                          '{}_{} {}'.format(self.prefix, name, values[name])])
+        workers = snapshot['workers']
+        for name, kind, text in self.worker_metrics:
+            if not workers:
+                break
+            key = {'turns_total': 'turns', 'idle_seconds': 'idle'}.get(name, name)
+            lines.extend(['# HELP {}_worker_{} {}'.format(self.prefix, name, text),
+                          '# TYPE {}_worker_{} {}'.format(self.prefix, name, kind)])
+            for worker in sorted(workers):
+                lines.append('{}_worker_{}{{worker="{}"}} {}'.format(self.prefix, name, worker.replace('"', "'"),
+                                                                    workers[worker][key]))
+        return '\n'.join(lines) + '\n'
+
+    def __call__(self, snapshot: dict):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as output:
+            output.write(self.render(snapshot))
+        os.replace(temporary, self.path)
+
+
+class ConsoleReporter:
+    """
+    Prints a one-line summary of every snapshot to stderr
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def __call__(self, snapshot: dict):
+        total = '?' if snapshot['total'] is None else snapshot['total']
+        eta = '' if snapshot['eta'] is None else ', {:.0f}s left'.format(snapshot['eta'])
+        best = '' if snapshot['best'] is None else ', best {:.2f}'.format(snapshot['best']['value'])
+        print('{}/{} {} in {:.0f}s, {:.1f} agents/s, {:.0f} turns/s{}{}'.format(
+            snapshot['done'], total, snapshot['unit'], snapshot['elapsed'], snapshot['agents_per_second'],
+            snapshot['turns_per_second'], best, eta), file=self.stream or sys.stderr)
@@ -1,12 +1,14 @@
 from Land_Use.Developed.farm import *
 from Animal.Danaus.plexippus import *
+from Functions.Progress import turns_simulated
 import time
-import pandas as pd
 import copy
 
 
-def test_field(dictionary, number):
+def test_field(dictionary, number, profiler=None, progress=None):
     # This function takes care of some repetitive code I had written earlier. It's not perfect, but it works for now.
+    # Passing a PhaseProfiler in will profile every monarch and print the rolled up numbers at the end. Passing a
+    # Progress (see Functions.Progress) in reports every monarch to it as one unit of work.
     start_time = time.time()
     if number == 0:
         field_to_test = StandardTest(33)
@@ -23,23 +25,31 @@ def test_field(dictionary, number):
     results = []
     for j in range(10):
         monarch1 = Monarch(field_to_test)
+        if profiler is not None:
+            monarch1.enable_profiling(profiler)
         monarch1.move_one_day()
         while monarch1.status == "alive":
             monarch1.move_one_day()
         results.append(monarch1.status)
+        if progress is not None:
+            progress.update(agents=1, turns=turns_simulated(monarch1))
     dictionary["test_field_{}".format(number)] = [100 * results.count('dead') / len(results)]
     print("----Test Field {}-----".format(field_to_test))
     print("Dead percentage = {:.2f}%".format(100 * results.count('dead') / len(results)))
     print("Exit percentage = {:.2f}%".format(100 * results.count('exit') / len(results)))
     print("--- %s seconds ---" % (time.time() - start_time))
+    if profiler is not None:
+        print(profiler.report())
     return dictionary
 
 
-def basic_test(field: Area, iterations: int) -> None:
+def basic_test(field: Area, iterations: int, profiler=None) -> None:
     starttime = time.time()
     results = []
     for k in range(iterations):
         monarch = Monarch(field)
+        if profiler is not None:
+            monarch.enable_profiling(profiler)
         while monarch.status == 'alive':
             monarch.move_one_day()
         results.append([field, copy.deepcopy(monarch.status), copy.deepcopy(monarch.moves)])
@@ -57,6 +67,10 @@ def basic_test(field: Area, iterations: int) -> None:
     print("Exit percentage = {:.2f}%".format(100 * exit_count / len(results)))
     print("Alive percentage = {:.2f}%".format(100 * alive_count / len(results)))
     print("--- %s seconds ---" % (time.time() - starttime))
+    if profiler is not None:
+        print(profiler.report())
 
+    # pandas is slow to import, so only load it when a table is actually made
+    import pandas as pd
     results = pd.DataFrame(results)
     print(results[2][0])
\ No newline at end of file
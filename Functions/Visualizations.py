@@ -1,32 +1,32 @@
 from Land_Use.Developed.farm import *
 from Animal.Danaus.plexippus import *
-import matplotlib.pyplot as plt
 import numpy as np
 
 
-def graphic_display(field: Area = None, moves: np.array = None):
+def graphic_display(field: Area = None, occupancy: Occupancy = None, moves: list = None):
     """
-    This will take a field and an array defining the path the pollinator took and turn it into a heatmap
-    :param field: an area the pollinator lives on which it spent it's simulated time on
-    :param moves: a collection of moves made by the pollinator.
+    Turns where pollinators spent their time into a heatmap over the field, one pixel per cell. The counts come from an
+    Occupancy (see Area.track_occupancy), so any number of pollinators can be shown without keeping their paths. A
+    single recorded list of moves can still be passed in instead.
+    :param field: an area the pollinators lived on
+    :param occupancy: the counts to show, e.g., field.occupancy after a run
+    :param moves: a collection of moves made by one pollinator, used if there is no occupancy
     :return: No return, it simply displays a plot.
-    TODO: everything
     """
+    # matplotlib is slow to import, so it is only loaded when something is actually plotted
+    import matplotlib.pyplot as plt
     if field is None:
         field = StandardTest(1)
-    if moves is None:
+    if occupancy is None and moves is not None:
+        occupancy = Occupancy.from_moves(field.shape, moves)
+    elif occupancy is None:
+        occupancy = field.occupancy
+    if occupancy is None:
+        occupancy = field.track_occupancy()
         b1 = Monarch(field)
         b1.move_one_day()
-        moves = b1.moves
-    # counts = np.zeros((len(field.array), len(field.array[0])), dtype=int)
-    xmoves = []
-    ymoves = []
-    for move in moves:
-        xmoves.append(move[0])
-        ymoves.append(move[1])
-    heatmap, xedges, yedges = np.histogram2d(xmoves, ymoves, bins=50)
-    extent = [xedges[0], xedges[-1], yedges[0], yedges[-1]]
 
     plt.clf()
-    plt.imshow(heatmap.T, extent=extent, origin='lower')
+    plt.imshow(occupancy.raster, origin='upper', interpolation='nearest', aspect='auto')
+    plt.colorbar(label='moves into cell')
     plt.show()
@@ -2,12 +2,14 @@ from Functions.Tests import *
 from Functions.Visualizations import *
 
 
-def run_tests():
+def run_tests(profiler=None):
+    # pandas is slow to import, so only load it when a table is actually made
+    import pandas as pd
 
     # first analysis
     master_results = {}
     for i in range(0, 5):
-        test_field(master_results, i)
+        test_field(master_results, i, profiler)
     index = ['standard', 'food_heavy', 'middle_food', 'middle_shelter', 'shelter_heavy']
     master_results = pd.DataFrame(master_results).T
     # print(master_results)
@@ -16,13 +18,10 @@ def run_tests():
 
     # field stats
     field = MiddleShelterWindbreakTest(34)
-    food = np.count_nonzero(field.array == 2)
-    shelter = np.count_nonzero(field.array == 3)
-    crops = np.count_nonzero(field.array == 1)
-    total = food + shelter + crops
-    print('Percent food: {:.2f}%'.format(math.ceil(100 * food/total)))
-    print("Percent shelter: {:.2f}%".format(math.ceil(100 * shelter/total)))
-    print("Percent crops: {:.2f}%".format(math.floor(100 * crops/total)))
+    summary = field.summary
+    print('Percent food: {:.2f}%'.format(math.ceil(summary.percent_food)))
+    print("Percent shelter: {:.2f}%".format(math.ceil(summary.percent_shelter)))
+    print("Percent crops: {:.2f}%".format(math.floor(summary.percent_crops)))
 
     # Testing a higher crop percentage variant of the middle row_len
     start_time = time.time()
@@ -30,16 +29,18 @@ def run_tests():
     results = []
     for j in range(100):
         monarch1 = Monarch(field_test)
+        if profiler is not None:
+            monarch1.enable_profiling(profiler)
         monarch1.move_one_day()
         results.append(monarch1.status)
     print("Dead percentage = {:.2f}%".format(100 * results.count('dead') / len(results)))
     print("Exit percentage = {:.2f}%".format(100 * results.count('exit') / len(results)))
     print("--- %s seconds ---" % (time.time() - start_time))
+    if profiler is not None:
+        print(profiler.report())
 
-    food = np.count_nonzero(field_test.array == 2)
-    shelter = np.count_nonzero(field_test.array == 3)
-    crops = np.count_nonzero(field_test.array == 1)
-    total = food + shelter + crops
-    print('Percent food: {:.2f}%'.format(math.ceil(100 * food/total)))
-    print("Percent shelter: {:.2f}%".format(math.ceil(100 * shelter/total)))
-    print("Percent crops: {:.2f}%".format(math.floor(100 * crops/total)))
\ No newline at end of file
+    summary = field_test.summary
+    print('Percent food: {:.2f}%'.format(math.ceil(summary.percent_food)))
+    print("Percent shelter: {:.2f}%".format(math.ceil(summary.percent_shelter)))
+    print("Percent crops: {:.2f}%".format(math.floor(summary.percent_crops)))
+    print("Longest north-south gap without food or shelter: {} cells".format(summary.largest_gap))
\ No newline at end of file
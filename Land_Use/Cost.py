@@ -0,0 +1,118 @@
+import numpy as np
+
+
+# What it costs a pollinator to fly into a cell of each land class, in turns' worth of food. Habitat (food, shelter
+# and mixed cells) costs what any move always has. Open crop costs more: there is nothing to feed on or hide in along
+# the way, and wind and spray make the crossing harder.
+land_class_costs = {1: 2.0, 2: 1.0, 3: 1.0, 4: 1.0}
+
+
+def cost_raster(area, costs: dict = None) -> np.ndarray:
+    """
+    The cost of moving into each cell of an area
+    :param area: Area, CropField or SparseArea
+    :param costs: {land class: cost}. Classes left out cost what they do in land_class_costs. Every cost must be
+    positive.
+    :return: float array with the shape of the area
+    >>> from Land_Use.Land import Area
+    >>> cost_raster(Area([[1, 2], [3, 4]])).tolist()
+    [[2.0, 1.0], [1.0, 1.0]]
+    >>> cost_raster(Area([[1, 2], [3, 4]]), {1: 5.0}).tolist()
+    [[5.0, 1.0], [1.0, 1.0]]
+    """
+    merged = dict(land_class_costs)
+    if costs is not None:
+        merged.update(costs)
+    if min(merged.values()) <= 0:
+        raise ValueError("Travel costs must be positive")
+    array = np.asarray(area.array)
+    table = np.full(max(max(merged), int(array.max())) + 1, np.nan)
+    for land_class, cost in merged.items():
+        table[land_class] = cost
+    raster = table[array]
+    if np.isnan(raster).any():
+        raise ValueError("No travel cost for land class {}".format(
+            sorted(set(array[np.isnan(raster)].tolist()))))
+    return raster
+
+
+class CostField:
+    """
+    The cheapest way from every cell of an area to the nearest cell holding a resource, when each move is charged the
+    cost of the cell it moves into (see cost_raster). It is worked out once for the whole area with a single
+    multi-source Dijkstra: the grid is made into a graph with an edge from every cell to each of its four neighbours,
+    the graph is transposed so edges point away from the resource, and all the resource cells are used as sources at
+    once. That gives the cost from every cell, and the next cell on its cheapest path. Afterwards a pollinator just
+    follows next cells downhill, so a query takes as long as its path is.
+    >>> from Land_Use.Land import Area
+    >>> field = CostField(Area([[2, 1, 1, 1], [3, 3, 3, 1], [1, 1, 1, 1]]), 'food')
+    >>> float(field.cost[2, 3]), float(field.cost[0, 3])
+    (6.0, 5.0)
+    >>> field.path(2, 1)
+    [(1, 1), (1, 0), (0, 0)]
+    >>> field.nearest(1, 0), field.path(0, 0)
+    ((0, 0), [])
+    """
+
+    def __init__(self, area, resource: str, costs: dict = None):
+        """
+        :param area: the area to work on. The land classes are read once, so packed and sparse areas are unpacked.
+        :param resource: 'food' or 'shelter'
+        :param costs: {land class: cost}, see cost_raster
+        """
+        from scipy import sparse
+        from scipy.sparse import csgraph
+        self.resource = resource
+        self.shape = area.shape
+        length, width = self.shape
+        sources = np.ravel_multi_index(area.resource_coords(resource).T, self.shape) if area.has_resource(resource) \
+            else np.empty(0, dtype=np.int64)
+        if len(sources) == 0:
+            self.cost = np.full(self.shape, np.inf)
+            self.next_cell = np.full(length * width, -9999, dtype=np.int32)
+            return
+        entry = cost_raster(area, costs).ravel()
+        cells = np.arange(length * width).reshape(self.shape)
+        # Each pair of neighbours, both ways round
+        first = np.concatenate((cells[:, :-1].ravel(), cells[:-1, :].ravel()))
+        second = np.concatenate((cells[:, 1:].ravel(), cells[1:, :].ravel()))
+        tails = np.concatenate((first, second))
+        heads = np.concatenate((second, first))
+        # Moving tail -> head costs entry[head]. Transposed, the edge goes head -> tail, still weighted entry[head].
+        graph = sparse.csr_matrix((entry[heads], (heads, tails)), shape=(length * width, length * width))
+        cost, predecessors = csgraph.dijkstra(graph, directed=True, indices=sources, min_only=True,
+                                              return_predecessors=True)[:2]
+        self.cost = cost.reshape(self.shape)
+        # In the transposed graph the predecessor of a cell is the next cell on its way to the resource
+        self.next_cell = predecessors.astype(np.int32)
+
+    @property
+    def nbytes(self) -> int:
+        return self.cost.nbytes + self.next_cell.nbytes
+
+    def reachable(self, x: int, y: int) -> bool:
+        return bool(np.isfinite(self.cost[x, y]))
+
+    def path(self, x: int, y: int) -> list:
+        """
+        The cells to move into, in order, to reach the resource as cheaply as possible from (x, y)
+        :return: list of (row, column), empty if (x, y) holds the resource or none can be reached
+        """
+        width = self.shape[1]
+        cell = x * width + y
+        path = []
+        cell = self.next_cell[cell]
+        while cell >= 0:
+            path.append((int(cell // width), int(cell % width)))
+            cell = self.next_cell[cell]
+        return path
+
+    def nearest(self, x: int, y: int) -> tuple:
+        """
+        The resource cell that is cheapest to reach from (x, y)
+        :return: (row, column), or None if none can be reached
+        """
+        if not self.reachable(x, y):
+            return None
+        path = self.path(x, y)
+        return path[-1] if path else (int(x), int(y))
@@ -1,8 +1,122 @@
 from Land_Use.Land import *
+from Land_Use.Developed.hazard import Hazard
+from Functions.Operations import clock
 import math
-import matplotlib.pyplot as plt
-from scipy.stats import kde
-import pandas as pd
+
+
+# Lookup tables indexed by land class (0 is unused) for drawing fields. Characters are stored as bytes so a whole
+# field can be converted at once.
+field_characters = np.frombuffer(b' =o*@', dtype=np.uint8)
+field_digits = np.frombuffer(b'01234', dtype=np.uint8)
+field_palette = np.array([[0, 0, 0],         # unused
+                          [222, 196, 92],    # crop
+                          [176, 74, 164],    # food (milkweed and flowers)
+                          [34, 102, 46],     # shelter (trees)
+                          [112, 148, 70]],   # mixed food and shelter
+                         dtype=np.uint8)
+
+
+def block_majority(array: np.ndarray, block: int) -> np.ndarray:
+    """
+    Downsamples a field by replacing each block x block square of cells with the most common land class in it. Ties go
+    to the lower class. Blocks along the south and east edges may be partial.
+    :param array: 2D array of land classes 1-4
+    :param block: side of the square, in cells
+    :return: the downsampled array
+    >>> block_majority(np.array([[1, 2, 2, 3], [2, 2, 3, 3], [4, 4, 1, 1]]), 2)
+    array([[2, 3],
+           [4, 1]], dtype=uint8)
+    """
+    array = np.asarray(array)
+    if block <= 1:
+        return array
+    rows = -(-array.shape[0] // block)
+    columns = -(-array.shape[1] // block)
+    padded = np.zeros((rows * block, columns * block), dtype=np.uint8)
+    padded[:array.shape[0], :array.shape[1]] = array
+    blocks = padded.reshape(rows, block, columns, block)
+    counts = np.stack([(blocks == value).sum(axis=(1, 3)) for value in (1, 2, 3, 4)])
+    return (counts.argmax(axis=0) + 1).astype(np.uint8)
+
+
+def _render(array: np.ndarray, table: np.ndarray) -> str:
+    # Look every cell up at once and end each row with a newline
+    array = np.asarray(array)
+    text = np.empty((array.shape[0], array.shape[1] + 1), dtype=np.uint8)
+    text[:, :-1] = table[array]
+    text[:, -1] = ord('\n')
+    return text.tobytes().decode('ascii')
+
+
+class FieldSummary:
+    """
+    Facts about a field worked out once: how many cells of each land class there are, how the food and shelter cells
+    clump into patches, how far cells are from food, and the longest stretch a pollinator flying north or south would
+    have to cross with no food or shelter at all. CropField.summary makes one the first time it is asked for and keeps
+    it.
+    >>> s = FieldSummary(np.array([[2, 1, 1], [1, 1, 1], [1, 1, 1], [1, 1, 3]]))
+    >>> [int(n) for n in s.counts], s.food_patches, s.largest_gap
+    ([0, 10, 1, 1, 0], 1, 4)
+
+    A windbreak down one side puts shelter in every row, but the other columns are still bare from end to end
+    >>> FieldSummary(np.array([[3, 1, 1]] * 5)).largest_gap
+    5
+    >>> [int(n) for n in s.food_distance_histogram]
+    [1, 2, 3, 3, 2, 1]
+    """
+
+    def __init__(self, array: np.ndarray):
+        # scipy is slow to import, so it is only loaded when a summary is actually made
+        from scipy import ndimage
+        array = np.asarray(array)
+        self.shape = array.shape
+        self.total = array.size
+        # cells of each land class, indexed by class (index 0 is unused)
+        self.counts = np.bincount(array.ravel(), minlength=5)[:5]
+        food = (array == 2) | (array == 4)
+        shelter = (array == 3) | (array == 4)
+        # patches are groups of cells touching north, south, east or west
+        food_labels, self.food_patches = ndimage.label(food)
+        shelter_labels, self.shelter_patches = ndimage.label(shelter)
+        self.food_patch_sizes = np.bincount(food_labels.ravel())[1:]
+        self.shelter_patch_sizes = np.bincount(shelter_labels.ravel())[1:]
+        # number of cells at each Manhattan distance from the nearest food, empty if there is no food
+        if food.any():
+            distance = ndimage.distance_transform_cdt(~food, metric='taxicab')
+            self.food_distance_histogram = np.bincount(distance.ravel())
+        else:
+            self.food_distance_histogram = np.zeros(0, dtype=int)
+        # longest run of cells without food or shelter down any one column. Each column is padded with a cell of
+        # habitat at both ends, so the runs start and end in the same column and pair up in order.
+        bare = np.pad(~(food | shelter).T, ((0, 0), (1, 1))).astype(np.int8)
+        edges = np.diff(bare, axis=1)
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        self.largest_gap = int((ends - starts).max()) if len(starts) else 0
+
+    def percent(self, value: int) -> float:
+        """
+        Percent of the field that is the given land class
+        """
+        return 100 * self.counts[value] / self.total
+
+    @property
+    def percent_crops(self) -> float:
+        return self.percent(1)
+
+    @property
+    def percent_food(self) -> float:
+        return self.percent(2)
+
+    @property
+    def percent_shelter(self) -> float:
+        return self.percent(3)
+
+    def __str__(self) -> str:
+        return ('Percent crops: {:.2f}%, food: {:.2f}%, shelter: {:.2f}%, mixed: {:.2f}%\n'
+                '{} food patches, {} shelter patches, longest gap without food or shelter: {} cells').format(
+            self.percent(1), self.percent(2), self.percent(3), self.percent(4), self.food_patches,
+            self.shelter_patches, self.largest_gap)
 
 
 class CropField(Area):
@@ -13,44 +127,43 @@ class CropField(Area):
     TODO: Create a better graphical representation
     """
 
-    def __init__(self, array):
+    def __init__(self, array, dtype=np.uint8, packed: bool = False, copy: bool = True):
         # Initializes the object as an Area class to check that it is truly 2D
-        Area.__init__(self, array)
+        Area.__init__(self, array, dtype, packed, copy)
         values = [1, 2, 3, 4]
         if False in np.isin(self.array, values):
             raise ValueError(
                 "Values of CropField must be either 1 (crop), 2 (food), 3 (shelter), or 4 (mixed food and shelter)")
-        ix_food = np.isin(self.array, [2, 4])
-        self.food_indices = []
-        if True in ix_food:
-            self.food_indices = list(zip(np.where(ix_food)[0], np.where(ix_food)[1]))
-        ix_shelter = np.isin(self.array, [3, 4])
-        self.shelter_indices = []
-        if True in ix_shelter:
-            self.shelter_indices = list(zip(np.where(ix_shelter)[0], np.where(ix_shelter)[1]))
+        self._summary = None
 
-    def __to_string(self):
+    @property
+    def summary(self) -> FieldSummary:
+        """
+        The FieldSummary of this field, made the first time it is asked for. If the array is changed in place after
+        that, call refresh_summary().
         """
-        A simple text representation of the crop field
-        :return: string version of the field, binned to 10
+        if self._summary is None:
+            self._summary = FieldSummary(self.array)
+        return self._summary
+
+    def refresh_summary(self) -> FieldSummary:
+        self._summary = None
+        return self.summary
+
+    def to_string(self, block: int = 1) -> str:
+        """
+        A simple text representation of the crop field, with '=' for crop, 'o' for food, '*' for shelter and '@' for
+        mixed food and shelter
+        :param block: if more than 1, each block x block square is drawn as its most common land class
+        :return: string version of the field, one line per row
+        >>> print(CropField([[1, 2, 3], [4, 1, 1]]).to_string(), end='')
+        =o*
+        @==
         """
-        string_version = ''
-        for row in range(self.row_len):
-            for column in range(self.col_len):
-                if self.array[row][column] == 1:
-                    string_version += '='
-                elif self.array[row][column] == 2:
-                    string_version += 'o'
-                elif self.array[row][column] == 3:
-                    string_version += '*'
-                elif self.array[row][column] == 4:
-                    string_version += '@'
-                else:
-                    print("values must be either 1 (crop), 2 (food), 3 (shelter), or 4 (mixed food/shelter)")
-            if row != self.row_len:
-                string_version += '\n'
-
-        return string_version
+        return _render(block_majority(self.array, block), field_characters)
+
+    def __to_string(self):
+        return self.to_string()
 
     def __str__(self) -> str:
         return '{} m x {} m'.format(self.row_len * 15, self.col_len * 15)
@@ -91,40 +204,96 @@ class CropField(Area):
     #     axes[5].contour(xi, yi, zi.reshape(xi.shape))
 
     def get_crop_amt(self):
-        return (self.array == 1).sum()
+        return self.summary.counts[1]
 
     def get_food_amt(self):
-        return (self.array == 2).sum()
+        return self.summary.counts[2]
 
     def get_shelter_amt(self):
-        return (self.array == 3).sum()
-
-    def raw(self):
-        string_version = ''
-        for row in range(self.row_len):
-            for column in range(self.col_len):
-                string_version += str(self.array[row][column])
-                # if column != self.col_len - 1:
-                #     string_version += " "
-            if row != self.row_len:
-                string_version += '\n'
-        print(string_version)
+        return self.summary.counts[3]
+
+    def raw(self, block: int = 1):
+        """
+        Prints the land class numbers of the field, one line per row
+        :param block: if more than 1, each block x block square is printed as its most common land class
+        """
+        print(_render(block_majority(self.array, block), field_digits))
+
+    def to_rgb(self, block: int = 1) -> np.ndarray:
+        """
+        A color image of the field, one pixel per cell (or per block), using field_palette
+        :param block: if more than 1, each block x block square is one pixel of its most common land class
+        :return: uint8 array of shape (rows, columns, 3)
+        """
+        return field_palette[np.asarray(block_majority(self.array, block))]
+
+    def save_png(self, path: str, block: int = 1):
+        """
+        Writes the color image of the field to a PNG file
+        :param path: file to write
+        :param block: if more than 1, each block x block square is one pixel of its most common land class
+        """
+        # matplotlib is slow to import, so it is only loaded when an image is actually written
+        from matplotlib import image
+        image.imsave(path, self.to_rgb(block))
+
+    def schedule_spray(self, day: int, hour: int, duration: float = 2, rate: float = 0.05, cells=None) -> Hazard:
+        """
+        Sprays pesticide for a while, by default on the crops. Pollinators on or flying over the sprayed cells in that
+        time may be killed, see Hazard.
+        :param day: day of the spraying
+        :param hour: hour it starts
+        :param duration: hours it lasts
+        :param rate: hazard per turn spent in a sprayed cell
+        :param cells: boolean mask of the sprayed cells, all the crop cells if not given
+        :return: the field's Hazard
+        >>> f = CropField([[1, 2], [1, 3]])
+        >>> h = f.schedule_spray(0, 6)
+        >>> h.leg_exposure([0, 0, 1], [0, 1, 0], clock(0, 7))
+        0.10000000149011612
+        """
+        if self.hazard is None:
+            self.hazard = Hazard(self.shape)
+        if cells is None:
+            cells = np.asarray(self.array) == 1
+        start = clock(day, hour)
+        self.hazard.add_event(start, start + int(duration * 3600), cells, rate)
+        return self.hazard
+
+    def concatenate(self, area2, direction: str = 'north-south') -> 'CropField':
+        """
+        Joins another field onto the south, or the east, of this one
+        """
+        return assemble_areas([self, area2], direction, CropField)
 
     @classmethod
-    def random_field(cls, length: int, width: int, percent_crops: int=100, percent_food: int=0, percent_shelter: int=0):
+    def assemble(cls, fields: list, direction: str = 'north-south') -> 'CropField':
+        """
+        Builds one field out of an arrangement of fields, see assemble_areas
+        >>> CropField.assemble([StandardTest(0), HeavyFoodTest(1)]).shape
+        (300, 100)
+        >>> a, b = CropField([[1, 2]]), CropField([[3, 4]])
+        >>> CropField.assemble([[a, b], [a, a]]).array.tolist()
+        [[1, 2, 3, 4], [1, 2, 1, 2]]
+        >>> CropField.assemble([[a, b], [a, a]], 'east-west').array.tolist()
+        [[1, 2, 1, 2], [3, 4, 1, 2]]
         """
-        Creates a random field given the dimensions. Picks placement of food and shelter randomly
+        return assemble_areas(fields, direction, cls)
 
-        :param length: Total number of rows in the field
-        :param width: Total number of columns in the field
+    @staticmethod
+    def cell_counts(area: int, percent_crops: int = 100, percent_food: int = 0, percent_shelter: int = 0) -> tuple:
+        """
+        Works out exactly how many cells of each type a field of the given size gets for the given percentages
+        :param area: total number of cells
         :param percent_crops: Whole number percent of crops in the field
         :param percent_food: Whole number percent of Pollinator food in the field
         :param percent_shelter: Whole number percent of trees in the field
-        :return: CropField | None
+        :return: (crop cells, food cells, shelter cells), adding up to area
+        >>> CropField.cell_counts(10, 85, 10, 5)
+        (9, 1, 0)
         """
         if percent_crops + percent_food + percent_shelter != 100:
             raise ValueError("The percentages do not add up to 100")
-        area = length * width
         # find the number of squares for each type of cell
         number_crop_cells = math.ceil(percent_crops / 100 * area)
         number_food_cells = math.ceil(percent_food / 100 * area)
@@ -148,26 +317,72 @@ class CropField(Area):
             else:
                 number_shelter_cells -= 1
             distro = area - (number_crop_cells + number_food_cells + number_shelter_cells)
-        try:
-            distro == 0
-        except ValueError:
-            print('something went wrong in the cell calculations')
-            sys.exit(1)
-        random_f = np.full((length, width), 1, dtype=int).tolist()
-        while number_shelter_cells + number_food_cells > 0:
-            if number_shelter_cells > 0:
-                temp_length = np.random.randint(0, length - 1)
-                temp_width = np.random.randint(0, width - 1)
-                if random_f[temp_length][temp_width] == 1:
-                    random_f[temp_length][temp_width] = 3
-                    number_shelter_cells -= 1
-            if number_food_cells > 0:
-                temp_length = np.random.randint(0, length - 1)
-                temp_width = np.random.randint(0, width - 1)
-                if random_f[temp_length][temp_width] == 1:
-                    random_f[temp_length][temp_width] = 2
-                    number_food_cells -= 1
-        return cls(random_f)
+        return number_crop_cells, number_food_cells, number_shelter_cells
+
+    @classmethod
+    def random_field(cls, length: int, width: int, percent_crops: int=100, percent_food: int=0, percent_shelter: int=0,
+                     rng=None):
+        """
+        Creates a random field given the dimensions. Picks placement of food and shelter randomly. A single random
+        permutation of the cells decides which ones become shelter and food, so the counts are exact and every cell
+        (including the last row and column) is equally likely to be picked.
+
+        :param length: Total number of rows in the field
+        :param width: Total number of columns in the field
+        :param percent_crops: Whole number percent of crops in the field
+        :param percent_food: Whole number percent of Pollinator food in the field
+        :param percent_shelter: Whole number percent of trees in the field
+        :param rng: source of random numbers, np.random (the default) or a np.random.RandomState
+        :return: CropField | None
+        >>> f = CropField.random_field(10, 10, 80, 15, 5)
+        >>> int(f.get_crop_amt()), int(f.get_food_amt()), int(f.get_shelter_amt())
+        (80, 15, 5)
+        """
+        rng = np.random if rng is None else rng
+        crops, food, shelter = cls.cell_counts(length * width, percent_crops, percent_food, percent_shelter)
+        random_f = np.ones(length * width, dtype=np.uint8)
+        order = rng.permutation(length * width)
+        random_f[order[:shelter]] = 3
+        random_f[order[shelter:shelter + food]] = 2
+        return cls(random_f.reshape(length, width))
+
+    @classmethod
+    def random_field_array(cls, count: int, length: int, width: int, percent_crops: int = 100, percent_food: int = 0,
+                           percent_shelter: int = 0, rng=None) -> np.ndarray:
+        """
+        The batch version of random_field. Makes count random layouts at once, as a stack of arrays rather than
+        CropFields, so an optimizer can screen thousands of candidates before building fields from the good ones.
+        :param count: number of layouts
+        :param length: Total number of rows in each field
+        :param width: Total number of columns in each field
+        :param percent_crops: Whole number percent of crops in the field
+        :param percent_food: Whole number percent of Pollinator food in the field
+        :param percent_shelter: Whole number percent of trees in the field
+        :param rng: source of random numbers, np.random (the default) or a np.random.RandomState
+        :return: uint8 array of shape (count, length, width)
+        >>> stack = CropField.random_field_array(3, 4, 5, 50, 25, 25)
+        >>> stack.shape, [int((f == 2).sum()) for f in stack]
+        ((3, 4, 5), [5, 5, 5])
+        """
+        rng = np.random if rng is None else rng
+        crops, food, shelter = cls.cell_counts(length * width, percent_crops, percent_food, percent_shelter)
+        # Sorting a row of random keys gives an independent random permutation for every layout at once
+        order = rng.random_sample((count, length * width)).argsort(axis=1)
+        layouts = np.ones((count, length * width), dtype=np.uint8)
+        rows = np.arange(count)[:, None]
+        layouts[rows, order[:, :shelter]] = 3
+        layouts[rows, order[:, shelter:shelter + food]] = 2
+        return layouts.reshape(count, length, width)
+
+    @classmethod
+    def random_fields(cls, count: int, length: int, width: int, percent_crops: int = 100, percent_food: int = 0,
+                      percent_shelter: int = 0, rng=None) -> list:
+        """
+        Like random_field, but makes count fields at once. See random_field_array.
+        :return: list of CropFields
+        """
+        return [cls(layout) for layout in cls.random_field_array(count, length, width, percent_crops, percent_food,
+                                                                 percent_shelter, rng)]
 
 # The following are a collection of pre-defined fields that made sense to test. More can be added by constructing the
 # field in a similar manner. One could also think of 'crop' land as generic "developed area' and use the same basic
@@ -404,3 +619,31 @@ class MiddleShelterWindbreakTest2(CropField):
         return 'Shelter heavy windbreak middle 2'
 
 
+
+
+# Names used to pick the pre-defined fields from the command line and the optimizer
+field_types = {
+    'standard': StandardTest,
+    'food heavy': HeavyFoodTest,
+    'shelter heavy': ShelterHeavyTest,
+    'middle food windbreak': MiddleFoodWindbreakTest,
+    'middle shelter windbreak': MiddleShelterWindbreakTest,
+    'middle shelter windbreak 2': MiddleShelterWindbreakTest2,
+    'fallow': FallowTest,
+}
+
+
+def make_field(name: str, iterations: int) -> CropField:
+    """
+    Builds one of the pre-defined fields by name. Underscores and dashes are accepted in place of spaces so the names
+    can be typed on a command line.
+    :param name: a key of field_types, e.g., 'middle shelter windbreak'
+    :param iterations: number of extra acre blocks to stack north-south
+    :return: CropField
+    >>> make_field('middle_food-windbreak', 1)
+    Food Heavy Middle Windbreak
+    """
+    key = name.lower().replace('_', ' ').replace('-', ' ')
+    if key not in field_types:
+        raise ValueError("Unknown field '{}'. Choose from: {}".format(name, ', '.join(sorted(field_types))))
+    return field_types[key](iterations)
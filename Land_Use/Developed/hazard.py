@@ -0,0 +1,80 @@
+from Functions.Operations import clock
+import numpy as np
+
+
+class Hazard:
+    """
+    Dangers on a field that kill pollinators outright, e.g., pesticide spray or mowing. Each cell has a hazard rate
+    per turn a pollinator spends in it: a base raster that is always there plus events that only apply to some cells
+    for a window of time. The rates a pollinator picks up along its way are added to its exposure, and the next
+    check_for_death kills it with probability 1 - exp(-exposure).
+
+    Attach one to a field with field.hazard = Hazard(field.shape), or use CropField.schedule_spray. Fields have no
+    hazard by default, and then check_for_death is unchanged.
+    >>> h = Hazard((3, 4))
+    >>> h.add_event(clock(0, 6), clock(0, 8), np.array([[True] * 4, [False] * 4, [False] * 4]), 0.5)
+    >>> h.leg_exposure([0, 0, 1], [1, 2, 2], clock(0, 7)), h.leg_exposure([0, 0, 1], [1, 2, 2], clock(0, 9))
+    (1.0, 0.0)
+    """
+
+    def __init__(self, shape: tuple, base=None):
+        """
+        :param shape: (rows, columns) of the field
+        :param base: hazard rate of each cell at all times, zero if not given
+        """
+        self.shape = tuple(shape)
+        self.base = np.zeros(self.shape, dtype=np.float32) if base is None else np.asarray(base, dtype=np.float32)
+        # (start, end, mask, rate) in seconds, see clock()
+        self.events = []
+        self._active = None
+        self._raster = self.base
+        self._zero = not self.base.any()
+
+    def add_event(self, start: int, end: int, cells, rate: float):
+        """
+        Adds a hazard to some cells for a window of time
+        :param start: when it starts, in seconds (see clock)
+        :param end: when it stops
+        :param cells: boolean mask of the cells it covers
+        :param rate: hazard per turn spent in one of those cells
+        """
+        cells = np.asarray(cells, dtype=bool)
+        if cells.shape != self.shape:
+            raise ValueError("Hazard cells must be the same shape as the field")
+        self.events.append((start, end, cells, rate))
+        self._active = None
+
+    def at(self, time: int) -> np.ndarray:
+        """
+        The hazard raster at the given time. It is only rebuilt when the set of events in effect changes.
+        """
+        active = tuple(i for i, (start, end, cells, rate) in enumerate(self.events) if start <= time < end)
+        if active != self._active:
+            raster = self.base.copy()
+            for i in active:
+                raster[self.events[i][2]] += self.events[i][3]
+            self._active = active
+            self._raster = raster
+            self._zero = not raster.any()
+        return self._raster
+
+    def leg_exposure(self, xs, ys, time: int) -> float:
+        """
+        The hazard picked up crossing the cells of a leg, summed in one go. Cells off the field don't count.
+        :param xs: rows of the cells along the leg
+        :param ys: columns of the cells along the leg
+        :param time: when the leg is flown
+        """
+        raster = self.at(time)
+        if self._zero:
+            return 0.0
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        inside = (xs >= 0) & (xs < self.shape[0]) & (ys >= 0) & (ys < self.shape[1])
+        return float(raster[xs[inside], ys[inside]].sum())
+
+    def cell_exposure(self, x: int, y: int, time: int) -> float:
+        raster = self.at(time)
+        if self._zero or not (0 <= x < self.shape[0] and 0 <= y < self.shape[1]):
+            return 0.0
+        return float(raster[x, y])
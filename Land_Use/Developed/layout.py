@@ -0,0 +1,168 @@
+from Land_Use.Developed.farm import CropField
+import numpy as np
+
+
+# Where the shelter (trees) goes within each acre
+WINDBREAK_SOUTH = 0
+WINDBREAK_NORTH = 1
+WINDBREAK_MIDDLE = 2
+HEDGEROW = 3
+windbreak_rules = {'south': WINDBREAK_SOUTH, 'north': WINDBREAK_NORTH, 'middle': WINDBREAK_MIDDLE,
+                   'hedgerow': HEDGEROW}
+
+# Where the food (milkweed and flowers) goes
+FOOD_BORDERS = 0
+FOOD_STRIPS = 1
+FOOD_BLOCKS = 2
+food_rules = {'borders': FOOD_BORDERS, 'strips': FOOD_STRIPS, 'blocks': FOOD_BLOCKS}
+
+
+class LayoutGenerator:
+    """
+    Makes farmable field layouts with exact crop, food and shelter ratios, as an alternative to random_field (which
+    scatters trees and weeds all over) and to writing a class for every arrangement by hand.
+
+    The field is divided into square acres. Each layout picks a windbreak rule for the trees (a row along the south,
+    north or middle of every acre, or a north-south hedgerow) and a rule for the food (buffers around the border of
+    every acre, east-west strips, or whole acres left fallow). Every cell gets a priority from its distance to those
+    features, and the shelter and then the food cells are simply the required number of highest-priority cells. So the
+    ratios are always met exactly, and habitat grows outward from the features in bands of buffer_width cells, each
+    band laid down along its whole length before the next one starts. A band that is only partly needed is laid down the
+    same way in every acre.
+
+    Everything is done on stacks of layouts at once, so an optimizer can sample and mutate thousands of candidates.
+    >>> g = LayoutGenerator(200, 100, 90, 6, 4, rng=np.random.RandomState(0))
+    >>> layouts, params = g.sample(3)
+    >>> layouts.shape, [int((layout == 3).sum()) for layout in layouts], [int((layout == 2).sum()) for layout in layouts]
+    ((3, 200, 100), [800, 800, 800], [1200, 1200, 1200])
+    >>> g.build(g.mutate(params)).shape
+    (3, 200, 100)
+    """
+
+    def __init__(self, length: int, width: int, percent_crops: int = 100, percent_food: int = 0,
+                 percent_shelter: int = 0, acre: int = 100, buffer_width: int = 1,
+                 windbreaks: tuple = tuple(windbreak_rules), food: tuple = tuple(food_rules), rng=None):
+        """
+        :param length: Total number of rows in the field
+        :param width: Total number of columns in the field
+        :param percent_crops: Whole number percent of crops in the field
+        :param percent_food: Whole number percent of Pollinator food in the field
+        :param percent_shelter: Whole number percent of trees in the field
+        :param acre: side of an acre in cells, 100 like the pre-defined fields
+        :param buffer_width: thickness in cells of each band of food or trees
+        :param windbreaks: windbreak rules layouts may use, see windbreak_rules
+        :param food: food rules layouts may use, see food_rules
+        :param rng: source of random numbers, np.random (the default) or a np.random.RandomState
+        """
+        self.length = length
+        self.width = width
+        self.acre = acre
+        self.buffer_width = max(1, buffer_width)
+        self.rng = np.random if rng is None else rng
+        self.windbreaks = np.array([windbreak_rules[rule] for rule in windbreaks])
+        self.food = np.array([food_rules[rule] for rule in food])
+        self.crop_cells, self.food_cells, self.shelter_cells = CropField.cell_counts(
+            length * width, percent_crops, percent_food, percent_shelter)
+        # Position of every cell within its acre, and which acre it is in
+        rows = np.arange(length)[:, None]
+        columns = np.arange(width)[None, :]
+        self._row = rows % acre
+        self._column = columns % acre
+        self._acres_east_west = -(-width // acre)
+        self.acres = -(-length // acre) * self._acres_east_west
+        self._acre_id = (rows // acre) * self._acres_east_west + columns // acre
+        # Ties are broken by reading order within the acre, taking the same cell of every acre in turn, so a partly
+        # filled band is contiguous and looks the same in every acre
+        self._order = (self._row * acre + self._column).astype(np.int64) * self.acres + self._acre_id
+        self._span = acre * acre * self.acres
+
+    def sample_params(self, count: int) -> dict:
+        """
+        Draws the rules and their settings for count layouts
+        :param count: number of layouts
+        :return: dict of arrays, one entry per layout
+        """
+        rng = self.rng
+        return {'windbreak': rng.choice(self.windbreaks, count),
+                'hedgerow_column': rng.randint(0, min(self.acre, self.width), count),
+                'food': rng.choice(self.food, count),
+                'strip_spacing': rng.randint(10, max(11, self.acre // 2 + 1), count),
+                'acre_rank': rng.random_sample((count, self.acres)).argsort(axis=1)}
+
+    def mutate(self, params: dict, rate: float = 0.2) -> dict:
+        """
+        Makes a variation on each layout: each setting is redrawn with probability rate, and a pair of acres may swap
+        places in the fallow order
+        :param params: layouts as returned by sample_params
+        :param rate: chance of changing each setting
+        :return: new dict of params, the input is left alone
+        """
+        count = len(params['windbreak'])
+        fresh = self.sample_params(count)
+        mutated = {}
+        for key in ('windbreak', 'hedgerow_column', 'food', 'strip_spacing'):
+            mutated[key] = np.where(self.rng.random_sample(count) < rate, fresh[key], params[key])
+        acre_rank = params['acre_rank'].copy()
+        swap = np.flatnonzero(self.rng.random_sample(count) < rate)
+        first = self.rng.randint(0, self.acres, len(swap))
+        second = self.rng.randint(0, self.acres, len(swap))
+        acre_rank[swap, first], acre_rank[swap, second] = acre_rank[swap, second], acre_rank[swap, first]
+        mutated['acre_rank'] = acre_rank
+        return mutated
+
+    def _shelter_distance(self, params: dict) -> np.ndarray:
+        rule = params['windbreak'][:, None, None]
+        hedgerow = np.abs(self._column - params['hedgerow_column'][:, None, None])
+        return np.where(rule == WINDBREAK_SOUTH, self.acre - 1 - self._row,
+                        np.where(rule == WINDBREAK_NORTH, self._row,
+                                 np.where(rule == WINDBREAK_MIDDLE, np.abs(self._row - self.acre // 2), hedgerow)))
+
+    def _food_distance(self, params: dict) -> np.ndarray:
+        rule = params['food'][:, None, None]
+        border = np.minimum(np.minimum(self._row, self.acre - 1 - self._row),
+                            np.minimum(self._column, self.acre - 1 - self._column))
+        spacing = params['strip_spacing'][:, None, None]
+        strip = self._row % spacing
+        strip = np.minimum(strip, spacing - strip)
+        # Whole acres are filled one after another, so the 'distance' is the acre's place in line
+        block = np.take_along_axis(params['acre_rank'], self._acre_id.ravel()[None, :], axis=1)
+        block = block.reshape(-1, self.length, self.width) * self.acre * self.buffer_width
+        return np.where(rule == FOOD_BORDERS, border, np.where(rule == FOOD_STRIPS, strip, block))
+
+    def _top_cells(self, distance: np.ndarray, number: int) -> np.ndarray:
+        # Closest bands first, ties in reading order. Returns flat indices of the chosen cells for each layout.
+        key = (distance // self.buffer_width).astype(np.int64) * self._span + self._order
+        key = key.reshape(len(key), -1)
+        if number == 0:
+            return np.empty((len(key), 0), dtype=np.int64)
+        return np.argpartition(key, number - 1, axis=1)[:, :number]
+
+    def build(self, params: dict) -> np.ndarray:
+        """
+        Turns the rules into layouts
+        :param params: as returned by sample_params or mutate
+        :return: uint8 array of shape (count, length, width)
+        """
+        count = len(params['windbreak'])
+        layouts = np.ones((count, self.length * self.width), dtype=np.uint8)
+        rows = np.arange(count)[:, None]
+        layouts[rows, self._top_cells(self._shelter_distance(params), self.shelter_cells)] = 3
+        food_distance = self._food_distance(params).reshape(count, -1)
+        # Cells already taken by trees go to the back of the line for food
+        food_distance[layouts == 3] = np.iinfo(np.int64).max // (2 * self._span)
+        layouts[rows, self._top_cells(food_distance.reshape(count, self.length, self.width), self.food_cells)] = 2
+        return layouts.reshape(count, self.length, self.width)
+
+    def sample(self, count: int) -> tuple:
+        """
+        Draws count new layouts
+        :return: (uint8 array of layouts, the params that made them)
+        """
+        params = self.sample_params(count)
+        return self.build(params), params
+
+    def fields(self, count: int) -> list:
+        """
+        Draws count new layouts as CropFields
+        """
+        return [CropField(layout) for layout in self.sample(count)[0]]
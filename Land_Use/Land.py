@@ -1,5 +1,8 @@
+from Land_Use.Cost import CostField
+import copy
 import numpy as np
 import sys
+import warnings
 
 
 class Area:
@@ -23,9 +26,22 @@ class Area:
 
     """
 
-    def __init__(self, array):
-        # convert input array to numpy array
-        self.array = np.array(array)
+    def __init__(self, array, dtype=np.uint8, packed: bool = False, copy: bool = True):
+        """
+        :param array: anything that converts to a 2D array of land classes
+        :param dtype: how to store each cell. One byte (uint8) is plenty for the land classes 1-4.
+        :param packed: store the land classes in 2 bits per cell and the food and shelter masks in 1 bit per cell
+        (see PackedRaster and PackedMask). Lookups get a little slower, but the area takes 4-8 times less memory.
+        :param copy: set to False to let the area keep a NumPy array that is already of the right dtype instead of
+        copying it, e.g., one that was just built to hand over
+        """
+        # convert input array to numpy array, making sure nothing is lost squeezing it into the storage type
+        raw = np.asarray(array)
+        if raw.dtype != dtype and raw.dtype.kind in 'iu' and raw.size and \
+                (raw.min() < np.iinfo(dtype).min or raw.max() > np.iinfo(dtype).max):
+            raise ValueError("Area values don't fit in {}".format(np.dtype(dtype).name))
+        self.array = (np.array(raw, dtype=dtype) if copy else np.asarray(raw, dtype=dtype)) if raw.dtype.kind in 'iub' \
+            else raw
         self.shape = self.array.shape
         self.row_len = self.shape[0]
         # checks that it is a 2D array and not a simple list
@@ -37,16 +53,30 @@ class Area:
         except (ValueError, IndexError):
             print("Subarrays must be the same length")
             sys.exit(42)
-        ix_food = np.isin(self.array, [2, 4])
-        self.food_indices = []
-        if True in ix_food:
-            self.food_indices = list(zip(np.where(ix_food)[0], np.where(ix_food)[1]))
-        ix_shelter = np.isin(self.array, [3, 4])
-        self.shelter_indices = []
-        if True in ix_shelter:
-            self.shelter_indices = list(zip(np.where(ix_shelter)[0], np.where(ix_shelter)[1]))
+        # Where the resources are, worked out once: a boolean mask for checking a single cell and an (N, 2) table of
+        # row, column coordinates for searching. Food is 2 or 4, shelter is 3 or 4.
+        self.food_mask = np.isin(self.array, [2, 4])
+        self.shelter_mask = np.isin(self.array, [3, 4])
+        self.food_coords = np.argwhere(self.food_mask).astype(np.int32)
+        self.shelter_coords = np.argwhere(self.shelter_mask).astype(np.int32)
+        if packed:
+            self.array = PackedRaster(self.array)
+            self.food_mask = PackedMask(self.food_mask)
+            self.shelter_mask = PackedMask(self.shelter_mask)
+        self._food_indices = None
+        self._shelter_indices = None
         # This dosen't do anything at the moment, just thinking ahead
         self.developed_indices = []
+        # Where pollinators have been, if anyone asked to keep track. See track_occupancy()
+        self.occupancy = None
+        # Where pollinators are right now, if anyone asked to keep track. See track_agents()
+        self.agent_grid = None
+        # Rain, wind and temperature over time, see Land_Use.Weather. None means fair weather all the time.
+        self.weather = None
+        # Spraying, mowing and the like, see Land_Use.Developed.hazard. None means nothing kills outright.
+        self.hazard = None
+        # Travel costs to each resource, made when first asked for. See cost_field()
+        self._cost_fields = {}
 
     def __str__(self) -> str:
         """
@@ -64,7 +94,888 @@ class Area:
         return "Area('{} m x {} m')".format(
             self.row_len * 15, self.col_len * 15)
 
-    def concatenate(self, area2):
-        new_array = np.concatenate((self.array, area2))
-        return Area(new_array)
+    @property
+    def food_indices(self) -> list:
+        """
+        Deprecated: the food cells as a list of (row, column) tuples. Use food_coords or food_mask instead. The list is
+        only built if something asks for it.
+        """
+        warnings.warn("Area.food_indices is deprecated, use food_coords or food_mask", DeprecationWarning,
+                      stacklevel=2)
+        if self._food_indices is None:
+            self._food_indices = [tuple(cell) for cell in self.food_coords.tolist()]
+        return self._food_indices
+
+    @property
+    def shelter_indices(self) -> list:
+        """
+        Deprecated: the shelter cells as a list of (row, column) tuples. Use shelter_coords or shelter_mask instead.
+        The list is only built if something asks for it.
+        """
+        warnings.warn("Area.shelter_indices is deprecated, use shelter_coords or shelter_mask", DeprecationWarning,
+                      stacklevel=2)
+        if self._shelter_indices is None:
+            self._shelter_indices = [tuple(cell) for cell in self.shelter_coords.tolist()]
+        return self._shelter_indices
+
+    def resource_coords(self, resource: str) -> np.ndarray:
+        """
+        The (N, 2) table of coordinates of the cells holding the resource
+        :param resource: 'food' or 'shelter'
+        """
+        if resource == 'food':
+            return self.food_coords
+        elif resource == 'shelter':
+            return self.shelter_coords
+        raise ValueError('Unknown resource')
+
+    def has_resource(self, resource: str) -> bool:
+        return len(self.resource_coords(resource)) > 0
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.row_len and 0 <= y < self.col_len
+
+    def on_resource(self, resource: str, x: int, y: int) -> bool:
+        """
+        Whether cell (x, y) holds the resource. Cells outside the area never do.
+        >>> a = Area([[1, 2], [3, 4]])
+        >>> a.on_resource('food', 0, 1), a.on_resource('shelter', 0, 1), a.on_resource('food', -1, 1)
+        (True, False, False)
+        """
+        mask = self.food_mask if resource == 'food' else self.shelter_mask
+        if self.in_bounds(x, y):
+            return bool(mask[x, y])
+        return False
+
+    def nearest_resource(self, resource: str, x: int, y: int) -> tuple:
+        """
+        The cell holding the resource with the smallest Manhattan distance from (x, y). Ties go to the first cell in
+        reading order.
+        :return: (row, column), or None if there is none of the resource
+        >>> Area([[1, 2, 1], [1, 1, 1], [2, 1, 1]]).nearest_resource('food', 1, 2)
+        (0, 1)
+        """
+        coords = self.resource_coords(resource)
+        if len(coords) == 0:
+            return None
+        distance = np.abs(coords[:, 0] - x) + np.abs(coords[:, 1] - y)
+        nearest = coords[distance.argmin()]
+        return int(nearest[0]), int(nearest[1])
+
+    def cost_field(self, resource: str, costs: dict = None) -> CostField:
+        """
+        The cheapest paths from every cell to the resource when crossing each land class has its own cost (see
+        Land_Use.Cost). It is worked out the first time it is asked for and kept with the area, so every pollinator on
+        the area shares it. If the array is changed in place after that, call forget_cost_fields().
+        :param resource: 'food' or 'shelter'
+        :param costs: {land class: cost}, Land_Use.Cost.land_class_costs by default
+        :return: CostField
+        >>> a = Area([[2, 1, 1], [1, 1, 1]])
+        >>> a.cost_field('food').nearest(1, 2), a.cost_field('food') is a.cost_field('food')
+        ((0, 0), True)
+        """
+        key = (resource, None if costs is None else tuple(sorted(costs.items())))
+        if key not in self._cost_fields:
+            self._cost_fields[key] = CostField(self, resource, costs)
+        return self._cost_fields[key]
+
+    def forget_cost_fields(self):
+        self._cost_fields = {}
+
+    def track_occupancy(self) -> 'Occupancy':
+        """
+        Starts counting the cells pollinators move into on this area. Pollinators add to the count as they move, so
+        nothing needs to be kept per pollinator.
+        :return: the Occupancy now attached to the area (the existing one if it was already tracking)
+        """
+        if self.occupancy is None:
+            self.occupancy = Occupancy(self.shape)
+        return self.occupancy
+
+    def detached(self) -> 'Area':
+        """
+        A view of this area for pollinators that shouldn't leave a trace on it, e.g., one being replayed. It shares the
+        land, weather, hazards and cost fields with the area, but pollinators on it aren't counted in its Occupancy or
+        put in its AgentGrid.
+        :return: a shallow copy of the area with no occupancy or agent grid
+        >>> a = Area([[1, 2], [3, 4]])
+        >>> o = a.track_occupancy()
+        >>> view = a.detached()
+        >>> view.occupancy is None, view.array is a.array, a.occupancy is o
+        (True, True, True)
+        """
+        view = copy.copy(self)
+        view.occupancy = None
+        view.agent_grid = None
+        return view
+
+    def track_agents(self, cell_size: int = 10) -> 'AgentGrid':
+        """
+        Starts keeping an AgentGrid of where the pollinators on this area are, for questions like who is nearby.
+        Pollinators put themselves in the grid when they are made or moved, so to include pollinators that already
+        exist call rebuild() on the grid.
+        :param cell_size: side of a grid bucket in cells, about the radius of the queries that will be made
+        :return: the AgentGrid now attached to the area (the existing one if it was already tracking)
+        """
+        if self.agent_grid is None:
+            self.agent_grid = AgentGrid(cell_size, self.shape)
+        return self.agent_grid
+
+    def concatenate(self, area2, direction: str = 'north-south') -> 'Area':
+        """
+        Joins area2 (an Area or an array) onto the south, or the east, of this area. See assemble_areas.
+        """
+        return assemble_areas([self, area2], direction)
+
+
+class PackedRaster:
+    """
+    Land classes 1-4 stored in 2 bits per cell, four cells to a byte. It can be read like the NumPy array it replaces:
+    raster[x][y] and raster[x, y] give single cells, raster[x] gives an unpacked row, and np.asarray(raster) unpacks
+    the whole thing.
+    >>> r = PackedRaster(np.array([[1, 2, 3, 4, 1], [4, 3, 2, 1, 2]]))
+    >>> int(r[1][1]), int(r[0, 3]), r[1].tolist(), r.shape
+    (3, 4, [4, 3, 2, 1, 2], (2, 5))
+    >>> np.asarray(r).tolist()
+    [[1, 2, 3, 4, 1], [4, 3, 2, 1, 2]]
+    """
+    _shifts = np.array([6, 4, 2, 0], dtype=np.uint8)
+    dtype = np.dtype(np.uint8)
+    ndim = 2
+
+    def __init__(self, array):
+        array = np.asarray(array)
+        if array.size and (array.min() < 1 or array.max() > 4):
+            raise ValueError("Only the land classes 1-4 can be packed")
+        self.shape = array.shape
+        self.size = array.size
+        columns = -(-array.shape[1] // 4) * 4
+        codes = np.zeros((array.shape[0], columns), dtype=np.uint8)
+        codes[:, :array.shape[1]] = array - 1
+        codes = codes.reshape(array.shape[0], -1, 4) << self._shifts
+        self.data = np.bitwise_or.reduce(codes, axis=2)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    def row(self, x: int) -> np.ndarray:
+        return (((self.data[x][:, None] >> self._shifts) & 3).ravel()[:self.shape[1]] + 1).astype(np.uint8)
+
+    def unpack(self) -> np.ndarray:
+        return (((self.data[:, :, None] >> self._shifts) & 3).reshape(self.shape[0], -1)[:, :self.shape[1]]
+                + 1).astype(np.uint8)
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple) and len(key) == 2 and all(isinstance(k, (int, np.integer)) for k in key):
+            x, y = key
+            if y < 0:
+                y += self.shape[1]
+            return ((int(self.data[x, y >> 2]) >> (6 - 2 * (y & 3))) & 3) + 1
+        if isinstance(key, (int, np.integer)):
+            return self.row(key)
+        return self.unpack()[key]
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.unpack()
+        return array if dtype is None else array.astype(dtype)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __iter__(self):
+        for x in range(self.shape[0]):
+            yield self.row(x)
+
+
+class PackedMask:
+    """
+    A boolean raster stored as bits, eight cells to a byte, read with mask[x, y]
+    >>> m = PackedMask(np.array([[True, False, True], [False, False, True]]))
+    >>> m[0, 2], m[1, 0], np.asarray(m).tolist()
+    (True, False, [[True, False, True], [False, False, True]])
+    """
+    dtype = np.dtype(np.bool_)
+    ndim = 2
+
+    def __init__(self, mask):
+        mask = np.asarray(mask, dtype=bool)
+        self.shape = mask.shape
+        self.data = np.packbits(mask, axis=1)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    def unpack(self) -> np.ndarray:
+        return np.unpackbits(self.data, axis=1, count=self.shape[1]).astype(bool)
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple) and len(key) == 2 and all(isinstance(k, (int, np.integer)) for k in key):
+            x, y = key
+            return bool((self.data[x, y >> 3] >> (7 - (y & 7))) & 1)
+        return self.unpack()[key]
+
+    def __array__(self, dtype=None, copy=None):
+        mask = self.unpack()
+        return mask if dtype is None else mask.astype(dtype)
+
+
+# Which land classes count as each resource
+resource_classes = {'food': (2, 4), 'shelter': (3, 4)}
+
+
+class SparseRaster:
+    """
+    A raster that is mostly one background value (crops), stored as runs of the other values: for each row, the sorted
+    columns where each run starts and ends (exclusive) and its value, with row_ptr marking where each row's runs begin,
+    like a CSR matrix. It reads like the dense array it stands in for: raster[x][y] and raster[x, y] give single
+    cells and np.asarray(raster) builds the dense array.
+    >>> r = SparseRaster.from_dense(np.array([[1, 2, 2, 1, 3], [1, 1, 1, 1, 1], [4, 1, 1, 3, 3]]))
+    >>> r.starts.tolist(), r.ends.tolist(), r.values.tolist(), r.row_ptr.tolist()
+    ([1, 4, 0, 3], [3, 5, 1, 5], [2, 3, 4, 3], [0, 2, 2, 4])
+    >>> int(r[0][2]), int(r[2, 4]), int(r[1][3]), np.asarray(r)[2].tolist()
+    (2, 3, 1, [4, 1, 1, 3, 3])
+    """
+    ndim = 2
+
+    def __init__(self, shape: tuple, row_ptr, starts, ends, values, background: int = 1):
+        self.shape = tuple(shape)
+        self.size = self.shape[0] * self.shape[1]
+        self.row_ptr = np.asarray(row_ptr, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int32)
+        self.ends = np.asarray(ends, dtype=np.int32)
+        self.values = np.asarray(values, dtype=np.uint8)
+        self.dtype = self.values.dtype
+        self.background = background
+
+    @classmethod
+    def from_dense(cls, array, background: int = 1) -> 'SparseRaster':
+        """
+        Finds the runs of non-background cells in a dense 2D array
+        """
+        array = np.asarray(array)
+        length, width = array.shape
+        # A column of background on the right of every row stops runs from carrying over into the next row
+        padded = np.full((length, width + 1), background, dtype=array.dtype)
+        padded[:, :width] = array
+        flat = padded.ravel()
+        habitat = flat != background
+        changes = np.empty(len(flat), dtype=bool)
+        changes[0] = True
+        changes[1:] = flat[1:] != flat[:-1]
+        first = np.flatnonzero(habitat & changes)
+        last = np.flatnonzero(habitat & np.append(changes[1:], True))
+        rows = first // (width + 1)
+        return cls(array.shape, np.searchsorted(rows, np.arange(length + 1)), first % (width + 1),
+                   last % (width + 1) + 1, flat[first], background)
+
+    @classmethod
+    def from_runs(cls, shape: tuple, rows, starts, ends, values, background: int = 1) -> 'SparseRaster':
+        """
+        Builds the raster straight from a list of runs, so a landscape never has to exist as a dense array
+        :param shape: (rows, columns) of the whole area
+        :param rows: row of each run
+        :param starts: first column of each run
+        :param ends: one past the last column of each run
+        :param values: land class of each run
+        >>> int(SparseRaster.from_runs((3, 1000), [2, 0], [10, 990], [20, 1000], [2, 3])[2, 15])
+        2
+        """
+        rows, starts, ends, values = (np.asarray(v, dtype=np.int64) for v in (rows, starts, ends, values))
+        order = np.lexsort((starts, rows))
+        rows, starts, ends, values = rows[order], starts[order], ends[order], values[order]
+        if len(rows) and (rows.min() < 0 or rows.max() >= shape[0] or starts.min() < 0 or ends.max() > shape[1]
+                          or (ends <= starts).any()):
+            raise ValueError("Runs must be non-empty and inside the area")
+        if ((rows[1:] == rows[:-1]) & (starts[1:] < ends[:-1])).any():
+            raise ValueError("Runs in the same row can't overlap")
+        return cls(shape, np.searchsorted(rows, np.arange(shape[0] + 1)), starts, ends, values, background)
+
+    @property
+    def nbytes(self) -> int:
+        return self.row_ptr.nbytes + self.starts.nbytes + self.ends.nbytes + self.values.nbytes
+
+    def run_rows(self) -> np.ndarray:
+        # The row each run is in
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.row_ptr))
+
+    def value(self, x: int, y: int) -> int:
+        """
+        The land class of cell (x, y), found by a binary search of that row's runs
+        """
+        if x < 0:
+            x += self.shape[0]
+        if y < 0:
+            y += self.shape[1]
+        if not (0 <= x < self.shape[0] and 0 <= y < self.shape[1]):
+            raise IndexError("cell ({}, {}) is outside the area".format(x, y))
+        first, last = self.row_ptr[x], self.row_ptr[x + 1]
+        run = first + np.searchsorted(self.starts[first:last], y, side='right') - 1
+        if run >= first and y < self.ends[run]:
+            return int(self.values[run])
+        return self.background
+
+    def unpack(self) -> np.ndarray:
+        dense = np.full(self.shape, self.background, dtype=self.dtype)
+        lengths = self.ends - self.starts
+        # flat index of every cell covered by a run
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        cells = np.repeat(self.run_rows() * self.shape[1] + self.starts, lengths) + offsets
+        dense.ravel()[cells] = np.repeat(self.values, lengths)
+        return dense
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple) and len(key) == 2 and all(isinstance(k, (int, np.integer)) for k in key):
+            return self.value(*key)
+        if isinstance(key, (int, np.integer)):
+            return _SparseRow(self, key)
+        return self.unpack()[key]
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.unpack()
+        return array if dtype is None else array.astype(dtype)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __iter__(self):
+        for x in range(self.shape[0]):
+            yield _SparseRow(self, x)
+
+
+class _SparseRow:
+    """
+    One row of a SparseRaster, so raster[x][y] works the way it does on a dense array
+    """
+
+    def __init__(self, raster: SparseRaster, x: int):
+        self.raster = raster
+        self.x = x
+
+    def __getitem__(self, y):
+        if isinstance(y, (int, np.integer)):
+            return self.raster.value(self.x, y)
+        return np.asarray(self)[y]
+
+    def __array__(self, dtype=None, copy=None):
+        row = self.raster.unpack()[self.x] if self.raster.row_ptr[self.x] < self.raster.row_ptr[self.x + 1] else \
+            np.full(self.raster.shape[1], self.raster.background, dtype=self.raster.dtype)
+        return row if dtype is None else row.astype(dtype)
+
+    def __len__(self) -> int:
+        return self.raster.shape[1]
+
+
+class _SparseMask:
+    """
+    A resource mask read off a SparseRaster, mask[x, y]
+    """
+
+    def __init__(self, raster: SparseRaster, classes: tuple):
+        self.raster = raster
+        self.classes = classes
+        self.shape = raster.shape
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple) and len(key) == 2 and all(isinstance(k, (int, np.integer)) for k in key):
+            return self.raster.value(*key) in self.classes
+        return np.asarray(self)[key]
+
+    def __array__(self, dtype=None, copy=None):
+        mask = np.isin(self.raster.unpack(), self.classes)
+        return mask if dtype is None else mask.astype(dtype)
+
+
+class SparseArea(Area):
+    """
+    An Area for landscapes that are mostly crops, where only the food and shelter cells are stored (as a SparseRaster).
+    Memory and the cost of looking for food or shelter grow with the number of habitat runs rather than the size of
+    the area, and cell lookups are a binary search within one row. Pollinators can use it anywhere they use an Area.
+    >>> a = SparseArea([[1, 1, 1, 1], [1, 2, 2, 1], [1, 1, 1, 1], [3, 1, 1, 4]])
+    >>> a.array[1][2], a.on_resource('food', 1, 1), a.on_resource('shelter', 3, 3), a.on_resource('food', 4, 0)
+    (2, True, True, False)
+    >>> a.nearest_resource('food', 3, 1), a.nearest_resource('shelter', 0, 3)
+    ((1, 1), (3, 3))
+    >>> a.food_coords.tolist()
+    [[1, 1], [1, 2], [3, 3]]
+    >>> big = SparseArea.from_runs((10000, 10000), [5000], [0], [10000], [3])
+    >>> big.nearest_resource('shelter', 0, 7), big.array.nbytes < 100000
+    ((5000, 7), True)
+    """
+
+    def __init__(self, array, background: int = 1):
+        """
+        :param array: a dense 2D array of land classes, an Area, or a SparseRaster
+        :param background: the land class that isn't stored, crops by default
+        """
+        if isinstance(array, Area):
+            array = array.array
+        if not isinstance(array, SparseRaster):
+            array = np.asarray(array)
+            if array.ndim != 2:
+                raise ValueError("Area must be a 2-dimensional list, e.g., [[1,1],[1,1]].")
+            array = SparseRaster.from_dense(array, background)
+        self.array = array
+        self.shape = array.shape
+        self.row_len, self.col_len = self.shape
+        self.food_mask = _SparseMask(array, resource_classes['food'])
+        self.shelter_mask = _SparseMask(array, resource_classes['shelter'])
+        self._runs = {resource: np.flatnonzero(np.isin(array.values, classes))
+                      for resource, classes in resource_classes.items()}
+        self._coords = {}
+        self._food_indices = None
+        self._shelter_indices = None
+        self.developed_indices = []
+        self.occupancy = None
+        self.agent_grid = None
+        self.weather = None
+        self.hazard = None
+        self._cost_fields = {}
+
+    @classmethod
+    def from_runs(cls, shape: tuple, rows, starts, ends, values, background: int = 1) -> 'SparseArea':
+        """
+        Builds the area from runs of habitat, see SparseRaster.from_runs
+        """
+        return cls(SparseRaster.from_runs(shape, rows, starts, ends, values, background))
+
+    @property
+    def food_coords(self) -> np.ndarray:
+        return self.resource_coords('food')
+
+    @property
+    def shelter_coords(self) -> np.ndarray:
+        return self.resource_coords('shelter')
+
+    def resource_coords(self, resource: str) -> np.ndarray:
+        """
+        The (N, 2) table of coordinates of the cells holding the resource, in reading order. It is built from the
+        runs the first time it is asked for.
+        :param resource: 'food' or 'shelter'
+        """
+        if resource not in self._runs:
+            raise ValueError('Unknown resource')
+        if resource not in self._coords:
+            runs = self._runs[resource]
+            starts, ends = self.array.starts[runs], self.array.ends[runs]
+            lengths = ends - starts
+            columns = np.repeat(starts, lengths) + np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths,
+                                                                                      lengths)
+            rows = np.repeat(self.array.run_rows()[runs], lengths)
+            self._coords[resource] = np.column_stack((rows, columns)).astype(np.int32)
+        return self._coords[resource]
+
+    def has_resource(self, resource: str) -> bool:
+        return len(self._runs[resource]) > 0
+
+    def on_resource(self, resource: str, x: int, y: int) -> bool:
+        if self.in_bounds(x, y):
+            return self.array.value(x, y) in resource_classes[resource]
+        return False
+
+    def nearest_resource(self, resource: str, x: int, y: int) -> tuple:
+        """
+        Same answer as Area.nearest_resource, but worked out per run: the closest cell of a run is the one in the
+        column nearest y, and runs are in reading order so ties still go to the first cell.
+        """
+        runs = self._runs[resource]
+        if len(runs) == 0:
+            return None
+        starts, ends = self.array.starts[runs], self.array.ends[runs] - 1
+        rows = self.array.run_rows()[runs]
+        columns = np.clip(y, starts, ends)
+        nearest = (np.abs(rows - x) + np.abs(columns - y)).argmin()
+        return int(rows[nearest]), int(columns[nearest])
+
+    def concatenate(self, area2, direction: str = 'north-south') -> 'SparseArea':
+        """
+        Joins area2 onto the south, or the east, of this area without building either one densely
+        """
+        if not isinstance(area2, SparseArea):
+            area2 = SparseArea(area2, self.array.background)
+        first, second = self.array, area2.array
+        rows, columns = first.run_rows(), 0
+        if direction == 'north-south':
+            if area2.col_len != self.col_len:
+                raise ValueError("Areas must have the same number of columns to be joined north to south")
+            shape = (self.row_len + area2.row_len, self.col_len)
+            second_rows = second.run_rows() + self.row_len
+        elif direction == 'east-west':
+            if area2.row_len != self.row_len:
+                raise ValueError("Areas must have the same number of rows to be joined east to west")
+            shape = (self.row_len, self.col_len + area2.col_len)
+            second_rows, columns = second.run_rows(), self.col_len
+        else:
+            raise ValueError("direction must be one of {}".format(', '.join(directions)))
+        return SparseArea.from_runs(shape, np.concatenate((rows, second_rows)),
+                                    np.concatenate((first.starts, second.starts + columns)),
+                                    np.concatenate((first.ends, second.ends + columns)),
+                                    np.concatenate((first.values, second.values)), first.background)
+
+    def to_dense(self) -> Area:
+        return Area(np.asarray(self.array))
+
+
+class Occupancy:
+    """
+    A running count of how many times pollinators moved into each cell of an area, kept in a preallocated int32 raster
+    the same shape as the area. Cells outside the area are ignored. Counts from separate runs or processes can be
+    added together with merge().
+    >>> o = Occupancy((4, 4))
+    >>> o.visit(1, 2)
+    >>> o.add([0, 1, 1, 9], [0, 2, 2, 0])
+    >>> int(o.raster[1, 2]), o.total()
+    (3, 4)
+    >>> o.merge(o.copy()).total()
+    8
+    """
+
+    def __init__(self, shape: tuple):
+        self.raster = np.zeros(shape, dtype=np.int32)
+
+    @classmethod
+    def from_moves(cls, shape: tuple, moves: list) -> 'Occupancy':
+        """
+        Builds the counts from a list of recorded (x, y) moves
+        """
+        occupancy = cls(shape)
+        if len(moves):
+            moves = np.asarray(moves)
+            occupancy.add(moves[:, 0], moves[:, 1])
+        return occupancy
+
+    def visit(self, x: int, y: int):
+        """
+        Counts one move into cell (x, y)
+        """
+        if 0 <= x < self.raster.shape[0] and 0 <= y < self.raster.shape[1]:
+            self.raster[x, y] += 1
+
+    def add(self, xs, ys):
+        """
+        Counts a batch of moves at once, e.g., a whole leg of a flight or one step of many pollinators.
+        :param xs: row indices
+        :param ys: column indices, same length as xs
+        """
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        inside = (xs >= 0) & (xs < self.raster.shape[0]) & (ys >= 0) & (ys < self.raster.shape[1])
+        np.add.at(self.raster, (xs[inside], ys[inside]), 1)
+
+    def merge(self, other: 'Occupancy') -> 'Occupancy':
+        """
+        Adds the counts of another occupancy of the same shape into this one
+        :return: self, so merges can be chained
+        """
+        if other.raster.shape != self.raster.shape:
+            raise ValueError("Occupancies must be the same shape to merge")
+        self.raster += other.raster
+        return self
+
+    def copy(self) -> 'Occupancy':
+        occupancy = Occupancy(self.raster.shape)
+        occupancy.raster[:] = self.raster
+        return occupancy
+
+    def total(self) -> int:
+        return int(self.raster.sum())
+
+    def save(self, path: str):
+        np.save(path, self.raster)
+
+    @classmethod
+    def load(cls, path: str) -> 'Occupancy':
+        raster = np.load(path)
+        occupancy = cls(raster.shape)
+        occupancy.raster[:] = raster
+        return occupancy
+
+
+# Ways blocks can be joined by assemble_areas
+directions = ('north-south', 'east-west')
+
+
+def assemble_areas(blocks: list, direction: str = 'north-south', area_class: type = Area, dtype=np.uint8) -> Area:
+    """
+    Joins a list of areas (or 2D arrays) into one area, the first block in the north (or west). The combined raster
+    is allocated once and each block is copied into its place, and the resource masks and coordinates are only worked
+    out for the result, so the cost is linear in the size of the arrangement. A list of rows of blocks makes a grid:
+    each row is joined east-west and the rows north-south.
+    :param blocks: Areas or arrays, or a list of lists of them
+    :param direction: 'north-south' to stack the blocks in a column, 'east-west' to put them side by side
+    :param area_class: what to make of the result, e.g., CropField
+    :param dtype: storage type of the result
+    :return: area_class
+    >>> a = assemble_areas([[[1, 2]], [[3, 4], [1, 1]]])
+    >>> a.shape, a.food_coords.tolist()
+    ((3, 2), [[0, 1], [1, 1]])
+    >>> assemble_areas([[[1, 2]], [[3, 4]]], 'east-west').array.tolist()
+    [[1, 2, 3, 4]]
+    >>> assemble_areas([[[[1]], [[2]]], [[[3, 4]]]]).array.tolist()
+    [[1, 2], [3, 4]]
+    """
+    if direction not in directions:
+        raise ValueError("direction must be one of {}".format(', '.join(directions)))
+    if len(blocks) and isinstance(blocks[0], list) and len(blocks[0]) and \
+            (isinstance(blocks[0][0], Area) or np.ndim(blocks[0][0]) == 2):
+        # a grid: rows of blocks laid side by side, the rows stacked north to south
+        grid = [[np.asarray(block.array if isinstance(block, Area) else block) for block in row] for row in blocks]
+        if direction == 'east-west':
+            grid = [list(column) for column in zip(*grid)]
+    else:
+        arrays = [np.asarray(block.array if isinstance(block, Area) else block) for block in blocks]
+        grid = [[array] for array in arrays] if direction == 'north-south' else [arrays]
+    heights = [row[0].shape[0] for row in grid]
+    widths = [sum(block.shape[1] for block in row) for row in grid]
+    if any(block.shape[0] != height for row, height in zip(grid, heights) for block in row):
+        raise ValueError("Blocks joined east to west must have the same number of rows")
+    if any(width != widths[0] for width in widths):
+        raise ValueError("Blocks joined north to south must have the same number of columns")
+    raster = np.empty((sum(heights), widths[0]), dtype=dtype)
+    x = 0
+    for row, height in zip(grid, heights):
+        y = 0
+        for block in row:
+            raster[x:x + height, y:y + block.shape[1]] = block
+            y += block.shape[1]
+        x += height
+    return area_class(raster, dtype=dtype, copy=False)
+
+
+class AgentGrid:
+    """
+    A spatial hash of pollinators: the area is divided into square buckets of cell_size cells, and each bucket knows
+    which pollinators are in it. Pollinators on an area that is tracking agents (see Area.track_agents) move themselves
+    between buckets when their position changes, so looking for neighbours only has to check the few buckets around
+    a point instead of every pollinator. Distances are Manhattan distances, like everywhere else in the simulation,
+    and only living pollinators are returned. Pollinators take themselves out of the grid when they die or leave.
+    >>> class Agent:
+    ...     status = 'alive'
+    ...     def __init__(self, x, y):
+    ...         self.position = (x, y)
+    >>> grid = AgentGrid(cell_size=4)
+    >>> agents = [Agent(0, 0), Agent(3, 5), Agent(10, 10)]
+    >>> grid.rebuild(agents)
+    >>> [a.position for a in grid.within(2, 2, 4)]
+    [(0, 0), (3, 5)]
+    >>> grid.move(agents[2], 1, 1)
+    >>> agents[2].position = (1, 1)
+    >>> grid.nearest(agents[0]).position
+    (1, 1)
+    """
+
+    def __init__(self, cell_size: int = 10, shape: tuple = None):
+        """
+        :param cell_size: side of a bucket in cells
+        :param shape: shape of the area, if known, so nearest() knows how far out it may have to look
+        """
+        self.cell_size = max(1, int(cell_size))
+        self.shape = shape
+        # bucket -> {pollinator: None}, a dict rather than a set so the order of the answers doesn't change from run
+        # to run
+        self.buckets = {}
+        self.bucket_of = {}
+        self._reset_extent()
+
+    def _reset_extent(self):
+        # The lowest and highest bucket rows and columns anyone can be in: the area's, widened by any bucket used
+        # outside it
+        if self.shape is None:
+            self.extent = None
+        else:
+            self.extent = [0, 0] + list(self._key(self.shape[0] - 1, self.shape[1] - 1))
+
+    def _widen(self, key: tuple):
+        extent = self.extent
+        if extent is None:
+            self.extent = [key[0], key[1], key[0], key[1]]
+        elif not (extent[0] <= key[0] <= extent[2] and extent[1] <= key[1] <= extent[3]):
+            self.extent = [min(extent[0], key[0]), min(extent[1], key[1]),
+                           max(extent[2], key[0]), max(extent[3], key[1])]
+
+    def _key(self, x: int, y: int) -> tuple:
+        return int(x) // self.cell_size, int(y) // self.cell_size
+
+    def __len__(self) -> int:
+        return len(self.bucket_of)
+
+    def add(self, agent, x: int = None, y: int = None):
+        """
+        Puts a pollinator in the grid, at (x, y) or else at its current position
+        """
+        if x is None:
+            x, y = agent.position
+        key = self._key(x, y)
+        self.bucket_of[agent] = key
+        self.buckets.setdefault(key, {})[agent] = None
+        self._widen(key)
+
+    def remove(self, agent):
+        key = self.bucket_of.pop(agent, None)
+        if key is not None:
+            bucket = self.buckets[key]
+            del bucket[agent]
+            if not bucket:
+                del self.buckets[key]
+
+    def move(self, agent, x: int, y: int):
+        """
+        Tells the grid a pollinator is moving to (x, y). Pollinators call this themselves when their position is set.
+        """
+        key = self._key(x, y)
+        old = self.bucket_of.get(agent)
+        if old != key:
+            if old is not None:
+                self.remove(agent)
+            self.bucket_of[agent] = key
+            self.buckets.setdefault(key, {})[agent] = None
+            self._widen(key)
+
+    def rebuild(self, agents):
+        """
+        Empties the grid and fills it again with the living ones of the given pollinators, e.g., once per tick for a
+        whole population
+        """
+        self.buckets = {}
+        self.bucket_of = {}
+        self._reset_extent()
+        for agent in agents:
+            if agent.status == 'alive':
+                self.add(agent)
+
+    def within(self, x: int, y: int, radius: int, species: type = None) -> list:
+        """
+        The living pollinators within radius of (x, y)
+        :param species: if given, only pollinators of this class
+        :return: list of pollinators
+        """
+        found = []
+        bx0, by0 = self._key(x - radius, y - radius)
+        bx1, by1 = self._key(x + radius, y + radius)
+        for bx in range(bx0, bx1 + 1):
+            for by in range(by0, by1 + 1):
+                for agent in self.buckets.get((bx, by), ()):
+                    ax, ay = agent.position
+                    if abs(ax - x) + abs(ay - y) <= radius and agent.status == 'alive' and \
+                            (species is None or type(agent) is species):
+                        found.append(agent)
+        return found
+
+    def nearest(self, agent, species: type = None, max_radius: int = None):
+        """
+        The closest other living pollinator of the same class as agent (or of species), searching outward one ring
+        of buckets at a time and stopping as soon as no closer one can be left
+        :return: the pollinator, or None if there isn't one (within max_radius)
+        """
+        species = type(agent) if species is None else species
+        x, y = agent.position
+        bx, by = self._key(x, y)
+        if not self.buckets:
+            return None
+        # The furthest ring that could hold anyone
+        low_x, low_y, high_x, high_y = self.extent
+        last = max(bx - low_x, high_x - bx, by - low_y, high_y - by, 0)
+        best = None
+        best_distance = None
+        for ring in range(last + 1):
+            # Everything in this ring or further out is at least this far away
+            if best is not None and (ring - 1) * self.cell_size + 1 > best_distance:
+                break
+            if max_radius is not None and (ring - 1) * self.cell_size + 1 > max_radius:
+                break
+            for key in self._ring(bx, by, ring):
+                for other in self.buckets.get(key, ()):
+                    if other is agent or type(other) is not species or other.status != 'alive':
+                        continue
+                    ox, oy = other.position
+                    distance = abs(ox - x) + abs(oy - y)
+                    if (best is None or distance < best_distance) and (max_radius is None or distance <= max_radius):
+                        best, best_distance = other, distance
+        return best
+
+    @staticmethod
+    def _ring(bx: int, by: int, ring: int):
+        # The buckets exactly ring buckets away (in both directions) from (bx, by)
+        if ring == 0:
+            yield bx, by
+            return
+        for y in range(by - ring, by + ring + 1):
+            yield bx - ring, y
+            yield bx + ring, y
+        for x in range(bx - ring + 1, bx + ring):
+            yield x, by - ring
+            yield x, by + ring
+
+
+class PointGrid:
+    """
+    The array version of AgentGrid, for engines that keep positions in NumPy arrays rather than in pollinator
+    objects. rebuild() sorts all the points into buckets at once (a counting sort, kept like a CSR matrix), after
+    which within() checks only the buckets around a point.
+    >>> grid = PointGrid((20, 20), cell_size=5)
+    >>> grid.rebuild([0, 3, 19, 4], [0, 4, 19, 1])
+    >>> grid.within(2, 2, 4).tolist()
+    [0, 1, 3]
+    >>> int(grid.counts().sum())
+    4
+    """
+
+    def __init__(self, shape: tuple, cell_size: int = 10):
+        self.cell_size = max(1, int(cell_size))
+        self.grid_shape = (-(-shape[0] // self.cell_size), -(-shape[1] // self.cell_size))
+        self.xs = np.empty(0, dtype=np.int64)
+        self.ys = np.empty(0, dtype=np.int64)
+        self.order = np.empty(0, dtype=np.int64)
+        self.ptr = np.zeros(self.grid_shape[0] * self.grid_shape[1] + 1, dtype=np.int64)
+
+    def rebuild(self, xs, ys):
+        """
+        Sorts a new set of points into the buckets. Points outside the area go in the nearest edge bucket.
+        """
+        self.xs = np.asarray(xs, dtype=np.int64)
+        self.ys = np.asarray(ys, dtype=np.int64)
+        keys = self._keys(self.xs, self.ys)
+        self.order = np.argsort(keys, kind='stable')
+        self.ptr[1:] = np.cumsum(np.bincount(keys, minlength=len(self.ptr) - 1))
+
+    def _keys(self, xs, ys):
+        bx = np.clip(xs // self.cell_size, 0, self.grid_shape[0] - 1)
+        by = np.clip(ys // self.cell_size, 0, self.grid_shape[1] - 1)
+        return bx * self.grid_shape[1] + by
+
+    def counts(self) -> np.ndarray:
+        """
+        Points per bucket, as a (rows, columns) array of buckets, e.g., for crowding
+        """
+        return np.diff(self.ptr).reshape(self.grid_shape)
+
+    def within(self, x: int, y: int, radius: int) -> np.ndarray:
+        """
+        Indices of the points within radius of (x, y), in the order they were given to rebuild()
+        """
+        bx0, bx1 = (np.clip(np.array([x - radius, x + radius]) // self.cell_size, 0, self.grid_shape[0] - 1))
+        by0, by1 = (np.clip(np.array([y - radius, y + radius]) // self.cell_size, 0, self.grid_shape[1] - 1))
+        pieces = [self.order[self.ptr[bx * self.grid_shape[1] + by0]:self.ptr[bx * self.grid_shape[1] + by1 + 1]]
+                  for bx in range(bx0, bx1 + 1)]
+        candidates = np.concatenate(pieces) if pieces else np.empty(0, dtype=np.int64)
+        near = np.abs(self.xs[candidates] - x) + np.abs(self.ys[candidates] - y) <= radius
+        return np.sort(candidates[near])
+
+
+_default_area = None
+
+
+def default_area() -> Area:
+    """
+    The simple 4x4 area pollinators live on when they aren't given one. It is built the first time it is needed rather
+    than when the modules are imported, and after that the same area is handed out every time.
+    :return: Area
+    >>> default_area() is default_area()
+    True
+    """
+    global _default_area
+    if _default_area is None:
+        _default_area = Area([[1, 1, 1, 1], [1, 1, 1, 1], [1, 1, 1, 1], [4, 4, 4, 4]])
+    return _default_area
 
@@ -0,0 +1,131 @@
+import json
+import os
+import numpy as np
+
+
+# The layers a Weather cube holds
+layers = ('rain', 'wind', 'temperature')
+
+
+class Weather:
+    """
+    Time-varying conditions over an area, kept as a cube for each layer: one entry per hour of the season and per
+    coarse cell (a square of cell_size field cells, an acre by default). Looking up the conditions for a pollinator is
+    just indexing, so weather costs next to nothing per turn. Cubes can be generated procedurally with generate(), or
+    saved to and memory-mapped from disk for long seasons. A season shorter than the simulation starts over.
+
+    The layers are rain (True when it is raining), wind (east-west drift in cells for a soaring monarch, positive to
+    the east) and temperature (degrees C). Attach a Weather to an Area with area.weather = ...; areas have none by
+    default, and then nothing changes.
+    >>> w = Weather.generate((400, 100), days=3, rng=np.random.RandomState(0))
+    >>> w.rain.shape, w.hours
+    ((72, 4, 1), 72)
+    >>> w.rain_at(0, 5, 399, 99) == bool(w.rain[5, 3, 0])
+    True
+    >>> bool(w.temperature_at(0, 15, 0, 0) > w.temperature_at(0, 4, 0, 0))
+    True
+    """
+
+    def __init__(self, rain, wind, temperature, cell_size: int = 100):
+        """
+        :param rain: (hours, rows, columns) boolean array
+        :param wind: (hours, rows, columns) integer array of drift in cells
+        :param temperature: (hours, rows, columns) array of degrees C
+        :param cell_size: field cells along each side of a coarse cell
+        """
+        self.rain = rain
+        self.wind = wind
+        self.temperature = temperature
+        self.cell_size = cell_size
+        self.hours, self.rows, self.columns = rain.shape
+        if wind.shape != rain.shape or temperature.shape != rain.shape:
+            raise ValueError("All weather layers must have the same shape")
+
+    @classmethod
+    def generate(cls, area_shape: tuple, days: int, cell_size: int = 100, rain_fraction: float = 0.1,
+                 mean_temperature: float = 22.0, daily_range: float = 10.0, max_wind: int = 3, rng=None) -> 'Weather':
+        """
+        Makes up a season of plausible weather. Rain comes from a random field over the coarse cells that drifts from
+        hour to hour, plus a part shared by the whole area so storms cover a lot of it at once, and it rains in the
+        wettest rain_fraction of hours and cells. Wind is a prevailing drift for each day with hourly gusts, and the
+        temperature follows a daily cycle peaking at 3 pm, shifted up or down for each day.
+        :param area_shape: (rows, columns) of the area in field cells
+        :param days: length of the season
+        :param cell_size: field cells along each side of a coarse cell
+        :param rain_fraction: share of the hours and cells with rain
+        :param mean_temperature: average temperature, degrees C
+        :param daily_range: difference between the warmest and coolest time of day
+        :param max_wind: strongest prevailing drift, in cells
+        :param rng: source of random numbers, np.random (the default) or a np.random.RandomState
+        """
+        rng = np.random if rng is None else rng
+        hours = days * 24
+        shape = (hours, -(-area_shape[0] // cell_size), -(-area_shape[1] // cell_size))
+        # A slowly changing field for each hour (AR(1) with a correlation of 0.9 from one hour to the next)
+        noise = rng.standard_normal(shape)
+        shared = rng.standard_normal(hours)
+        wetness = np.empty(shape)
+        state = noise[0]
+        regional = shared[0]
+        for hour in range(hours):
+            state = 0.9 * state + 0.43589 * noise[hour]
+            regional = 0.9 * regional + 0.43589 * shared[hour]
+            wetness[hour] = state + 2 * regional
+        rain = wetness > np.quantile(wetness, 1 - rain_fraction)
+        prevailing = np.repeat(rng.randint(-max_wind, max_wind + 1, days), 24)
+        wind = (prevailing[:, None, None] + rng.randint(-1, 2, shape)).astype(np.int8)
+        hour_of_day = np.arange(hours) % 24
+        daily = mean_temperature + daily_range / 2 * np.cos(2 * np.pi * (hour_of_day - 15) / 24)
+        daily = daily + np.repeat(rng.normal(0, 3, days), 24)
+        temperature = (daily[:, None, None] + rng.normal(0, 0.5, shape)).astype(np.float32)
+        return cls(rain, wind, temperature, cell_size)
+
+    def save(self, directory: str):
+        """
+        Writes each layer to its own .npy file in directory, so load() can memory-map them
+        """
+        os.makedirs(directory, exist_ok=True)
+        for layer in layers:
+            np.save(os.path.join(directory, layer + '.npy'), getattr(self, layer))
+        with open(os.path.join(directory, 'weather.json'), 'w') as output:
+            json.dump({'cell_size': self.cell_size}, output)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'Weather':
+        """
+        Reads a cube written by save(). With mmap the layers stay on disk and only the hours that are looked up are
+        read, so a season can be much bigger than memory.
+        """
+        with open(os.path.join(directory, 'weather.json')) as source:
+            cell_size = json.load(source)['cell_size']
+        mode = 'r' if mmap else None
+        return cls(*(np.load(os.path.join(directory, layer + '.npy'), mmap_mode=mode) for layer in layers),
+                   cell_size=cell_size)
+
+    def index(self, days: int, hours: int, x: int, y: int) -> tuple:
+        """
+        Where in the cube the conditions for field cell (x, y) at the given time are. Cells off the edge of the area
+        get the conditions of the nearest coarse cell.
+        """
+        row = min(max(x // self.cell_size, 0), self.rows - 1)
+        column = min(max(y // self.cell_size, 0), self.columns - 1)
+        return (days * 24 + hours) % self.hours, row, column
+
+    def rain_at(self, days: int, hours: int, x: int, y: int) -> bool:
+        return bool(self.rain[self.index(days, hours, x, y)])
+
+    def wind_at(self, days: int, hours: int, x: int, y: int) -> int:
+        return int(self.wind[self.index(days, hours, x, y)])
+
+    def temperature_at(self, days: int, hours: int, x: int, y: int) -> float:
+        return float(self.temperature[self.index(days, hours, x, y)])
+
+    def grounded(self, days: int, hours: int, x: int, y: int, flight_temperature: float = None) -> bool:
+        """
+        Whether the weather keeps a pollinator from flying: rain, or colder than it can fly in
+        :param flight_temperature: lowest temperature the pollinator flies in, None for no limit
+        """
+        cell = self.index(days, hours, x, y)
+        if self.rain[cell]:
+            return True
+        return flight_temperature is not None and self.temperature[cell] < flight_temperature
@@ -1,7 +1,13 @@
 from Functions.Optimization import *
 from Functions.run_tests import *
+from Functions import Batch
+from Functions import Memory
+from Functions import Progress
+import argparse
+import sys
 
-if __name__ == "__main__":
+
+def interactive():
     """
     Main executable for the program
     You can choose to run each option. Add more options for more tests, such as bees or other pollinators
@@ -80,4 +86,108 @@ if __name__ == "__main__":
             run_tests()
             break
         elif answer.lower() == 'n':
-            break
\ No newline at end of file
+            break
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Command line interface for running without prompts, e.g., under a batch scheduler. Every run subcommand takes
+    --shard i/N, so an experiment can be split over N nodes and the outputs combined afterwards with the merge
+    subcommand.
+    """
+    parser = argparse.ArgumentParser(description='Pollinator Monte Carlo (PMC) toolkit')
+    subparsers = parser.add_subparsers(dest='command')
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--seed', type=int, default=0, help='base random seed (default 0)')
+    common.add_argument('--workers', type=int, default=1, help='processes to use on this node (default 1)')
+    common.add_argument('--shard', type=Batch.parse_shard, default=(0, 1), metavar='i/N',
+                        help='only run shard i of N, numbered from 0 (default 0/1)')
+    common.add_argument('--output', default='-', help="JSON lines output file, '-' for stdout (default)")
+    common.add_argument('--profile', action='store_true', help='profile the pollinators and report per phase')
+    common.add_argument('--memory-budget', type=float, default=None, metavar='MB',
+                        help='run in smaller batches instead of going over this much memory')
+    common.add_argument('--memory-report', action='store_true',
+                        help='print memory use at each checkpoint to stderr when done')
+    common.add_argument('--progress', default=None, metavar='PATH',
+                        help="append progress snapshots as JSON lines to PATH, '-' for stderr")
+    common.add_argument('--metrics', default=None, metavar='PATH',
+                        help='keep the latest progress in PATH in the Prometheus text format')
+    common.add_argument('--progress-interval', type=float, default=10.0, metavar='SECONDS',
+                        help='least time between progress snapshots (default 10)')
+
+    params = subparsers.add_parser('params', parents=[common], help='test the parameters on one or more fields')
+    params.add_argument('--fields', nargs='+', default=['fallow'], help='field names (default fallow)')
+    params.add_argument('--replicates', type=int, default=10, help='monarchs per field (default 10)')
+    params.add_argument('--iterations', type=int, default=34, help='field size in stacked acres (default 34)')
+    params.add_argument('--death-tilt', type=float, default=1.0, metavar='FACTOR',
+                        help='importance sampling: multiply the chances of dying by FACTOR and weight the results')
+    params.add_argument('--exit-tilt', type=float, default=1.0, metavar='FACTOR',
+                        help='importance sampling: multiply the chances of exiting by FACTOR')
+
+    optimize = subparsers.add_parser('optimize', parents=[common], help='search random arrangements of fields')
+    optimize.add_argument('--fields', type=int, default=5, help='fields per arrangement (default 5)')
+    optimize.add_argument('--candidates', type=int, default=25, help='arrangements to evaluate (default 25)')
+    optimize.add_argument('--replicates', type=int, default=1000, help='monarchs per arrangement (default 1000)')
+
+    tests = subparsers.add_parser('tests', parents=[common], help='compare the standard fields')
+    tests.add_argument('--fields', nargs='+', default=Batch.standard_fields, help='field names (default the '
+                                                                                  'standard test fields)')
+    tests.add_argument('--replicates', type=int, default=10, help='monarchs per field (default 10)')
+    tests.add_argument('--iterations', type=int, default=33, help='field size in stacked acres (default 33)')
+    tests.add_argument('--death-tilt', type=float, default=1.0, metavar='FACTOR',
+                       help='importance sampling: multiply the chances of dying by FACTOR and weight the results')
+    tests.add_argument('--exit-tilt', type=float, default=1.0, metavar='FACTOR',
+                       help='importance sampling: multiply the chances of exiting by FACTOR')
+
+    merge = subparsers.add_parser('merge', help='combine the outputs of several shards')
+    merge.add_argument('inputs', nargs='+', help='shard output files')
+    merge.add_argument('--output', default='-', help="merged JSON lines file, '-' for stdout (default)")
+    merge.add_argument('--summary', action='store_true', help='print a summary instead of the merged records')
+    return parser
+
+
+def main(argv: list = None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'merge':
+        records = Batch.merge_records(args.inputs)
+        if args.summary:
+            print(Batch.summarize(records))
+        else:
+            Batch.write_records(records, args.output)
+        return
+
+    shard, shards = args.shard
+    tracker = Memory.MemoryTracker() if args.memory_report else None
+    budget = Memory.MemoryBudget.megabytes(args.memory_budget, tracker)
+    if tracker is not None:
+        tracker.checkpoint('start')
+    progress = None
+    if args.progress is not None or args.metrics is not None:
+        progress = Progress.Progress(interval=args.progress_interval,
+                                     unit='candidates' if args.command == 'optimize' else 'replicates')
+        if args.progress is not None:
+            progress.add_callback(Progress.JsonLinesExporter(args.progress))
+        if args.metrics is not None:
+            progress.add_callback(Progress.PrometheusExporter(args.metrics))
+    if args.command == 'optimize':
+        records = Batch.run_optimize(args.fields, args.candidates, args.replicates, args.seed, args.workers,
+                                     shard, shards, args.profile, budget, progress)
+    else:
+        records = Batch.run_parameter_test(args.fields, args.replicates, args.seed, args.iterations, args.workers,
+                                           shard, shards, args.profile, budget, progress, args.death_tilt,
+                                           args.exit_tilt)
+    Batch.write_records(records, args.output)
+    if args.output != '-':
+        print(Batch.summarize(records))
+    if tracker is not None:
+        tracker.checkpoint('done')
+        print(tracker.report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    # With no arguments, keep asking questions like before. Otherwise run the requested subcommand.
+    if len(sys.argv) > 1:
+        main()
+    else:
+        interactive()